@@ -0,0 +1,4 @@
+"""
+Tools to analyse the performance results of the EESSI test suite (perflogs and ReFrame run reports) after the fact.
+These modules only use the Python standard library, so they can be used without ReFrame, e.g. on a laptop.
+"""
@@ -0,0 +1,220 @@
+"""
+Compare the performance of two sets of runs of the EESSI test suite test by test, e.g. before and after an update of
+the EESSI stack or of the site configuration. The sets of runs (baseline and candidate) are either:
+- two ReFrame run reports (run-report-<sessionid>.json), or
+- two time ranges SINCE..UNTIL (either side may be left empty) of the results in a store, see
+  eessi.testsuite.analysis.store
+
+Test cases are matched by test class, parameters, system, partition and perf variable (or without system and
+partition with --ignore-system). For each matched perf variable the ratio candidate / baseline is reported, with a
+bootstrap confidence interval if samples are available on both sides:
+- the raw samples that the test kept in samples.json in its output directory (see hooks.write_samples_artifact),
+  for the perf variables that are statistics of those samples, e.g. img_sec_median
+- otherwise, the values of repeated runs (e.g. all runs in a time range, or reruns in a run report)
+
+The table is sorted from the biggest win to the biggest loss, where a lower value is a win for perf variables for
+which lower is better (e.g. s/timestep), see regressions.lower_is_better(). The direction can be set explicitly with
+--lower-is-better and --higher-is-better. Test cases that are found on one side only are listed
+separately.
+
+Usage:
+    python -m eessi.testsuite.analysis.compare BASELINE CANDIDATE [--database DATABASE] [--test TEST] [...]
+        [--ignore-system] [--confidence CONFIDENCE] [--min-change MIN_CHANGE] [--lower-is-better PERF_VAR]
+        [--higher-is-better PERF_VAR] [--format {table,csv,json}]
+"""
+import argparse
+import json
+import os
+import sys
+
+from eessi.testsuite import stats
+from eessi.testsuite.analysis import regressions, store
+
+REPORT_COLUMNS = ['test', 'params', 'system', 'partition', 'perf_var', 'baseline', 'candidate', 'unit', 'ratio',
+                  'ci_low', 'ci_high', 'verdict']
+# statistics of samples that are reported as perf variables <name>_<statistic>, see stats.summary()
+SAMPLE_STATISTICS = ['median', 'mean', 'stddev', 'p5', 'p95']
+
+
+def _load_samples(outputdir) -> dict:
+    """Return the samples kept in samples.json in outputdir, as a mapping name -> values"""
+    if not outputdir:
+        return {}
+    try:
+        with open(os.path.join(outputdir, 'samples.json')) as file:
+            return {name: data['values'] for name, data in json.load(file).items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def _find_samples(perf_var: str, samples: dict) -> tuple:
+    """Return the samples and the statistic of which perf_var is computed, or (None, None)"""
+    for name, values in samples.items():
+        statistic = perf_var[len(name) + 1:]
+        if perf_var.startswith(name + '_') and statistic in SAMPLE_STATISTICS:
+            return values, statistic
+    return None, None
+
+
+def load_run_report(filename: str) -> list:
+    """
+    Return the results (dicts with the store.COLUMNS) in the run report filename, with the samples of the perf
+    variable (or None) in 'samples' and the statistic it is computed with in 'statistic'
+    """
+    results = []
+    for session_info, testcase in store.iter_run_report(filename):
+        samples = _load_samples(testcase.get('outputdir'))
+        for result in store.parse_testcase(testcase, session_info.get('time_end_unix')):
+            result['samples'], result['statistic'] = _find_samples(result['perf_var'], samples)
+            results.append(result)
+    return results
+
+
+def parse_range(value: str) -> tuple:
+    """Split a time range SINCE..UNTIL into (since, until), where an empty side is None"""
+    if '..' not in value:
+        raise ValueError(f'invalid time range (expected SINCE..UNTIL): {value!r}')
+    since, until = value.split('..', 1)
+    return since or None, until or None
+
+
+def _key(result: dict, ignore_system: bool) -> tuple:
+    if ignore_system:
+        return (result['test'], result['params'], result['perf_var'])
+    return (result['test'], result['params'], result['system'], result['partition'], result['perf_var'])
+
+
+def _summarize(results: list) -> dict:
+    """Combine the results of a perf variable of a test case into a value and the samples for the bootstrap"""
+    values = [x['value'] for x in results if x.get('value') is not None]
+    samples = [y for x in results for y in (x.get('samples') or [])]
+    statistic = next((x['statistic'] for x in results if x.get('samples')), None)
+    if samples and statistic:
+        return {'value': stats.summary(samples)[statistic], 'samples': samples, 'statistic': statistic}
+    if not values:
+        return None
+    return {'value': stats.median(values), 'samples': values if len(values) > 1 else None, 'statistic': 'median'}
+
+
+def compare(baseline: list, candidate: list, ignore_system: bool = False, confidence: float = 0.95,
+            min_change: float = 0.02, directions: dict = None) -> dict:
+    """
+    Compare two lists of results (dicts with the store.COLUMNS, optionally with 'samples' and 'statistic', see
+    load_run_report()). Returns a dict with:
+    - matched: list of dicts with the REPORT_COLUMNS (and gain, the relative improvement), sorted from the biggest win
+      to the biggest loss
+    - baseline_only, candidate_only: sorted lists of (test, params, system, partition) of the test cases that are
+      found on one side only
+
+    The verdict of a perf variable is 'better' or 'worse' if the confidence interval of the ratio excludes 1, or if
+    no interval is available and the ratio differs more than min_change from 1, and 'same' otherwise. Whether a lower
+    ratio is better follows from regressions.lower_is_better(), with the explicit directions if given.
+    """
+    sides = []
+    for results in (baseline, candidate):
+        grouped = {}
+        for result in results:
+            grouped.setdefault(_key(result, ignore_system), []).append(result)
+        sides.append(grouped)
+
+    matched = []
+    for key in sorted(set(sides[0]) & set(sides[1])):
+        base, cand = _summarize(sides[0][key]), _summarize(sides[1][key])
+        if base is None or cand is None or not base['value']:
+            continue
+        first = sides[1][key][0]
+        ratio = cand['value'] / base['value']
+        ci_low = ci_high = None
+        if base['samples'] and cand['samples'] and base['statistic'] == cand['statistic']:
+            statistic = (lambda values, name=base['statistic']: stats.summary(values)[name])
+            try:
+                ci_low, ci_high = stats.bootstrap_ratio(base['samples'], cand['samples'], statistic, confidence)
+            except ValueError:
+                pass
+        if ci_low is not None:
+            changed = ci_low > 1 or ci_high < 1
+        else:
+            changed = abs(ratio - 1) > min_change
+        gain = ratio - 1
+        if regressions.lower_is_better(first.get('unit'), first.get('perf_var'), directions):
+            gain = 1 / ratio - 1 if ratio else float('inf')
+        matched.append({
+            'test': first['test'],
+            'params': first['params'],
+            'system': first['system'] if not ignore_system else '*',
+            'partition': first['partition'] if not ignore_system else '*',
+            'perf_var': first['perf_var'],
+            'baseline': base['value'],
+            'candidate': cand['value'],
+            'unit': first.get('unit'),
+            'ratio': ratio,
+            'ci_low': ci_low,
+            'ci_high': ci_high,
+            'gain': gain,
+            'verdict': ('better' if gain > 0 else 'worse') if changed else 'same',
+        })
+    matched.sort(key=lambda x: x['gain'], reverse=True)
+
+    cases = [{(x['test'], x['params'], x['system'], x['partition']) for x in results}
+             for results in (baseline, candidate)]
+    matches = [{x[:2] if ignore_system else x for x in side} for side in cases]
+    return {
+        'matched': matched,
+        'baseline_only': sorted(x for x in cases[0] if (x[:2] if ignore_system else x) not in matches[1]),
+        'candidate_only': sorted(x for x in cases[1] if (x[:2] if ignore_system else x) not in matches[0]),
+    }
+
+
+def _load(args: argparse.Namespace, source: str) -> list:
+    if source.endswith('.json'):
+        return load_run_report(source)
+    since, until = parse_range(source)
+    with store.PerfStore(args.database) as perf_store:
+        filters = dict(store.get_filters(args), since=since, until=until)
+        return perf_store.query(**filters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the performance of two sets of runs test by test.")
+    parser.add_argument("baseline", help="Run report (.json), or time range SINCE..UNTIL in the database")
+    parser.add_argument("candidate", help="Run report (.json), or time range SINCE..UNTIL in the database")
+    parser.add_argument("--database", help="SQLite database, see eessi.testsuite.analysis.store (for time ranges)")
+    store.add_filter_arguments(parser)
+    parser.add_argument("--ignore-system", action='store_true', help="Match test cases across systems/partitions")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals")
+    parser.add_argument("--min-change", type=float, default=0.02,
+                        help="Minimal relative change to consider significant when no samples are available")
+    regressions.add_direction_arguments(parser)
+    parser.add_argument("--format", choices=['table', 'csv', 'json'], default='table', help="Output format")
+    args = parser.parse_args()
+
+    sides = []
+    for source in (args.baseline, args.candidate):
+        if not source.endswith('.json') and not args.database:
+            parser.error(f'--database is required to compare time ranges: {source}')
+        try:
+            sides.append(_load(args, source))
+        except ValueError as err:
+            parser.error(str(err))
+    comparison = compare(*sides, ignore_system=args.ignore_system, confidence=args.confidence,
+                         min_change=args.min_change, directions=regressions.get_directions(args))
+
+    if args.format == 'json':
+        json.dump(comparison, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    if args.format == 'csv':
+        store.print_results(comparison['matched'], REPORT_COLUMNS, 'csv')
+        return
+
+    print(f"Matched perf variables ({len(comparison['matched'])}), from the biggest win to the biggest loss:")
+    store.print_results(comparison['matched'], REPORT_COLUMNS)
+    for side in ('baseline', 'candidate'):
+        cases = comparison[f'{side}_only']
+        print(f'\nOnly in {side} ({len(cases)}):')
+        for test, params, system, partition in cases:
+            print(f'  {test} {params} @{system}:{partition}')
+
+
+if __name__ == "__main__":
+    main()
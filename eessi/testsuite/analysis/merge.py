@@ -0,0 +1,175 @@
+"""
+Merge many ReFrame run reports (run-report-<sessionid>.json) of the EESSI test suite into a compact summary.
+
+The reports are read incrementally, one test case at a time (see store.iter_run_report()), so that large reports are
+never loaded as a whole, and in parallel by a pool of processes. Test cases that are found more than once (e.g. in
+copies of the same report, or in the reports of restored sessions) are counted once: a test case run is identified by
+its test class, parameters, system, partition, programming environment, job id and completion time.
+
+The summary has one entry per test case (test class, parameters, system, partition and programming environment) with:
+- runs, passed, failed: the number of (unique) runs, and how many of them passed or failed
+- first, last: the completion time of the first and last run, and last_result: the result of the last run
+- module: the module_name parameter of the test, or else the modules loaded by the test
+- perfvars: for each perf variable its unit, the number of values n, their median, min and max, and the last_value
+
+Usage:
+    python -m eessi.testsuite.analysis.merge PATH [PATH ...] [--output OUTPUT] [--jobs JOBS] [--test TEST]
+        [--format {table,csv,json}]
+"""
+import argparse
+import fnmatch
+import multiprocessing
+import os
+import re
+import sys
+
+from eessi.testsuite import stats
+from eessi.testsuite.analysis import store
+
+CASE_COLUMNS = ['test', 'params', 'system', 'partition', 'environ']
+REPORT_COLUMNS = ['test', 'params', 'system', 'partition', 'environ', 'runs', 'passed', 'failed', 'last_result',
+                  'last', 'perf_var', 'median', 'min', 'max', 'unit', 'n']
+
+
+def read_run_report(path: str) -> list:
+    """
+    Return the compact records of the test case runs in the run report path: tuples
+    (case, jobid, timestamp, result, module, perfvars), where case has the CASE_COLUMNS and perfvars maps the name of
+    each perf variable to (value, unit)
+    """
+    records = []
+    for session_info, testcase in store.iter_run_report(path):
+        test, params = store.split_name(testcase.get('display_name') or testcase.get('name') or '')
+        timestamp = testcase.get('job_completion_time_unix') or session_info.get('time_end_unix')
+        perfvars = {}
+        for key, info in (testcase.get('perfvalues') or {}).items():
+            perfvars[key.split(':')[-1]] = (info[0], info[4])
+        records.append((
+            (test, params, testcase.get('system'), testcase.get('partition'), testcase.get('environ')),
+            testcase.get('jobid'),
+            store.parse_time(timestamp) if timestamp is not None else None,
+            testcase.get('result'),
+            store.get_module(params, testcase.get('modules')),
+            perfvars,
+        ))
+    return records
+
+
+def _read(path: str) -> tuple:
+    """Return (path, records, error) for the run report path, for use in a process pool"""
+    try:
+        return path, read_run_report(path), None
+    except (OSError, ValueError) as err:
+        return path, [], str(err)
+
+
+def iter_records(paths: list, jobs: int = None):
+    """
+    Iterate over the records (see read_run_report()) of the run reports in paths, read by jobs processes (default:
+    the number of CPUs). Yields tuples (path, records, error), in the order in which the reports are read.
+    """
+    jobs = min(jobs or os.cpu_count() or 1, len(paths))
+    if jobs <= 1:
+        yield from (_read(path) for path in paths)
+        return
+    with multiprocessing.Pool(jobs) as pool:
+        yield from pool.imap_unordered(_read, paths)
+
+
+def merge(records) -> list:
+    """
+    Merge records (see read_run_report()) into the summary described in the module docstring, sorted by test case.
+    Duplicate runs are counted once.
+    """
+    seen = set()
+    cases = {}
+    for case, jobid, timestamp, result, module, perfvars in records:
+        run = (case, jobid, timestamp)
+        if run in seen:
+            continue
+        seen.add(run)
+        cases.setdefault(case, []).append((timestamp, result, module, perfvars))
+
+    summary = []
+    for case, runs in sorted(cases.items(), key=lambda x: tuple(y or '' for y in x[0])):
+        runs.sort(key=lambda x: (x[0] is not None, x[0] or 0))
+        values = {}
+        for _, _, _, perfvars in runs:
+            for name, (value, unit) in perfvars.items():
+                if value is not None:
+                    values.setdefault(name, {'unit': unit, 'values': []})['values'].append(value)
+        entry = dict(zip(CASE_COLUMNS, case))
+        entry.update({
+            'runs': len(runs),
+            'passed': sum(1 for x in runs if x[1] == 'pass'),
+            'failed': sum(1 for x in runs if x[1] == 'fail'),
+            'first': runs[0][0],
+            'last': runs[-1][0],
+            'last_result': runs[-1][1],
+            'module': next((x[2] for x in reversed(runs) if x[2]), None),
+            'perfvars': {
+                name: {
+                    'unit': data['unit'],
+                    'n': len(data['values']),
+                    'median': stats.median(data['values']),
+                    'min': min(data['values']),
+                    'max': max(data['values']),
+                    'last_value': data['values'][-1],
+                }
+                for name, data in sorted(values.items())
+            },
+        })
+        summary.append(entry)
+    return summary
+
+
+def flatten(summary: list) -> list:
+    """Return the summary with one row (dict with the REPORT_COLUMNS) per perf variable of each test case"""
+    rows = []
+    for entry in summary:
+        case = {x: y for x, y in entry.items() if x != 'perfvars'}
+        if not entry['perfvars']:
+            rows.append(case)
+        for name, data in entry['perfvars'].items():
+            rows.append(dict(case, perf_var=name, **data))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge ReFrame run reports into a compact, deduplicated summary.")
+    parser.add_argument("paths", nargs='+', help="Run reports, or directories to search for them")
+    parser.add_argument("--output", help="File to write the summary to (default: standard output)")
+    parser.add_argument("--jobs", "-j", type=int, help="Number of processes reading reports (default: number of CPUs)")
+    parser.add_argument("--test", help="Only summarize test classes that match this shell-style pattern")
+    parser.add_argument("--format", choices=['table', 'csv', 'json'], default='json', help="Output format")
+    args = parser.parse_args()
+
+    paths = [x for x in store.find_files(args.paths) if x.endswith('.json')]
+    regex = re.compile(fnmatch.translate(args.test or '*'))
+
+    def _records():
+        for path, records, error in iter_records(paths, args.jobs):
+            if error:
+                print(f'WARNING: skipping {path}: {error}', file=sys.stderr)
+            yield from (x for x in records if regex.match(x[0][0]))
+
+    summary = merge(_records())
+    print(f'{len(summary)} test cases merged from {len(paths)} run reports', file=sys.stderr)
+
+    file = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            store.print_results(summary, [], 'json', file)
+        else:
+            rows = flatten(summary)
+            if args.format == 'table':
+                for row in rows:
+                    row['last'] = store.format_time(row['last'])
+            store.print_results(rows, REPORT_COLUMNS, args.format, file)
+    finally:
+        if args.output:
+            file.close()
+
+
+if __name__ == "__main__":
+    main()
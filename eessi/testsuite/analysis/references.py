@@ -0,0 +1,142 @@
+"""
+Generate ReFrame references for the perf variables of the EESSI test suite from their history, as ingested with
+eessi.testsuite.analysis.store, and look them up in the EESSI_Mixin.
+
+For each series of results (see REFERENCE_COLUMNS), the reference value is the median of the most recent results
+since the last shift in performance (see regressions.mad_changes). The tolerance is tolerance_factor times their
+relative median absolute deviation, with a minimum of min_tolerance. Only the bound on the bad side is set: the lower
+bound for perf variables for which higher is better (throughput), the upper bound for the others (times, also per
+unit of work such as s/timestep), see regressions.lower_is_better(). The direction can be set explicitly for perf
+variables whose unit does not tell it, with --lower-is-better and --higher-is-better.
+
+The references are written to a JSON file with the format:
+{
+    "<test class>": {
+        "<test parameters>": {
+            "<system>:<partition>": {
+                "<perf variable>": [value, lower bound, upper bound, unit]
+            }
+        }
+    }
+}
+where the test parameters are formatted as in the display name of the test, e.g. '%scale=1_node %module_name=...'.
+The EESSI_Mixin sets the references of each test from this file if its variable reference_file is set, e.g. with
+`reframe -S reference_file=references.json ...`, so that tests fail on slowdowns beyond the measured noise.
+
+Usage:
+    python -m eessi.testsuite.analysis.references DATABASE OUTPUT [--test TEST] [--system SYSTEM] [...]
+        [--last LAST] [--min-samples MIN_SAMPLES] [--tolerance-factor TOLERANCE_FACTOR]
+        [--min-tolerance MIN_TOLERANCE] [--lower-is-better PERF_VAR] [--higher-is-better PERF_VAR]
+"""
+import argparse
+import json
+import os
+
+from eessi.testsuite import stats
+from eessi.testsuite.analysis import regressions, store
+
+# columns of the results that identify a reference: the key of the reference in the reference file, see the module
+# docstring. Unlike store.SERIES_COLUMNS, the module is left out: the EESSI_Mixin looks up references by display name,
+# which contains the module if the test is parametrized over modules. Results of other tests with different loaded
+# modules form a single series, of which the results since the last shift (i.e. the latest modules) are used.
+REFERENCE_COLUMNS = ['test', 'params', 'system', 'partition', 'perf_var']
+
+# loaded reference files: path -> ((mtime, size), references)
+_loaded = {}
+
+
+def make_reference(values: list, unit: str, perf_var: str = '', tolerance_factor: float = 4.0,
+                   min_tolerance: float = 0.05, directions: dict = None):
+    """
+    Return the ReFrame reference tuple (value, lower bound, upper bound, unit) for a perf variable with the given
+    values, see the module docstring, or None if the median of the values is not positive.
+    directions: explicit directions of perf variables, see regressions.lower_is_better()
+    """
+    center = stats.median(values)
+    if center <= 0:
+        return None
+    tolerance = round(max(tolerance_factor * stats.mad(values) / center, min_tolerance), 4)
+    if regressions.lower_is_better(unit, perf_var, directions):
+        return (center, None, tolerance, unit)
+    return (center, -tolerance, None, unit)
+
+
+def generate(results: list, last: int = 20, min_samples: int = 5, **kwargs) -> dict:
+    """
+    Generate references from results (dicts with the store.COLUMNS, ordered by time), see the module docstring.
+    Failed test cases are left out. Series with fewer than min_samples results since their last shift are skipped.
+
+    Arguments:
+    - last: maximum number of (most recent) results of each series to use
+    - kwargs: see make_reference()
+    """
+    references = {}
+    results = [x for x in results if x.get('result') != 'fail' and x.get('value') is not None]
+    for (test, params, system, partition, perf_var), series in store.group_results(results, REFERENCE_COLUMNS).items():
+        values = [x['value'] for x in series]
+        changes = regressions.mad_changes(values)
+        if changes:
+            values = values[changes[-1]:]
+        values = values[-last:]
+        if len(values) < min_samples:
+            continue
+        reference = make_reference(values, series[-1].get('unit'), perf_var, **kwargs)
+        if reference is None:
+            continue
+        partitions = references.setdefault(test, {}).setdefault(params, {})
+        partitions.setdefault(f'{system}:{partition}', {})[perf_var] = list(reference)
+    return references
+
+
+def load_references(filename: str) -> dict:
+    """Load a reference file, see the module docstring. The result is cached until the file changes."""
+    stat = os.stat(filename)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _loaded.get(os.path.abspath(filename))
+    if cached is None or cached[0] != signature:
+        with open(filename) as file:
+            references = json.load(file)
+        if not isinstance(references, dict):
+            raise ValueError(f'invalid reference file {filename}: expected a JSON object')
+        cached = (signature, references)
+        _loaded[os.path.abspath(filename)] = cached
+    return cached[1]
+
+
+def get_references(filename: str, display_name: str, partition: str) -> dict:
+    """
+    Return the references in the reference file filename for the test case with the given display name on the
+    given partition (<system>:<partition>), as a dict perf variable -> reference tuple
+    """
+    test, params = store.split_name(display_name)
+    references = load_references(filename).get(test, {}).get(params, {}).get(partition, {})
+    return {perf_var: tuple(reference) for perf_var, reference in references.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate ReFrame references from the history of perf variables.")
+    parser.add_argument("database", help="SQLite database, see eessi.testsuite.analysis.store")
+    parser.add_argument("output", help="Reference file (JSON) to write")
+    store.add_filter_arguments(parser)
+    parser.add_argument("--last", type=int, default=20, help="Maximum number of recent results to use per series")
+    parser.add_argument("--min-samples", type=int, default=5, help="Minimum number of results to set a reference")
+    parser.add_argument("--tolerance-factor", type=float, default=4.0,
+                        help="Tolerance in units of the relative median absolute deviation")
+    parser.add_argument("--min-tolerance", type=float, default=0.05, help="Minimum (relative) tolerance")
+    regressions.add_direction_arguments(parser)
+    args = parser.parse_args()
+
+    with store.PerfStore(args.database) as perf_store:
+        results = perf_store.query(**store.get_filters(args))
+    references = generate(results, last=args.last, min_samples=args.min_samples,
+                          tolerance_factor=args.tolerance_factor, min_tolerance=args.min_tolerance,
+                          directions=regressions.get_directions(args))
+    with open(args.output, 'w') as file:
+        json.dump(references, file, indent=2, sort_keys=True)
+        file.write('\n')
+    count = sum(len(x) for test in references.values() for params in test.values() for x in params.values())
+    print(f'{count} references written to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
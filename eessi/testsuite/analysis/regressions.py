@@ -0,0 +1,288 @@
+"""
+Detect significant shifts in the performance history of the EESSI test suite, as ingested with
+eessi.testsuite.analysis.store.
+
+Each series of results of the same perf variable of the same test case (see store.SERIES_COLUMNS) is analysed with
+one of these robust methods:
+- mad: a shift is reported at the first of min_points consecutive results that all deviate in the same direction from
+  the median of the preceding window of results by more than threshold times their (scaled) median absolute
+  deviation
+- cusum: two-sided cumulative sum of the deviations from the median of a baseline window, in units of its median
+  absolute deviation; a shift is reported at the start of the excursion when the cumulative sum exceeds threshold
+
+Shifts smaller than min_change (relative to the baseline median) are not reported, nor are shifts that are not
+confirmed by min_points results. A last result that deviates significantly, but is not (yet) confirmed, is reported
+as an outlier.
+
+For each shift, the EESSI metadata that changed at the same time (cvmfs_repo_name, cvmfs_software_subdir,
+full_modulepath and eessi_testsuite_version) is reported, to tell changes in the software stack apart from changes
+in the test suite (and from changes in neither, e.g. in the system).
+
+Usage:
+    python -m eessi.testsuite.analysis.regressions DATABASE [--test TEST] [--system SYSTEM] [...]
+        [--method {mad,cusum}] [--window WINDOW] [--threshold THRESHOLD] [--min-change MIN_CHANGE]
+        [--format {table,csv,json}]
+"""
+import argparse
+import collections
+import fnmatch
+import re
+
+from eessi.testsuite import stats
+from eessi.testsuite.analysis import store
+
+# metadata that is logged by the EESSI_Mixin and describes the software stack
+STACK_COLUMNS = ['cvmfs_repo_name', 'cvmfs_software_subdir', 'full_modulepath']
+# metadata that describes the test suite
+TESTSUITE_COLUMNS = ['eessi_testsuite_version']
+# units of perf variables for which lower values are better, besides times per unit of work (see
+# LOWER_IS_BETTER_UNIT_REGEX); for all other units higher values are better
+LOWER_IS_BETTER_UNITS = ['s', 'ms', 'us', 'ns', 'min', 'h', 'J', 'kJ', 'Wh', 'W', 'B', 'MiB', 'GiB', 'max/avg', '%',
+                         'misses/kinstructions', 'events']
+# times per unit of work, e.g. s/step, s/timestep or ms/iter, but not simulated time per unit of time, e.g. ns/day
+LOWER_IS_BETTER_UNIT_REGEX = re.compile(r'^(s|ms|us|ns)/(?!(s|sec|min|h|hour|day)$)\S+$')
+REPORT_COLUMNS = ['test', 'params', 'system', 'partition', 'perf_var', 'first_bad', 'before', 'after', 'change',
+                  'unit', 'kind', 'cause', 'changed']
+# relative noise floor: spreads smaller than this fraction of the median are considered to be this fraction, to avoid
+# flagging tiny shifts in (nearly) constant series
+NOISE_FLOOR = 0.005
+
+
+def lower_is_better(unit: str, perf_var: str = '', directions: dict = None) -> bool:
+    """
+    Return whether lower values of a perf variable with the given unit are better, e.g. for times and latencies.
+    directions maps shell-style patterns of perf variables to 'lower' or 'higher' (see get_directions()), to set the
+    direction explicitly for perf variables whose unit does not tell it.
+    """
+    for pattern, direction in (directions or {}).items():
+        if fnmatch.fnmatchcase(perf_var or '', pattern):
+            return direction == 'lower'
+    if unit in LOWER_IS_BETTER_UNITS or LOWER_IS_BETTER_UNIT_REGEX.match(unit or ''):
+        return True
+    return bool(re.search(r'(^|_)(time|latency|startup)(_|$)', perf_var or ''))
+
+
+def add_direction_arguments(parser: argparse.ArgumentParser):
+    """Add the arguments to set the direction of perf variables explicitly, see lower_is_better(), to parser"""
+    parser.add_argument("--lower-is-better", action='append', default=[], metavar='PERF_VAR',
+                        help="Perf variable (shell-style pattern) for which lower values are better (repeatable)")
+    parser.add_argument("--higher-is-better", action='append', default=[], metavar='PERF_VAR',
+                        help="Perf variable (shell-style pattern) for which higher values are better (repeatable)")
+
+
+def get_directions(args: argparse.Namespace) -> dict:
+    """Return the directions for lower_is_better() from the arguments added by add_direction_arguments()"""
+    directions = {x: 'lower' for x in args.lower_is_better}
+    directions.update({x: 'higher' for x in args.higher_is_better})
+    return directions
+
+
+def _scale(values: list) -> float:
+    """Return the robust spread of values, with a floor of NOISE_FLOOR times their median"""
+    return max(stats.mad(values), NOISE_FLOOR * abs(stats.median(values)), 1e-300)
+
+
+def _significant(center: float, value: float, scale: float, threshold: float, min_change: float) -> bool:
+    shift = abs(value - center)
+    return shift > threshold * scale and shift >= min_change * abs(center)
+
+
+def mad_changes(values: list, window: int = 10, min_points: int = 3, threshold: float = 3.5,
+                min_change: float = 0.05) -> list:
+    """
+    Return the indices of the shifts in values, found with a moving median/MAD window, see the module docstring.
+    After a shift, the baseline restarts at the shift.
+    """
+    changes = []
+    start = 0
+    i = start + min_points
+    while i + min_points <= len(values):
+        baseline = values[max(start, i - window):i]
+        center, scale = stats.median(baseline), _scale(baseline)
+        after = values[i:i + min_points]
+        if (
+            all(_significant(center, x, scale, threshold, min_change) for x in after)
+            and len({x > center for x in after}) == 1
+        ):
+            changes.append(i)
+            start = i
+            i = start + min_points
+        else:
+            i += 1
+    return changes
+
+
+def cusum_changes(values: list, window: int = 10, min_points: int = 3, threshold: float = 5.0, drift: float = 0.5,
+                  min_change: float = 0.05) -> list:
+    """
+    Return the indices of the shifts in values, found with a two-sided CUSUM on the deviations from the median of a
+    baseline window, in units of its MAD, see the module docstring. After a shift, the baseline restarts at the
+    shift.
+
+    Arguments:
+    - drift: deviation (in units of the MAD) that is tolerated per result before it is accumulated
+    """
+    changes = []
+    start = 0
+    while True:
+        baseline = values[start:start + window]
+        if len(baseline) < min_points or start + len(baseline) >= len(values):
+            return changes
+        center, scale = stats.median(baseline), _scale(baseline)
+        sums = {'up': 0.0, 'down': 0.0}
+        begins = {'up': None, 'down': None}
+        for i in range(start + len(baseline), len(values)):
+            deviation = (values[i] - center) / scale
+            for direction, sign in [('up', 1), ('down', -1)]:
+                sums[direction] = max(0.0, sums[direction] + sign * deviation - drift)
+                if sums[direction] == 0:
+                    begins[direction] = None
+                elif begins[direction] is None:
+                    begins[direction] = i
+            alarms = [x for x in sums if sums[x] > threshold and i + 1 - begins[x] >= min_points]
+            if alarms:
+                begin = begins[alarms[0]]
+                if abs(stats.median(values[begin:i + 1]) - center) >= min_change * abs(center):
+                    changes.append(begin)
+                    start = begin
+                    break
+                # the shift is too small to be of interest: restart the accumulation
+                sums = {'up': 0.0, 'down': 0.0}
+                begins = {'up': None, 'down': None}
+        else:
+            return changes
+
+
+def _most_common(results: list, column: str):
+    counter = collections.Counter(x.get(column) for x in results if x.get(column) is not None)
+    return counter.most_common(1)[0][0] if counter else None
+
+
+def changed_metadata(before: list, after: list) -> dict:
+    """
+    Return the metadata (STACK_COLUMNS and TESTSUITE_COLUMNS) that differs between the results before and after a
+    shift, as a dict column -> (most common value before, most common value after)
+    """
+    changed = {}
+    for column in STACK_COLUMNS + TESTSUITE_COLUMNS:
+        old, new = _most_common(before, column), _most_common(after, column)
+        if old != new:
+            changed[column] = (old, new)
+    return changed
+
+
+def get_cause(changed: dict) -> str:
+    """Classify the metadata that changed with a shift, see changed_metadata()"""
+    causes = []
+    if any(x in changed for x in STACK_COLUMNS):
+        causes.append('stack')
+    if any(x in changed for x in TESTSUITE_COLUMNS):
+        causes.append('testsuite')
+    return '+'.join(causes) if causes else 'other'
+
+
+def _shift(series: list, begin: int, end: int, before: list, method: str, directions: dict = None) -> dict:
+    first = series[begin]
+    center = stats.median([x['value'] for x in before])
+    value = stats.median([x['value'] for x in series[begin:end]])
+    change = (value - center) / abs(center) if center else float('inf')
+    worse = (change > 0) == lower_is_better(first.get('unit'), first.get('perf_var'), directions)
+    changed = changed_metadata(before, series[begin:end])
+    return {
+        'test': first['test'],
+        'params': first['params'],
+        'system': first['system'],
+        'partition': first['partition'],
+        'module': first.get('module'),
+        'perf_var': first['perf_var'],
+        'unit': first.get('unit'),
+        'first_bad': store.format_time(first['timestamp']),
+        'timestamp': first['timestamp'],
+        'before': center,
+        'after': value,
+        'change': change,
+        'kind': 'regression' if worse else 'improvement',
+        'method': method,
+        'cause': get_cause(changed),
+        'changed': ', '.join(f'{x}: {old} -> {new}' for x, (old, new) in changed.items()),
+    }
+
+
+def detect(series: list, method: str = 'mad', window: int = 10, min_points: int = 3, threshold: float = None,
+           min_change: float = 0.05, directions: dict = None) -> list:
+    """
+    Detect the shifts in a series of results (dicts with the store.COLUMNS, ordered by time) of a single perf
+    variable, see the module docstring. Returns a list of dicts with the REPORT_COLUMNS, plus timestamp, module and
+    method. The default threshold is 3.5 for method mad and 5 for method cusum. directions sets whether lower is
+    better for perf variables explicitly, see lower_is_better().
+    """
+    series = [x for x in series if x.get('value') is not None]
+    values = [x['value'] for x in series]
+    if method == 'mad':
+        threshold = 3.5 if threshold is None else threshold
+        changes = mad_changes(values, window, min_points, threshold, min_change)
+    elif method == 'cusum':
+        threshold = 5.0 if threshold is None else threshold
+        changes = cusum_changes(values, window, min_points, threshold, min_change=min_change)
+    else:
+        raise ValueError(f'unknown method: {method}')
+
+    shifts = []
+    bounds = [0] + changes + [len(series)]
+    for i, begin in enumerate(changes):
+        before = series[max(bounds[i], begin - window):begin]
+        shifts.append(_shift(series, begin, min(bounds[i + 2], begin + window), before, method, directions))
+
+    # an unconfirmed deviation of the last result
+    last = len(series) - 1
+    start = changes[-1] if changes else 0
+    baseline = values[max(start, last - window):last]
+    if len(baseline) >= min_points and last not in changes:
+        if _significant(stats.median(baseline), values[last], _scale(baseline), threshold, min_change):
+            shift = _shift(series, last, last + 1, series[max(start, last - window):last], method, directions)
+            shift['kind'] = 'outlier'
+            shifts.append(shift)
+    return shifts
+
+
+def find_regressions(results: list, **kwargs) -> list:
+    """
+    Detect the shifts in all series of results (dicts with the store.COLUMNS, ordered by time), see detect() for
+    kwargs. Returns the shifts ordered by time, most recent first.
+    """
+    shifts = []
+    for series in store.group_results(results).values():
+        shifts.extend(detect(series, **kwargs))
+    return sorted(shifts, key=lambda x: x['timestamp'], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect performance regressions in the history of perf variables.")
+    parser.add_argument("database", help="SQLite database, see eessi.testsuite.analysis.store")
+    store.add_filter_arguments(parser)
+    parser.add_argument("--method", choices=['mad', 'cusum'], default='mad', help="Change detection method")
+    parser.add_argument("--window", type=int, default=10, help="Number of results in the baseline window")
+    parser.add_argument("--min-points", type=int, default=3, help="Number of results needed to confirm a shift")
+    parser.add_argument("--threshold", type=float,
+                        help="Detection threshold in units of the MAD (default: 3.5 for mad, 5 for cusum)")
+    parser.add_argument("--min-change", type=float, default=0.05, help="Minimal relative change to report")
+    parser.add_argument("--regressions-only", action='store_true', help="Do not report improvements")
+    add_direction_arguments(parser)
+    parser.add_argument("--format", choices=['table', 'csv', 'json'], default='table', help="Output format")
+    args = parser.parse_args()
+
+    with store.PerfStore(args.database) as perf_store:
+        results = perf_store.query(**store.get_filters(args))
+    shifts = find_regressions(results, method=args.method, window=args.window, min_points=args.min_points,
+                              threshold=args.threshold, min_change=args.min_change,
+                              directions=get_directions(args))
+    if args.regressions_only:
+        shifts = [x for x in shifts if x['kind'] != 'improvement']
+    if args.format == 'table':
+        for shift in shifts:
+            shift['change'] = f"{shift['change']:+.1%}"
+    store.print_results(shifts, REPORT_COLUMNS, args.format)
+
+
+if __name__ == "__main__":
+    main()
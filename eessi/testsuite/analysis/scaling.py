@@ -0,0 +1,272 @@
+"""
+Generate scaling curves from the results of the same test at different SCALES (see eessi.testsuite.constants), as
+ingested with eessi.testsuite.analysis.store.
+
+Results are grouped by test class, parameters other than the scale, system, partition and perf variable. Within a
+group, the results at each scale are combined with the median over the runs, and normalised by the number of
+resources used: GPUs for GPU runs, cores (num_tasks * num_cpus_per_task) otherwise. Relative to the smallest scale
+(p = resources / resources of the smallest scale):
+- speedup: value / value at the smallest scale, or the inverse for perf variables for which lower is better (times)
+- strong_efficiency: speedup / p, for tests with a fixed problem size (strong scaling)
+- weak_efficiency: for tests whose problem size grows with the resources (weak scaling), the time at the smallest
+  scale / time for times, and the throughput per resource relative to the smallest scale for throughputs (which
+  equals their strong_efficiency)
+For each group, Amdahl's law (speedup = 1 / (s + (1 - s) / p)) is fitted to the strong-scaling speedups, and
+Gustafson's law (scaled speedup = p - alpha * (p - 1)) to the weak-scaling speedups, and the first scale at which
+the strong-scaling efficiency drops below collapse_threshold is reported.
+
+The report is written as a CSV file (scaling.csv) with one row per scale, and a static HTML page (scaling.html) with
+a table of the fits and an SVG plot of the speedup per group.
+
+Usage:
+    python -m eessi.testsuite.analysis.scaling DATABASE OUTPUT_DIR [--test TEST] [--system SYSTEM] [...]
+        [--collapse-threshold COLLAPSE_THRESHOLD]
+"""
+import argparse
+import collections
+import csv
+import html
+import math
+import os
+import re
+
+from eessi.testsuite import stats
+from eessi.testsuite.analysis import regressions, store
+from eessi.testsuite.constants import SCALES
+
+CSV_COLUMNS = ['test', 'params', 'system', 'partition', 'perf_var', 'unit', 'scale', 'resource', 'count', 'nodes',
+               'runs', 'value', 'speedup', 'strong_efficiency', 'weak_efficiency']
+FIT_COLUMNS = ['test', 'params', 'system', 'partition', 'perf_var', 'scales', 'serial_fraction',
+               'amdahl_max_speedup', 'gustafson_alpha', 'collapse']
+_SCALE_REGEX = re.compile(r'%scale=(?P<scale>\S+)')
+
+
+def split_scale(params: str) -> tuple:
+    """Split the scale from test parameters, e.g. '%scale=1_node %module_name=X' into ('1_node', '%module_name=X')"""
+    match = _SCALE_REGEX.search(params or '')
+    if not match:
+        return None, params
+    return match.group('scale'), ' '.join(_SCALE_REGEX.sub('', params).split())
+
+
+def get_resources(result: dict, scale: str = None) -> tuple:
+    """
+    Return the resources used by a result as (resource, count, nodes), where resource is 'gpus' or 'cores',
+    or None if the number of tasks is unknown
+    """
+    num_tasks = result.get('num_tasks')
+    if not num_tasks:
+        return None
+    tasks_per_node = result.get('num_tasks_per_node')
+    if tasks_per_node:
+        nodes = math.ceil(num_tasks / tasks_per_node)
+    else:
+        nodes = SCALES.get(scale, {}).get('num_nodes', 1)
+    if result.get('num_gpus_per_node'):
+        return 'gpus', nodes * result['num_gpus_per_node'], nodes
+    return 'cores', num_tasks * (result.get('num_cpus_per_task') or 1), nodes
+
+
+def fit_amdahl(points: list):
+    """
+    Fit Amdahl's law to (p, speedup) points by least squares on 1 / speedup, and return the serial fraction s,
+    clipped to [0, 1], or None if there are no points with p > 1
+    """
+    pairs = [(1 - 1 / p, 1 / speedup - 1 / p) for p, speedup in points if p > 1 and speedup > 0]
+    denominator = sum(x * x for x, _ in pairs)
+    if not denominator:
+        return None
+    return min(max(sum(x * y for x, y in pairs) / denominator, 0.0), 1.0)
+
+
+def fit_gustafson(points: list):
+    """
+    Fit Gustafson's law to (p, scaled speedup) points by least squares, and return the serial fraction alpha,
+    clipped to [0, 1], or None if there are no points with p > 1
+    """
+    pairs = [(p - 1, p - speedup) for p, speedup in points if p > 1]
+    denominator = sum(x * x for x, _ in pairs)
+    if not denominator:
+        return None
+    return min(max(sum(x * y for x, y in pairs) / denominator, 0.0), 1.0)
+
+
+def scaling_curves(results: list, collapse_threshold: float = 0.5) -> list:
+    """
+    Compute the scaling curves of results (dicts with the store.COLUMNS), see the module docstring.
+    Returns a list of dicts (one per group with at least 2 scales) with the FIT_COLUMNS, plus unit, resource and
+    points, a list of dicts with the CSV_COLUMNS sorted by the number of resources.
+    """
+    groups = collections.OrderedDict()
+    for result in results:
+        if result.get('value') is None:
+            continue
+        scale, params = split_scale(result['params'])
+        resources = get_resources(result, scale)
+        if scale is None or resources is None:
+            continue
+        key = (result['test'], params, result['system'], result['partition'], result['perf_var'])
+        groups.setdefault(key, collections.OrderedDict()).setdefault(scale, []).append((result, resources))
+
+    curves = []
+    for (test, params, system, partition, perf_var), scales in groups.items():
+        if len(scales) < 2:
+            continue
+        points = []
+        for scale, runs in scales.items():
+            resource, count, nodes = collections.Counter(x[1] for x in runs).most_common(1)[0][0]
+            points.append({
+                'test': test, 'params': params, 'system': system, 'partition': partition, 'perf_var': perf_var,
+                'unit': runs[-1][0].get('unit'), 'scale': scale, 'resource': resource, 'count': count,
+                'nodes': nodes, 'runs': len(runs), 'value': stats.median([x[0]['value'] for x in runs]),
+            })
+        if len({x['resource'] for x in points}) > 1:
+            # mixed CPU and GPU runs cannot be put on the same curve
+            continue
+        points.sort(key=lambda x: (x['count'], x['nodes'], x['scale']))
+        base = points[0]
+        lower = regressions.lower_is_better(base['unit'], perf_var)
+        for point in points:
+            p = point['count'] / base['count']
+            if point['value'] and base['value']:
+                ratio = point['value'] / base['value']
+                point['speedup'] = 1 / ratio if lower else ratio
+            else:
+                point['speedup'] = None
+            point['strong_efficiency'] = point['speedup'] / p if point['speedup'] is not None else None
+            # for weak scaling the work grows with p, so the speedup of throughputs is per resource, and the
+            # time-to-solution should remain constant
+            if point['speedup'] is None:
+                point['weak_efficiency'] = None
+            elif lower:
+                point['weak_efficiency'] = point['speedup']
+            else:
+                point['weak_efficiency'] = point['speedup'] / p
+
+        strong = [(x['count'] / base['count'], x['speedup']) for x in points if x['speedup'] is not None]
+        weak = [(x['count'] / base['count'], x['weak_efficiency'] * x['count'] / base['count'])
+                for x in points if x['weak_efficiency'] is not None]
+        serial_fraction = fit_amdahl(strong)
+        collapse = next((x['scale'] for x in points[1:]
+                         if x['strong_efficiency'] is not None and x['strong_efficiency'] < collapse_threshold), None)
+        curves.append({
+            'test': test, 'params': params, 'system': system, 'partition': partition, 'perf_var': perf_var,
+            'unit': base['unit'], 'resource': base['resource'], 'scales': len(points),
+            'serial_fraction': serial_fraction,
+            'amdahl_max_speedup': 1 / serial_fraction if serial_fraction else None,
+            'gustafson_alpha': fit_gustafson(weak),
+            'collapse': collapse,
+            'points': points,
+        })
+    return curves
+
+
+def svg_plot(curve: dict, width: int = 420, height: int = 300) -> str:
+    """Return an SVG plot of the speedup of a scaling curve versus the resources, on log2 axes"""
+    points = [x for x in curve['points'] if x['speedup'] and x['speedup'] > 0]
+    base = curve['points'][0]['count']
+    xs = [math.log2(x['count'] / base) for x in points]
+    ys = [math.log2(x['speedup']) for x in points]
+    x_max = max(xs + [1])
+    y_min, y_max = min(ys + [0]), max(ys + [x_max])
+    margin = 45
+
+    def _x(value):
+        return margin + (value / x_max) * (width - 2 * margin)
+
+    def _y(value):
+        return height - margin - (value - y_min) / ((y_max - y_min) or 1) * (height - 2 * margin)
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-size="10">']
+    parts.append(f'<rect x="{margin}" y="{margin}" width="{width - 2 * margin}" height="{height - 2 * margin}" '
+                 'fill="none" stroke="#999"/>')
+    for i in range(int(math.floor(x_max)) + 1):
+        parts.append(f'<text x="{_x(i):.1f}" y="{height - margin + 14}" text-anchor="middle">{base * 2 ** i:g}</text>')
+    for i in range(int(math.ceil(y_min)), int(math.floor(y_max)) + 1):
+        parts.append(f'<text x="{margin - 5}" y="{_y(i) + 3:.1f}" text-anchor="end">{2 ** i:g}</text>')
+    parts.append(f'<text x="{width / 2}" y="{height - 8}" text-anchor="middle">{html.escape(curve["resource"])}</text>')
+    parts.append(f'<text x="12" y="{height / 2}" text-anchor="middle" '
+                 f'transform="rotate(-90 12 {height / 2})">speedup</text>')
+    # ideal scaling
+    y_ideal = min(x_max, y_max)
+    parts.append(f'<line x1="{_x(0):.1f}" y1="{_y(0):.1f}" x2="{_x(y_ideal):.1f}" y2="{_y(y_ideal):.1f}" '
+                 'stroke="#999" stroke-dasharray="4"/>')
+    # Amdahl fit
+    if curve['serial_fraction'] is not None:
+        s = curve['serial_fraction']
+        fit = [(i / 20 * x_max, math.log2(1 / (s + (1 - s) / 2 ** (i / 20 * x_max)))) for i in range(21)]
+        path = ' '.join(f'{_x(x):.1f},{_y(y):.1f}' for x, y in fit if y_min <= y <= y_max)
+        parts.append(f'<polyline points="{path}" fill="none" stroke="#d62728"/>')
+    path = ' '.join(f'{_x(x):.1f},{_y(y):.1f}' for x, y in zip(xs, ys))
+    parts.append(f'<polyline points="{path}" fill="none" stroke="#1f77b4"/>')
+    for x, y, point in zip(xs, ys, points):
+        parts.append(f'<circle cx="{_x(x):.1f}" cy="{_y(y):.1f}" r="3" fill="#1f77b4">'
+                     f'<title>{html.escape(point["scale"])}: {point["value"]:.4g} {html.escape(point["unit"] or "")}'
+                     f'</title></circle>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def _format(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f'{value:.4g}'
+    return str(value)
+
+
+def write_csv(curves: list, filename: str):
+    """Write the points of the scaling curves to a CSV file"""
+    with open(filename, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for curve in curves:
+            writer.writerows(curve['points'])
+
+
+def write_html(curves: list, filename: str):
+    """Write a static HTML page with a table of the fits and a plot of the speedup of each scaling curve"""
+    parts = [
+        '<!DOCTYPE html>',
+        '<html><head><meta charset="utf-8"><title>EESSI test suite scaling report</title>',
+        '<style>body{font-family:sans-serif} table{border-collapse:collapse} '
+        'td,th{border:1px solid #ccc;padding:2px 6px} .curve{display:inline-block;margin:10px;vertical-align:top}'
+        '</style></head><body>',
+        '<h1>Scaling report</h1>',
+        '<p>Speedup relative to the smallest scale (blue), ideal scaling (dashed) and Amdahl fit (red). '
+        'Collapse is the first scale with a strong-scaling efficiency below the threshold.</p>',
+        '<table><tr>' + ''.join(f'<th>{x}</th>' for x in FIT_COLUMNS) + '</tr>',
+    ]
+    for curve in curves:
+        parts.append('<tr>' + ''.join(f'<td>{html.escape(_format(curve[x]))}</td>' for x in FIT_COLUMNS) + '</tr>')
+    parts.append('</table>')
+    for curve in curves:
+        title = f"{curve['test']} {curve['params']} @{curve['system']}:{curve['partition']} - {curve['perf_var']}"
+        parts.append(f'<div class="curve"><h3>{html.escape(title)}</h3>')
+        parts.append(svg_plot(curve))
+        parts.append('</div>')
+    parts.append('</body></html>')
+    with open(filename, 'w') as file:
+        file.write('\n'.join(parts) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scaling curves of the EESSI tests across scales.")
+    parser.add_argument("database", help="SQLite database, see eessi.testsuite.analysis.store")
+    parser.add_argument("output_dir", help="Directory to write scaling.csv and scaling.html to")
+    store.add_filter_arguments(parser)
+    parser.add_argument("--collapse-threshold", type=float, default=0.5,
+                        help="Strong-scaling efficiency below which the scaling is considered to collapse")
+    args = parser.parse_args()
+
+    with store.PerfStore(args.database) as perf_store:
+        results = perf_store.query(**store.get_filters(args))
+    curves = scaling_curves(results, args.collapse_threshold)
+    os.makedirs(args.output_dir, exist_ok=True)
+    write_csv(curves, os.path.join(args.output_dir, 'scaling.csv'))
+    write_html(curves, os.path.join(args.output_dir, 'scaling.html'))
+    print(f'{len(curves)} scaling curves written to {args.output_dir}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Compare the performance of the same tests and modules across EESSI software stacks, as ingested with
+eessi.testsuite.analysis.store, to show the impact of microarchitecture-specific builds and of stack updates.
+
+The stack of each result is identified by the EESSI version (e.g. 2023.06) and the CPU target subdirectory (e.g.
+x86_64/amd/zen3), as logged by the EESSI_Mixin in full_modulepath and cvmfs_software_subdir (in the string form of the
+list of values found in the job output, e.g. "['x86_64/amd/zen3']"). Two kinds of pairs of stacks are compared:
+- cpu_target: each CPU target against the generic build of the same architecture (e.g. x86_64/amd/zen3 against
+  x86_64/generic) in the same EESSI version, i.e. the gain of microarchitecture-specific builds
+- stack: each EESSI version against the previous one (e.g. 2025.06 against 2023.06), for the same CPU target
+
+Within a pair, test cases are matched as in eessi.testsuite.analysis.compare, i.e. on test class, parameters
+(including the module), system, partition and perf variable (or without system and partition with --ignore-system),
+so modules that are only available in one of the stacks are left out. For each pair, the geometric mean of the
+speedups of all matched perf variables summarises the impact, where speedups above 1 are improvements (also for
+perf variables for which lower is better, such as times).
+
+Usage:
+    python -m eessi.testsuite.analysis.stacks DATABASE [--test TEST] [--system SYSTEM] [...]
+        [--kind {all,cpu_target,stack}] [--ignore-system] [--confidence CONFIDENCE] [--min-change MIN_CHANGE]
+        [--lower-is-better PERF_VAR] [--higher-is-better PERF_VAR] [--details] [--format {table,csv,json}]
+"""
+import argparse
+import ast
+import json
+import math
+import re
+import sys
+
+from eessi.testsuite.analysis import compare, regressions, store
+
+SUMMARY_COLUMNS = ['kind', 'baseline', 'candidate', 'matched', 'better', 'worse', 'same', 'speedup']
+DETAIL_COLUMNS = ['kind', 'baseline_stack', 'candidate_stack'] + compare.REPORT_COLUMNS
+KINDS = ['cpu_target', 'stack']
+
+_VERSION_REGEX = re.compile(r'/versions/(?P<version>[^/]+)/')
+_SUBDIR_REGEX = re.compile(r'/software/(?:linux/)?(?P<subdir>.+?)/modules(?:/|$)')
+
+
+def get_logged_value(value: str) -> str:
+    """
+    Return the value of a variable that the EESSI_Mixin extracted from the job output, which is logged in the string
+    form of the list of all values found, e.g. "['x86_64/amd/zen3']". Returns the first value found, or None if none
+    was found. Plain values are returned as is.
+    """
+    if value in (None, '', 'None', '[]'):
+        return None
+    if not value.startswith('['):
+        return value
+    try:
+        values = ast.literal_eval(value)
+    except (SyntaxError, ValueError):
+        return None
+    if not isinstance(values, list) or not values:
+        return None
+    return str(values[0]) or None
+
+
+def get_stack(result: dict) -> tuple:
+    """
+    Return the EESSI version and the CPU target subdirectory of the stack of a result (dict with the store.COLUMNS),
+    or None if the result was not obtained with EESSI. The subdirectory is taken from cvmfs_software_subdir, or else
+    from full_modulepath.
+    """
+    modulepath = result.get('full_modulepath') or ''
+    version = _VERSION_REGEX.search(modulepath)
+    subdir = get_logged_value(result.get('cvmfs_software_subdir'))
+    if subdir is None:
+        match = _SUBDIR_REGEX.search(modulepath)
+        subdir = match.group('subdir') if match else None
+    if not version or not subdir:
+        return None
+    return version.group('version'), subdir
+
+
+def format_stack(stack: tuple) -> str:
+    """Format a stack (version, subdir), e.g. '2023.06 x86_64/amd/zen3'"""
+    return ' '.join(stack)
+
+
+def is_generic(subdir: str) -> bool:
+    """Return whether a CPU target subdirectory is a generic build, e.g. x86_64/generic"""
+    return subdir.split('/')[-1] == 'generic'
+
+
+def get_pairs(stacks, kinds=None) -> list:
+    """
+    Return the pairs of stacks (version, subdir) to compare, as a list of (kind, baseline, candidate), see the module
+    docstring
+    """
+    kinds = kinds or KINDS
+    stacks = set(stacks)
+    pairs = []
+    if 'cpu_target' in kinds:
+        for version, subdir in sorted(stacks):
+            generic = (version, f"{subdir.split('/')[0]}/generic")
+            if not is_generic(subdir) and generic in stacks:
+                pairs.append(('cpu_target', generic, (version, subdir)))
+    if 'stack' in kinds:
+        for subdir in sorted({x[1] for x in stacks}):
+            versions = sorted(x[0] for x in stacks if x[1] == subdir)
+            for old, new in zip(versions, versions[1:]):
+                pairs.append(('stack', (old, subdir), (new, subdir)))
+    return pairs
+
+
+def speedup(matched: list) -> float:
+    """Return the geometric mean of the speedups (1 + gain) of the matched perf variables, see compare.compare()"""
+    speedups = [1 + x['gain'] for x in matched if 0 < 1 + x['gain'] < math.inf]
+    if not speedups:
+        return None
+    return math.exp(sum(math.log(x) for x in speedups) / len(speedups))
+
+
+def compare_stacks(results: list, kinds=None, **kwargs) -> tuple:
+    """
+    Compare the results (dicts with the store.COLUMNS) across stacks, see the module docstring, and return
+    (summary, details):
+    - summary: list of dicts with the SUMMARY_COLUMNS, one per pair of stacks
+    - details: list of dicts with the DETAIL_COLUMNS, one per matched perf variable of each pair
+
+    Arguments:
+    - kinds: kinds of pairs to compare (default: all KINDS)
+    - kwargs: see compare.compare()
+    """
+    by_stack = {}
+    for result in results:
+        stack = get_stack(result)
+        if stack is not None:
+            by_stack.setdefault(stack, []).append(result)
+
+    summary = []
+    details = []
+    for kind, baseline, candidate in get_pairs(by_stack, kinds):
+        matched = compare.compare(by_stack[baseline], by_stack[candidate], **kwargs)['matched']
+        if not matched:
+            continue
+        verdicts = [x['verdict'] for x in matched]
+        summary.append({
+            'kind': kind,
+            'baseline': format_stack(baseline),
+            'candidate': format_stack(candidate),
+            'matched': len(matched),
+            'better': verdicts.count('better'),
+            'worse': verdicts.count('worse'),
+            'same': verdicts.count('same'),
+            'speedup': speedup(matched),
+        })
+        for row in matched:
+            details.append(dict(row, kind=kind, baseline_stack=format_stack(baseline),
+                                candidate_stack=format_stack(candidate)))
+    return summary, details
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the performance of tests across EESSI software stacks.")
+    parser.add_argument("database", help="SQLite database, see eessi.testsuite.analysis.store")
+    store.add_filter_arguments(parser)
+    parser.add_argument("--kind", choices=['all'] + KINDS, default='all', help="Kind of stacks to compare")
+    parser.add_argument("--ignore-system", action='store_true', help="Match test cases across systems/partitions")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals")
+    parser.add_argument("--min-change", type=float, default=0.02,
+                        help="Minimal relative change to consider significant when no samples are available")
+    regressions.add_direction_arguments(parser)
+    parser.add_argument("--details", action='store_true', help="Also report each matched perf variable")
+    parser.add_argument("--format", choices=['table', 'csv', 'json'], default='table', help="Output format")
+    args = parser.parse_args()
+
+    with store.PerfStore(args.database) as perf_store:
+        results = perf_store.query(**store.get_filters(args))
+    summary, details = compare_stacks(results, kinds=None if args.kind == 'all' else [args.kind],
+                                      ignore_system=args.ignore_system, confidence=args.confidence,
+                                      min_change=args.min_change, directions=regressions.get_directions(args))
+
+    if args.format == 'json':
+        json.dump({'summary': summary, 'details': details if args.details else []}, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    if args.format == 'csv':
+        if args.details:
+            store.print_results(details, DETAIL_COLUMNS, 'csv')
+        else:
+            store.print_results(summary, SUMMARY_COLUMNS, 'csv')
+        return
+
+    if not summary:
+        print('No test cases found in more than one stack')
+        return
+    print('Geometric mean speedup of the candidate stack over the baseline stack (> 1 is better):')
+    store.print_results(summary, SUMMARY_COLUMNS)
+    if args.details:
+        print()
+        store.print_results(details, DETAIL_COLUMNS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,733 @@
+"""
+Store the performance results of the EESSI test suite in a local SQLite database and query them.
+
+Results are ingested from:
+- perflogs, as written by the perflog handler of common_config.common_logging_config(): a header line, followed by
+  one line per test case with the fields of perflog_format, and the fields of format_perfvars for each perf variable,
+  all separated by '|'
+- JSON-lines perflogs (*.jsonl), as written by the JSON-lines perflog handler of common_config
+- ReFrame run reports (run-report-<sessionid>.json)
+
+Ingestion is incremental: the store keeps track of how far each file was read, so only the lines that were appended
+to a perflog since the previous ingestion are parsed, and run reports that did not change are skipped. Results that
+are found more than once (e.g. in a perflog and in the run report of the same session) are stored once.
+
+Usage:
+    python -m eessi.testsuite.analysis.store ingest DATABASE PATH [PATH ...]
+    python -m eessi.testsuite.analysis.store query DATABASE [--test TEST] [--system SYSTEM] [--partition PARTITION]
+        [--module MODULE] [--perf-var PERF_VAR] [--since SINCE] [--until UNTIL] [--format {table,csv,json}]
+"""
+import argparse
+import calendar
+import csv
+import datetime
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+# columns of the results table and their types
+COLUMNS = {
+    'timestamp': 'INTEGER',  # job completion time (unix time)
+    'test': 'TEXT',  # test class, e.g. EESSI_LAMMPS_lj
+    'params': 'TEXT',  # test parameters, e.g. '%scale=1_node %module_name=LAMMPS/2Aug2023_update2-foss-2023a-kokkos'
+    'system': 'TEXT',
+    'partition': 'TEXT',
+    'environ': 'TEXT',
+    'module': 'TEXT',  # module_name parameter of the test, or else the modules loaded by the test
+    'jobid': 'TEXT',
+    'num_tasks': 'INTEGER',
+    'num_cpus_per_task': 'INTEGER',
+    'num_tasks_per_node': 'INTEGER',
+    'num_gpus_per_node': 'INTEGER',
+    'perf_var': 'TEXT',
+    'value': 'REAL',
+    'reference': 'REAL',
+    'lower_thres': 'REAL',
+    'upper_thres': 'REAL',
+    'unit': 'TEXT',
+    'result': 'TEXT',  # result of the test case (pass/fail), if known
+    'cvmfs_repo_name': 'TEXT',
+    'cvmfs_software_subdir': 'TEXT',
+    'full_modulepath': 'TEXT',
+    'eessi_testsuite_version': 'TEXT',
+    'source': 'TEXT',  # file from which the result was ingested
+}
+# columns that identify a result; these are never NULL, since SQLite considers NULLs to be distinct in unique indexes
+KEY_COLUMNS = ['timestamp', 'test', 'params', 'system', 'partition', 'environ', 'jobid', 'perf_var']
+# columns that are filtered with shell-style patterns in query()
+PATTERN_COLUMNS = ['test', 'params', 'system', 'partition', 'environ', 'module', 'perf_var']
+# columns that identify a series of results of the same perf variable of the same test case over time
+SERIES_COLUMNS = ['test', 'params', 'system', 'partition', 'module', 'perf_var']
+# columns that are printed by the query command by default
+DEFAULT_QUERY_COLUMNS = ['timestamp', 'test', 'system', 'partition', 'module', 'perf_var', 'value', 'unit']
+
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS results ({})'.format(', '.join(f'{name} {type_}' for name, type_ in COLUMNS.items())),
+    f'CREATE UNIQUE INDEX IF NOT EXISTS results_key ON results ({", ".join(KEY_COLUMNS)})',
+    'CREATE INDEX IF NOT EXISTS results_lookup ON results (test, system, partition, module, perf_var, timestamp)',
+    'CREATE INDEX IF NOT EXISTS results_timestamp ON results (timestamp)',
+    'CREATE TABLE IF NOT EXISTS sources '
+    '(path TEXT PRIMARY KEY, inode INTEGER, size INTEGER, mtime_ns INTEGER, offset INTEGER, header TEXT)',
+]
+
+_TIME_REGEX = re.compile(
+    r'^(?P<date>\d{4}-\d{2}-\d{2})(?:[T ](?P<time>\d{2}:\d{2}(?::\d{2})?)(?:\.\d+)?)?(?P<tz>Z|[+-]\d{2}:?\d{2})?$'
+)
+_NUMBER_REGEX = re.compile(r'^[-+]?\d+(?:\.\d*)?$')
+_NAME_REGEX = re.compile(r'^(?P<test>\S+)(?P<params>(?:\s+%\S+)*)')
+_MODULE_NAME_REGEX = re.compile(r'%module_name=(?P<module>\S+)')
+
+
+def parse_time(value) -> int:
+    """
+    Convert a time to unix time: numbers are returned as is (rounded down to whole seconds), strings are parsed as
+    ISO 8601 dates or times, e.g. '2024-05-01', '2024-05-01T12:00:00' or '2024-05-01T12:00:00+02:00'. Times without
+    a time zone are local times.
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = value.strip()
+    if _NUMBER_REGEX.match(value):
+        return int(float(value))
+    match = _TIME_REGEX.match(value)
+    if not match:
+        raise ValueError(f'invalid time: {value!r}')
+    clock = match.group('time') or '00:00'
+    if len(clock) == 5:
+        clock += ':00'
+    dt = datetime.datetime.strptime(f"{match.group('date')}T{clock}", '%Y-%m-%dT%H:%M:%S')
+    tz = match.group('tz')
+    if tz is None:
+        return int(time.mktime(dt.timetuple()))
+    offset = 0
+    if tz != 'Z':
+        digits = tz[1:].replace(':', '')
+        offset = (-1 if tz[0] == '-' else 1) * (int(digits[:2]) * 3600 + int(digits[2:]) * 60)
+    return calendar.timegm(dt.timetuple()) - offset
+
+
+def format_time(timestamp) -> str:
+    """Format a unix time as a local ISO 8601 time, e.g. '2024-05-01T12:00:00'"""
+    if timestamp is None:
+        return ''
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def split_name(name: str) -> tuple:
+    """
+    Split the display name or the info of a test case into the test class and its parameters, e.g.
+    'EESSI_LAMMPS_lj %scale=1_node %module_name=LAMMPS/2Aug2023 /8a3f7f0b @snellius:genoa+default' into
+    ('EESSI_LAMMPS_lj', '%scale=1_node %module_name=LAMMPS/2Aug2023')
+    """
+    match = _NAME_REGEX.match(name.strip())
+    if not match:
+        return name, ''
+    return match.group('test'), ' '.join(match.group('params').split())
+
+
+def get_module(params: str, modules) -> str:
+    """Return the module_name parameter in params, or else the loaded modules"""
+    match = _MODULE_NAME_REGEX.search(params)
+    if match:
+        return match.group('module')
+    if isinstance(modules, (list, tuple)):
+        return ','.join(modules)
+    return modules
+
+
+def _to_float(value):
+    if value is None or value in ('', 'null', 'None'):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    value = _to_float(value)
+    return int(value) if value is not None else None
+
+
+def _to_str(value):
+    if value is None or value in ('null', 'None', '<undefined>'):
+        return None
+    if isinstance(value, (list, tuple)):
+        return ','.join(str(x) for x in value)
+    return str(value)
+
+
+def _get_perf_var_starts(fields: list) -> list:
+    """
+    Return the indices of the fields that start the fields of a perf variable in the header of a perflog, i.e. the
+    '<name>_var' fields that are followed by a '<name>_value' field
+    """
+    return [
+        i for i, field in enumerate(fields[:-1])
+        if field.endswith('_var') and fields[i + 1] == field[:-len('var')] + 'value'
+    ]
+
+
+def is_perflog_header(line: str) -> bool:
+    """
+    Return whether line is the header of a perflog, i.e. a list of field names separated by '|' that includes the
+    fields of at least one perf variable. Field names are not restricted otherwise, since they include the names of
+    the perf variables, e.g. 'h_psi:calbec_var'.
+    """
+    fields = line.rstrip('\n').split('|')
+    if len(fields) < 2 or _TIME_REGEX.match(fields[0].strip()) or _NUMBER_REGEX.match(fields[0].strip()):
+        return False
+    return bool(_get_perf_var_starts(fields))
+
+
+def parse_perflog_header(line: str) -> tuple:
+    """
+    Split the header of a perflog into the names of the fields of the test case and the names of the fields of each
+    perf variable (with the name of the perf variable left out), e.g.
+    'job_completion_time|...|jobid|time_var|time_value|time_lower_thres|time_upper_thres|time_unit' into
+    (['job_completion_time', ..., 'jobid'], ['var', 'value', 'lower_thres', 'upper_thres', 'unit'])
+
+    The fields of a perf variable run up to the '<name>_var' field of the next perf variable, so perf variables whose
+    names share a prefix (e.g. 'perf' and 'perf_per_core') are kept apart:
+
+    >>> parse_perflog_header('jobid|perf_var|perf_value|perf_unit|perf_per_core_var|perf_per_core_value|'
+    ...                      'perf_per_core_unit|')
+    (['jobid'], ['var', 'value', 'unit'])
+    """
+    fields = line.rstrip('\n').split('|')
+    while fields and not fields[-1]:
+        fields.pop()
+    starts = _get_perf_var_starts(fields)
+    if not starts:
+        return fields, []
+    prefix = fields[starts[0]][:-len('var')]
+    end = starts[1] if len(starts) > 1 else len(fields)
+    return fields[:starts[0]], [x[len(prefix):] for x in fields[starts[0]:end]]
+
+
+def parse_perflog_line(line: str, case_fields: list, perf_fields: list) -> list:
+    """
+    Parse a line of a perflog into one result (dict with the COLUMNS) per perf variable, see parse_perflog_header()
+    for case_fields and perf_fields. Returns an empty list if the line cannot be parsed.
+    """
+    fields = line.rstrip('\n').split('|')
+    if fields and not fields[-1]:
+        fields.pop()
+    case = dict(zip(case_fields, fields))
+    perf = fields[len(case_fields):]
+    if len(fields) < len(case_fields) or not perf_fields or len(perf) % len(perf_fields):
+        return []
+    try:
+        timestamp = parse_time(case.get('job_completion_time_unix') or case.get('job_completion_time', ''))
+    except ValueError:
+        return []
+
+    name = case.get('display_name') or case.get('info') or case.get('name') or ''
+    test, params = split_name(name)
+    result = {
+        'timestamp': timestamp,
+        'test': test,
+        'params': params,
+        'module': get_module(params, case.get('modules')),
+    }
+    for column in COLUMNS:
+        if column in case and column not in result:
+            result[column] = case[column]
+
+    results = []
+    for i in range(0, len(perf), len(perf_fields)):
+        perfvar = dict(zip(perf_fields, perf[i:i + len(perf_fields)]))
+        results.append(dict(
+            result,
+            perf_var=perfvar.get('var'),
+            value=perfvar.get('value'),
+            reference=perfvar.get('ref'),
+            lower_thres=perfvar.get('lower_thres'),
+            upper_thres=perfvar.get('upper_thres'),
+            unit=perfvar.get('unit'),
+        ))
+    return results
+
+
+def parse_testcase(testcase: dict, default_timestamp=None) -> list:
+    """Convert a test case of a ReFrame run report into one result (dict with the COLUMNS) per perf variable"""
+    perfvalues = testcase.get('perfvalues') or {}
+    timestamp = testcase.get('job_completion_time_unix') or default_timestamp
+    if not perfvalues or timestamp is None:
+        return []
+
+    test, params = split_name(testcase.get('display_name') or testcase.get('name') or '')
+    result = {
+        'timestamp': parse_time(timestamp),
+        'test': test,
+        'params': params,
+        'module': get_module(params, testcase.get('modules')),
+    }
+    for column in COLUMNS:
+        if column in testcase and column not in result:
+            result[column] = testcase[column]
+
+    results = []
+    for key, info in perfvalues.items():
+        value, reference, lower, upper, unit = info[:5]
+        results.append(dict(
+            result,
+            perf_var=key.split(':')[-1],
+            value=value,
+            reference=reference,
+            lower_thres=lower,
+            upper_thres=upper,
+            unit=unit,
+        ))
+    return results
+
+
+def parse_jsonlines_record(record: dict) -> list:
+    """
+    Convert a record of a JSON-lines perflog (see common_config.jsonlines_record()) into one result (dict with the
+    COLUMNS) per perf variable
+    """
+    testcase = dict(record)
+    testcase.update(record.get('job') or {})
+    testcase.update(record.get('eessi') or {})
+    testcase['perfvalues'] = {
+        name: [x.get('value'), x.get('ref'), x.get('lower_thres'), x.get('upper_thres'), x.get('unit')]
+        for name, x in (record.get('perfvars') or {}).items()
+    }
+    return parse_testcase(testcase)
+
+
+class _JSONStream:
+    """
+    Incremental reader of a JSON document in a file, which decodes one value at a time with json.JSONDecoder, so that
+    large documents can be walked without loading them as a whole
+    """
+    _WHITESPACE = ' \t\n\r'
+
+    def __init__(self, file, chunk_size: int = 1 << 20):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self, size: int) -> bool:
+        """Append at least size characters (unless the end of the file is reached) to the buffer"""
+        if self.eof:
+            return False
+        if self.pos > self.chunk_size:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        data = self.file.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer += data
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self._WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._read(self.chunk_size):
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        """Consume and return the next character, which must be one of chars"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f'invalid JSON: expected one of {chars!r}, got {char!r} in {self.file.name}')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode and return the next value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                end = None
+            # a value that ends at the end of the buffer may be truncated (e.g. a number)
+            if end is not None and (end < len(self.buffer) or self.eof):
+                self.pos = end
+                return value
+            # read as much as is buffered already, so that large values are decoded in linear time
+            if not self._read(max(self.chunk_size, len(self.buffer) - self.pos)):
+                if end is not None:
+                    self.pos = end
+                    return value
+                raise ValueError(f'invalid JSON: truncated value in {self.file.name}')
+
+    def items(self):
+        """Iterate over the keys of the next value, which must be an object, leaving each value to the caller"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def elements(self):
+        """Iterate over the elements of the next value, which must be an array, leaving each element to the caller"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.expect(',]') == ']':
+                return
+
+
+def iter_run_report(path: str):
+    """
+    Iterate over the test cases of the ReFrame run report path, without loading the report as a whole. Yields tuples
+    (session_info, testcase), where session_info is the session info of the report if it precedes the runs (as it
+    does in the reports that ReFrame writes), or an empty dict otherwise.
+    """
+    with open(path) as file:
+        stream = _JSONStream(file)
+        session_info = {}
+        for key in stream.items():
+            if key == 'session_info':
+                session_info = stream.value()
+            elif key == 'runs':
+                for _ in stream.elements():
+                    for run_key in stream.items():
+                        if run_key == 'testcases':
+                            for _ in stream.elements():
+                                yield session_info, stream.value()
+                        else:
+                            stream.value()
+            else:
+                stream.value()
+
+
+def _normalize(result: dict, source: str) -> tuple:
+    """Convert a result to a tuple of values for the COLUMNS"""
+    values = []
+    for column, type_ in COLUMNS.items():
+        value = result.get(column)
+        if column == 'source':
+            value = source
+        elif column == 'timestamp':
+            pass
+        elif type_ == 'REAL':
+            value = _to_float(value)
+        elif type_ == 'INTEGER':
+            value = _to_int(value)
+        else:
+            value = _to_str(value)
+        if column in KEY_COLUMNS and value is None:
+            value = ''
+        values.append(value)
+    return tuple(values)
+
+
+def group_results(results, columns=None) -> dict:
+    """
+    Group results (dicts with the COLUMNS) by the values of columns, SERIES_COLUMNS by default.
+    Returns a dict mapping tuples of values to lists of results, in the order of results.
+    """
+    columns = columns or SERIES_COLUMNS
+    groups = {}
+    for result in results:
+        groups.setdefault(tuple(result.get(x) for x in columns), []).append(result)
+    return groups
+
+
+def find_files(paths) -> list:
+    """
+    Return the perflogs (*.log, and *.log.h<N> for perflogs that ReFrame moved aside after a change of the header),
+    JSON-lines perflogs (*.jsonl) and run reports (run-report*.json) in paths, which can be files or directories
+    (searched recursively). Files that are passed explicitly are always returned.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                if re.search(r'\.(log(\.h\d+)?|jsonl)$', name) or re.match(r'run-report.*\.json$', name):
+                    files.append(os.path.join(root, name))
+    return files
+
+
+class PerfStore:
+    """
+    SQLite store of performance results, see the module docstring.
+
+    Arguments:
+    - database: path of the SQLite database, which is created if it does not exist
+    """
+
+    def __init__(self, database: str):
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            for statement in _SCHEMA:
+                self.connection.execute(statement)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_source(self, path: str):
+        return self.connection.execute('SELECT * FROM sources WHERE path = ?', (path,)).fetchone()
+
+    def _set_source(self, path: str, stat: os.stat_result, offset: int, header: str = None):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO sources (path, inode, size, mtime_ns, offset, header) VALUES (?, ?, ?, ?, ?, ?)',
+            (path, stat.st_ino, stat.st_size, stat.st_mtime_ns, offset, header))
+
+    def add_results(self, results, source: str) -> int:
+        """
+        Add results (dicts with the COLUMNS) to the store, and return the number of new results.
+        Columns of results that are already stored are completed with the values of the new results, e.g. when
+        the run report of a session is ingested after its perflogs.
+        """
+        columns = list(COLUMNS)
+        insert = 'INSERT OR IGNORE INTO results ({}) VALUES ({})'.format(
+            ', '.join(columns), ', '.join('?' for _ in columns))
+        update_columns = [x for x in columns if x not in KEY_COLUMNS and x != 'source']
+        update = 'UPDATE results SET {} WHERE {}'.format(
+            ', '.join(f'{x} = COALESCE({x}, ?)' for x in update_columns),
+            ' AND '.join(f'{x} = ?' for x in KEY_COLUMNS))
+        count = 0
+        for result in results:
+            values = dict(zip(columns, _normalize(result, source)))
+            if self.connection.execute(insert, tuple(values.values())).rowcount:
+                count += 1
+            else:
+                self.connection.execute(update, tuple(values[x] for x in update_columns + KEY_COLUMNS))
+        return count
+
+    def _read_appended_lines(self, path: str) -> tuple:
+        """
+        Return the complete lines that were appended to path since it was last ingested (or all lines, if the file
+        was replaced), the stat of the file, the offset after the last complete line and the stored header
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        source = self._get_source(path)
+        offset, header = 0, None
+        if source is not None and source['inode'] == stat.st_ino and source['offset'] <= stat.st_size:
+            offset, header = source['offset'], source['header']
+
+        lines = []
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    # the line is still being written
+                    break
+                offset += len(line)
+                lines.append(line.decode('utf-8', errors='replace'))
+        return lines, stat, offset, header
+
+    def ingest_perflog(self, path: str) -> int:
+        """
+        Ingest the lines that were appended to the perflog path since it was last ingested, and return the number of
+        new results. If the file was replaced (e.g. ReFrame moved it aside because the header changed), it is read
+        from the start.
+        """
+        path = os.path.abspath(path)
+        lines, stat, offset, header = self._read_appended_lines(path)
+        case_fields, perf_fields = parse_perflog_header(header) if header else ([], [])
+        results = []
+        for line in lines:
+            if is_perflog_header(line):
+                header = line.rstrip('\n')
+                case_fields, perf_fields = parse_perflog_header(header)
+            elif case_fields:
+                results.extend(parse_perflog_line(line, case_fields, perf_fields))
+        if lines and not case_fields:
+            print(f'WARNING: skipping {path}: no perflog header found', file=sys.stderr)
+
+        with self.connection:
+            count = self.add_results(results, path)
+            self._set_source(path, stat, offset, header)
+        return count
+
+    def ingest_jsonlines_perflog(self, path: str) -> int:
+        """
+        Ingest the records that were appended to the JSON-lines perflog path (see
+        common_config.JSONLinesHandler) since it was last ingested, and return the number of new results
+        """
+        path = os.path.abspath(path)
+        lines, stat, offset, _ = self._read_appended_lines(path)
+        results = []
+        for line in lines:
+            try:
+                results.extend(parse_jsonlines_record(json.loads(line)))
+            except (ValueError, TypeError, AttributeError, KeyError):
+                continue
+
+        with self.connection:
+            count = self.add_results(results, path)
+            self._set_source(path, stat, offset)
+        return count
+
+    def ingest_run_report(self, path: str) -> int:
+        """Ingest the ReFrame run report path, unless it did not change since it was last ingested"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        source = self._get_source(path)
+        if source is not None and (source['inode'], source['size'], source['mtime_ns']) == (
+                stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            return 0
+
+        results = []
+        for session_info, testcase in iter_run_report(path):
+            results.extend(parse_testcase(testcase, session_info.get('time_end_unix')))
+
+        with self.connection:
+            count = self.add_results(results, path)
+            self._set_source(path, stat, stat.st_size)
+        return count
+
+    def ingest(self, paths) -> int:
+        """Ingest the perflogs and run reports in paths (see find_files()), and return the number of new results"""
+        count = 0
+        for path in find_files(paths):
+            if path.endswith('.json'):
+                count += self.ingest_run_report(path)
+            elif path.endswith('.jsonl'):
+                count += self.ingest_jsonlines_perflog(path)
+            else:
+                count += self.ingest_perflog(path)
+        return count
+
+    def query(self, since=None, until=None, columns=None, **filters) -> list:
+        """
+        Return the results that match all filters as a list of dicts, ordered by time.
+
+        Arguments:
+        - since, until: only return results with a job completion time in [since, until), see parse_time()
+        - columns: list of columns to return, all COLUMNS by default
+        - filters: column=value filters; values for the PATTERN_COLUMNS are shell-style patterns, e.g.
+          test='EESSI_LAMMPS_*'. Filters with value None are ignored.
+        """
+        columns = columns or list(COLUMNS)
+        for column in list(columns) + list(filters):
+            if column not in COLUMNS:
+                raise ValueError(f'unknown column: {column}')
+        conditions, values = [], []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            conditions.append(f'{column} GLOB ?' if column in PATTERN_COLUMNS else f'{column} = ?')
+            values.append(value)
+        if since is not None:
+            conditions.append('timestamp >= ?')
+            values.append(parse_time(since))
+        if until is not None:
+            conditions.append('timestamp < ?')
+            values.append(parse_time(until))
+
+        sql = f'SELECT {", ".join(columns)} FROM results'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY timestamp, test, params, system, partition, perf_var'
+        return [dict(row) for row in self.connection.execute(sql, values)]
+
+
+def print_results(results: list, columns: list, fmt: str = 'table', file=sys.stdout):
+    """Print results (list of dicts) as an aligned table, as CSV or as JSON"""
+    if fmt == 'json':
+        json.dump(results, file, indent=2)
+        file.write('\n')
+        return
+    if fmt == 'csv':
+        writer = csv.DictWriter(file, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+        return
+
+    def _format(column, value):
+        if column == 'timestamp':
+            return format_time(value)
+        if isinstance(value, float):
+            return f'{value:.6g}'
+        return '' if value is None else str(value)
+
+    rows = [columns] + [[_format(x, result.get(x)) for x in columns] for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for row in rows:
+        file.write('  '.join(x.ljust(width) for x, width in zip(row, widths)).rstrip() + '\n')
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser):
+    """Add the arguments to filter results, see query(), to parser"""
+    parser.add_argument("--test", help="Test class (shell-style pattern), e.g. 'EESSI_LAMMPS_*'")
+    parser.add_argument("--system", help="System (shell-style pattern)")
+    parser.add_argument("--partition", help="Partition (shell-style pattern)")
+    parser.add_argument("--module", help="Module (shell-style pattern), e.g. 'LAMMPS/*-foss-2023a*'")
+    parser.add_argument("--perf-var", help="Perf variable (shell-style pattern)")
+    parser.add_argument("--since", help="Only results from this time on, e.g. 2024-05-01")
+    parser.add_argument("--until", help="Only results before this time")
+
+
+def get_filters(args: argparse.Namespace) -> dict:
+    """Return the filters for query() from the arguments added by add_filter_arguments()"""
+    return {
+        'test': args.test,
+        'system': args.system,
+        'partition': args.partition,
+        'module': args.module,
+        'perf_var': args.perf_var,
+        'since': args.since,
+        'until': args.until,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Store perflogs and run reports of the EESSI test suite in SQLite.")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    ingest_parser = subparsers.add_parser('ingest', help="Ingest new results from perflogs and run reports")
+    ingest_parser.add_argument("database", help="SQLite database")
+    ingest_parser.add_argument("paths", nargs='+', help="Perflogs, run reports, or directories to search for them")
+
+    query_parser = subparsers.add_parser('query', help="Print the results that match the filters")
+    query_parser.add_argument("database", help="SQLite database")
+    add_filter_arguments(query_parser)
+    query_parser.add_argument("--columns", help="Comma-separated list of columns to print",
+                              default=','.join(DEFAULT_QUERY_COLUMNS))
+    query_parser.add_argument("--format", choices=['table', 'csv', 'json'], default='table', help="Output format")
+    args = parser.parse_args()
+
+    with PerfStore(args.database) as store:
+        if args.command == 'ingest':
+            count = store.ingest(args.paths)
+            print(f'{count} new results ingested into {args.database}')
+        else:
+            columns = args.columns.split(',')
+            try:
+                results = store.query(columns=columns, **get_filters(args))
+            except ValueError as err:
+                parser.error(str(err))
+            print_results(results, columns, args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Decide whether the executable of a test should be repeated once more, based on the wall times of the repetitions
+so far. The repetitions file has one line per completed repetition (columns: repetition, start time, end time, exit
+status), as written by the job script that is generated by hooks.repeat_executable().
+
+Exits with 0 if another repetition is needed, and with 1 if the repetitions should stop because:
+- the relative width of the confidence interval of the median wall time is at most the target, or
+- the maximum number of repetitions is reached, or
+- another repetition (of median wall time) would exceed the time budget (seconds since the start of the first
+  repetition), or
+- the last repetition failed
+
+The decision is printed, e.g.:
+
+$ check_repetitions.py --target 0.02 repetitions.out
+EESSI_REPETITIONS: stop target_reached 8 0.0153
+"""
+
+import argparse
+import os
+import sys
+
+try:
+    from eessi.testsuite import stats
+except ImportError:
+    # the test suite is not necessarily installed in the environment of the job, but stats is stand-alone
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import stats
+
+
+def read_repetitions(filename):
+    """Return the (repetition, start, end, status) of each repetition in the repetitions file"""
+    repetitions = []
+    with open(filename) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 4:
+                repetitions.append((int(fields[0]), float(fields[1]), float(fields[2]), int(fields[3])))
+    return repetitions
+
+
+def decide(repetitions, target, confidence=0.95, max_repetitions=20, budget=0.0):
+    """
+    Return (repeat, reason, relative CI width) for the repetitions so far, see the module docstring.
+    The relative CI width is None if there are too few repetitions to compute it.
+    """
+    durations = [end - start for _, start, end, _ in repetitions]
+    width = None
+    try:
+        low, high = stats.median_ci(durations, confidence)
+        center = stats.median(durations)
+        width = (high - low) / center if center > 0 else 0.0
+    except ValueError:
+        pass
+
+    if repetitions and repetitions[-1][3] != 0:
+        return False, 'failed', width
+    if width is not None and width <= target:
+        return False, 'target_reached', width
+    if len(repetitions) >= max_repetitions:
+        return False, 'max_repetitions', width
+    if budget > 0 and repetitions:
+        elapsed = repetitions[-1][2] - repetitions[0][1]
+        if elapsed + stats.median(durations) > budget:
+            return False, 'time_budget', width
+    return True, 'continue', width
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decide whether the executable should be repeated once more.")
+    parser.add_argument("repetitions", help="File with the start time, end time and exit status of each repetition")
+    parser.add_argument("--target", type=float, required=True,
+                        help="Target relative width of the confidence interval of the median wall time")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the interval")
+    parser.add_argument("--max", type=int, default=20, help="Maximum number of repetitions")
+    parser.add_argument("--budget", type=float, default=0.0, help="Time budget in seconds (0: no budget)")
+    args = parser.parse_args()
+
+    repetitions = read_repetitions(args.repetitions)
+    repeat, reason, width = decide(repetitions, args.target, args.confidence, args.max, args.budget)
+    width = 'None' if width is None else f'{width:.4f}'
+    print(f"EESSI_REPETITIONS: {'repeat' if repeat else 'stop'} {reason} {len(repetitions)} {width}")
+    sys.exit(0 if repeat else 1)
+
+
+if __name__ == '__main__':
+    main()
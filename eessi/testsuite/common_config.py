@@ -1,7 +1,13 @@
 import json
+import logging
 import os
 
 from reframe.core.logging import getlogger
+try:
+    from reframe.core.logging import register_log_handler
+except ImportError:
+    # ReFrame versions that do not support custom log handlers
+    register_log_handler = None
 
 from eessi.testsuite.constants import FEATURES
 
@@ -22,6 +28,12 @@ perflog_format = '|'.join([
     '%(check_use_multithreading)s',
     '%(check_modules)s',
     '%(check_jobid)s',
+    # EESSI metadata of the EESSI_Mixin, used by eessi.testsuite.analysis to attribute performance changes to a
+    # different software stack or test suite version ('<undefined>' for other tests)
+    '%(check_cvmfs_repo_name)s',
+    '%(check_cvmfs_software_subdir)s',
+    '%(check_full_modulepath)s',
+    '%(check_eessi_testsuite_version)s',
     '%(check_perfvalues)s',
 ])
 
@@ -34,6 +46,95 @@ format_perfvars = '|'.join([
     ''  # final delimiter required
 ])
 
+# type of the JSON-lines perflog handler, see common_logging_config()
+JSONLINES_HANDLER_TYPE = 'eessi_jsonlines'
+
+# loggable attributes of the test that are written in the job and EESSI sections of the JSON-lines perflog records
+jsonlines_job_attrs = ['jobid', 'num_tasks', 'num_cpus_per_task', 'num_tasks_per_node', 'num_gpus_per_node',
+                       'job_nodelist', 'job_exitcode']
+jsonlines_eessi_attrs = ['module_name', 'scale', 'device_type', 'compute_unit', 'cvmfs_repo_name',
+                         'cvmfs_software_subdir', 'full_modulepath', 'eessi_testsuite_version', 'cpu_governor']
+
+
+def jsonlines_record(record: logging.LogRecord) -> dict:
+    """
+    Convert a perflog record of ReFrame to a dict for the JSON-lines perflog, with the test case, the job metadata
+    (in 'job'), the EESSI metadata (in 'eessi') and the perf variables (in 'perfvars')
+    """
+    def _get(attr):
+        return getattr(record, f'check_{attr}', None)
+
+    nodelist = _get('job_nodelist')
+    num_tasks, num_tasks_per_node = _get('num_tasks'), _get('num_tasks_per_node')
+    if nodelist:
+        num_nodes = len(nodelist)
+    elif num_tasks and num_tasks_per_node:
+        num_nodes = -(-num_tasks // num_tasks_per_node)
+    else:
+        num_nodes = None
+
+    return {
+        'job_completion_time': _get('job_completion_time'),
+        'job_completion_time_unix': _get('job_completion_time_unix'),
+        'display_name': _get('display_name'),
+        'unique_name': _get('unique_name'),
+        'info': _get('info'),
+        'system': _get('system'),
+        'partition': _get('partition'),
+        'environ': _get('environ'),
+        'result': _get('result'),
+        'modules': _get('modules'),
+        'osuser': getattr(record, 'osuser', None),
+        'reframe_version': getattr(record, 'version', None),
+        'job': dict({x: _get(x) for x in jsonlines_job_attrs}, num_nodes=num_nodes),
+        'eessi': {x: _get(x) for x in jsonlines_eessi_attrs},
+        'perfvars': {
+            var.split(':')[-1]: dict(zip(['value', 'ref', 'lower_thres', 'upper_thres', 'unit', 'result'], info))
+            for var, info in (_get('perfvalues') or {}).items()
+        },
+    }
+
+
+class JSONLinesHandler(logging.Handler):
+    """
+    Perflog handler that writes one JSON record per test case (see jsonlines_record()) to
+    <basedir>/<prefix>/<test>.jsonl, where prefix may contain placeholders like the prefix of the filelog handler,
+    e.g. '%(check_system)s/%(check_partition)s'
+    """
+
+    def __init__(self, basedir: str, prefix: str, append: bool = True):
+        super().__init__()
+        self.basedir = basedir
+        self.prefix = prefix
+        self.append = append
+        self._opened = set()
+
+    def emit(self, record):
+        try:
+            dirname = os.path.join(self.basedir, self.prefix % record.__dict__)
+            os.makedirs(dirname, exist_ok=True)
+            check = getattr(record, '__rfm_check__', None)
+            basename = type(check).variant_name() if check is not None else 'perflog'
+            filename = os.path.join(dirname, f'{basename}.jsonl')
+            mode = 'a' if self.append or filename in self._opened else 'w'
+            with open(filename, mode) as file:
+                file.write(json.dumps(jsonlines_record(record), default=str) + '\n')
+            self._opened.add(filename)
+        except Exception:
+            self.handleError(record)
+
+
+if register_log_handler is not None:
+    @register_log_handler(JSONLINES_HANDLER_TYPE)
+    def _create_jsonlines_handler(site_config, config_prefix):
+        basedir = os.path.abspath(os.path.join(
+            site_config.get('systems/0/prefix'),
+            os.path.expandvars(site_config.get(f'{config_prefix}/basedir') or 'perflogs')
+        ))
+        prefix = os.path.expandvars(site_config.get(f'{config_prefix}/prefix') or '')
+        append = site_config.get(f'{config_prefix}/append')
+        return JSONLinesHandler(basedir, prefix, append=append is not False)
+
 
 def set_common_required_config(site_configuration: dict, set_memory: bool = True):
     """
@@ -102,15 +203,39 @@ def set_common_required_config(site_configuration: dict, set_memory: bool = True
             partition['resources'] = resources
 
 
-def common_logging_config(prefix=None):
+def common_logging_config(prefix=None, jsonlines_perflog=False):
     """
     return default logging configuration as a list: stdout, file log, perflog
     :param prefix: file log prefix
+    :param jsonlines_perflog: also write the perflog as JSON lines (one record per test case, with nested perf
+        variables, job metadata and EESSI metadata), next to the pipe-delimited perflog, see JSONLinesHandler
     """
     prefix = os.getenv('RFM_PREFIX', prefix if prefix else '.')
     logdir = os.path.join(prefix, 'logs')
     os.makedirs(logdir, exist_ok=True)
 
+    handlers_perflog = [
+        {
+            'type': 'filelog',
+            'prefix': '%(check_system)s/%(check_partition)s',
+            'level': 'info',
+            'format': perflog_format,
+            'format_perfvars': format_perfvars,
+            'append': True,  # avoid overwriting
+        },
+    ]
+    if jsonlines_perflog:
+        if register_log_handler is None:
+            getlogger().warning("This ReFrame version does not support custom log handlers: "
+                                "the JSON-lines perflog is not written")
+        else:
+            handlers_perflog.append({
+                'type': JSONLINES_HANDLER_TYPE,
+                'prefix': '%(check_system)s/%(check_partition)s',
+                'level': 'info',
+                'append': True,
+            })
+
     return [{
         'level': 'debug',
         'handlers': [
@@ -129,16 +254,7 @@ def common_logging_config(prefix=None):
                 'timestamp': "%Y%m%d_%H%M%S",  # add a timestamp to the filename (reframe_<timestamp>.log)
             },
         ],
-        'handlers_perflog': [
-            {
-                'type': 'filelog',
-                'prefix': '%(check_system)s/%(check_partition)s',
-                'level': 'info',
-                'format': perflog_format,
-                'format_perfvars': format_perfvars,
-                'append': True,  # avoid overwriting
-            },
-        ],
+        'handlers_perflog': handlers_perflog,
     }]
 
 
@@ -162,6 +278,8 @@ def common_eessi_init(eessi_version=None):
     Returns the full path that should be sourced to initialize the EESSI environment for a given version of EESSI.
     If no eessi_version is passed, the EESSI_VERSION environment variable is read.
     If that is also not defined, default behaviour is to use `latest`.
+    The time at which the initialization finished is exported in EESSI_INIT_END_TIME,
+    which is used by the EESSI_Mixin to measure the environment setup time (see measure_env_setup_time).
     :param eessi_version: version of EESSI that should be sourced (e.g. '2023.06' or 'latest') [optional]
     """
     # Check which EESSI_CVMFS_REPO we are running under
@@ -200,6 +318,7 @@ def common_eessi_init(eessi_version=None):
         version_string = f'versions/{eessi_version}'
 
     eessi_init.append(f'source {eessi_cvmfs_repo}/{version_string}/init/bash')
+    eessi_init.append('export EESSI_INIT_END_TIME=$(date +%s.%N)')
     return ' && '.join(eessi_init)
 
 
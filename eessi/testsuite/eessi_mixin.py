@@ -1,16 +1,18 @@
 import os
 
 from reframe.core.backends import getlauncher
+from reframe.core.exceptions import SanityError
 from reframe.core.builtins import parameter, run_after, run_before, variable
 from reframe.core.logging import getlogger
 try:
     from reframe.core.pipeline import RegressionTestPlugin
 except ImportError:
     from reframe.core.pipeline import RegressionMixin as RegressionTestPlugin
-from reframe.utility.sanity import make_performance_function
 import reframe.utility.sanity as sn
+from reframe.utility.sanity import make_performance_function
 
-from eessi.testsuite import check_process_binding, hooks
+from eessi.testsuite import check_process_binding, hooks, output_cache, stats
+from eessi.testsuite.analysis import references
 from eessi.testsuite.constants import COMPUTE_UNITS, DEVICE_TYPES, SCALES, TAGS
 from eessi.testsuite.utils import EESSIError, log, log_once
 from eessi.testsuite import __version__ as testsuite_version
@@ -41,11 +43,57 @@ class EESSI_Mixin(RegressionTestPlugin):
 
     The child class may also overwrite the following attributes:
 
-    - Init phase: time_limit, measure_memory_usage, all_readonly_files
+    - Init phase: time_limit, measure_memory_usage, measure_energy_usage, all_readonly_files
+
+    The child class may also define a method steady_state_series(), returning the (duration, steps) intervals of
+    the run (see eessi.testsuite.stats.intervals). The mixin then reports the steady-state throughput, excluding
+    the first steady_state_warmup intervals, and the startup time as separate perf variables. Tests whose series
+    only covers the steady state set steady_state_warmup to 0, in which case the startup time is not reported.
+
+    Tests that measure a performance metric multiple times can write the raw samples to the job output file
+    (see hooks.get_samples), e.g. 'EESSI_SAMPLES: img_sec img/sec 1023.4 1019.8 1025.1'. The mixin then reports
+    their median, mean, stddev, p5 and p95 as perf variables, and keeps the samples in samples.json.
+
+    If reference_file is set (e.g. with -S reference_file=references.json), the references of the perf variables
+    are taken from that file (see eessi.testsuite.analysis.references), unless the test defines its own.
+
+    If repeat_target_ci is set (e.g. with -S repeat_target_ci=0.02), the executable is repeated within the same job
+    until the confidence interval (at level repeat_confidence) of the median wall time of the repetitions is at most
+    that fraction of the median, or until repeat_max repetitions or repeat_time_budget seconds (default: half the
+    time limit of the test) are used. Only the first repetition writes into the job output file, on which the sanity
+    of the test is checked; the others write into repetition_<N>/ in the stage directory. Each perf variable that is
+    extracted from the job output file is then reported as the median over the repetitions, with its confidence
+    interval as <name>_ci_low and <name>_ci_high (if enough repetitions completed, e.g. 6 at 95%), and the number of
+    repetitions as perf variable repetitions. The energy usage, average power, mean CPU frequency and t_main are
+    reported as the median of a repetition as well; the throttle events and the other phase timings cover the whole
+    job.
+
+    If normalize_perf_vars is set (e.g. with -S normalize_perf_vars=true), the mixin adds normalised variants
+    <name>_per_core (CPU tests), <name>_per_gpu (GPU tests) and <name>_per_node (scales with whole nodes) of each
+    perf variable that is a throughput (e.g. timesteps/s, img/sec, ns/day), with units such as 'img/sec/core', so that
+    runs on different partitions can be compared directly. Perf variables that describe a spread (e.g. <name>_stddev,
+    <name>_p5 or <name>_ci_low) are not normalised.
     """
 
     # Defaults for ReFrame variables that can be overwritten on the cmd line
     measure_memory_usage = variable(bool, value=False)
+    measure_energy_usage = variable(bool, value=False)
+    energy_sysfs_root = variable(str, value='/sys')
+    measure_cpu_frequency = variable(bool, value=False)
+    cpu_frequency_interval = variable(float, value=1.0)
+    measure_hw_counters = variable(bool, value=False)
+    measure_phase_timing = variable(bool, value=False)
+    measure_env_setup_time = variable(bool, value=False)
+    steady_state_warmup = variable(int, value=1)
+    compress_outputs = variable(bool, value=False)
+    reference_file = variable(str, value='')
+    repeat_target_ci = variable(float, value=0.0)
+    repeat_confidence = variable(float, value=0.95)
+    repeat_max = variable(int, value=20)
+    repeat_time_budget = variable(float, value=0.0)
+    normalize_perf_vars = variable(bool, value=False)
+    hw_counter_events = variable(
+        str, value='task-clock,cycles,instructions,branches,branch-misses,LLC-load-misses,cache-misses')
     exact_memory = variable(bool, value=False)
     user_executable_opts = variable(str, value='')
     thread_binding = variable(str, value='false')
@@ -68,6 +116,7 @@ class EESSI_Mixin(RegressionTestPlugin):
     cvmfs_repo_name = variable(str, value='None')
     cvmfs_software_subdir = variable(str, value='None')
     full_modulepath = variable(str, value='None')
+    cpu_governor = variable(str, value='None')
     # These are optionally set in CI on the command line
     EESSI_CONFIGS_URL = variable(str, value='None')
     EESSI_CONFIGS_BRANCH = variable(str, value='None')
@@ -263,6 +312,79 @@ class EESSI_Mixin(RegressionTestPlugin):
                 get_full_modpath = f'echo "FULL_MODULEPATH: $(module --location show {mod} 2>&1)"'
                 self.postrun_cmds.append(get_full_modpath)
 
+    @run_after('setup')
+    def EESSI_mixin_set_references(self):
+        """Set the references of the perf variables on the current partition from the reference_file"""
+        if not self.reference_file or self.reference:
+            return
+
+        partition = self.current_partition.fullname
+        try:
+            refs = references.get_references(self.reference_file, self.display_name, partition)
+        except (OSError, ValueError) as e:
+            getlogger().warning(f'{self.name}: references are not loaded from {self.reference_file}: {e}')
+            return
+
+        if refs:
+            self.reference = {partition: refs}
+            log(f'reference set to {self.reference}')
+
+    # Note that hooks with always_last=True are executed in reverse order of definition,
+    # so the hooks below that must wrap the executable as tightly as possible are defined first
+
+    @run_before('run', always_last=True)
+    def EESSI_mixin_repeat_executable(self):
+        """Repeat the executable until the confidence interval of its wall time is narrow enough"""
+        if not self.repeat_target_ci:
+            return
+
+        time_budget = self.repeat_time_budget
+        if not time_budget and self.time_limit:
+            time_budget = self.time_limit / 2
+        min_count = stats.median_ci_min_count(self.repeat_confidence)
+        if self.repeat_max < min_count:
+            log_once(self, f'repeat_max={self.repeat_max} is too small for a {self.repeat_confidence:.0%} confidence '
+                     f'interval, which needs at least {min_count} repetitions: no confidence intervals will be '
+                     'reported', msg_id='repeat_max', level='warning')
+        # the energy is measured per repetition, see EESSI_mixin_measure_energy_usage
+        repetition_cmds = None
+        if self.measure_energy_usage:
+            repetition_cmds = hooks.get_energy_counter_cmds(self, sysfs_root=self.energy_sysfs_root)
+        hooks.repeat_executable(self, self.repeat_target_ci, confidence=self.repeat_confidence,
+                                max_repetitions=self.repeat_max, time_budget=time_budget,
+                                repetition_cmds=repetition_cmds)
+
+    @run_before('run', always_last=True)
+    def EESSI_mixin_measure_env_setup_time(self):
+        """Record the time spent in the prepare_cmds and module loading, before any other prerun command"""
+        if self.measure_env_setup_time:
+            hooks.measure_env_setup_time(self)
+
+    @run_before('run', always_last=True)
+    def EESSI_mixin_measure_phase_timing(self):
+        """Add timestamps between the prerun commands, the executable and the postrun commands"""
+        if self.measure_phase_timing:
+            hooks.measure_phase_timing(self)
+
+    @run_before('run', always_last=True)
+    def EESSI_mixin_measure_energy_usage(self):
+        """Read the energy counters of all nodes right before and right after the executable"""
+        # if the executable is repeated, the counters are read around each repetition instead
+        if self.measure_energy_usage and not self.repeat_target_ci:
+            hooks.measure_energy_usage(self, sysfs_root=self.energy_sysfs_root)
+
+    @run_before('run', always_last=True)
+    def EESSI_mixin_measure_cpu_frequency(self):
+        """Sample the CPU frequency and read the thermal throttle counters during the executable"""
+        if self.measure_cpu_frequency:
+            hooks.measure_cpu_frequency(self, interval=self.cpu_frequency_interval)
+
+    @run_before('run', always_last=True)
+    def EESSI_mixin_measure_hw_counters(self):
+        """Wrap the executable in perf stat to collect hardware counters per rank"""
+        if self.measure_hw_counters:
+            hooks.measure_hw_counters(self, events=self.hw_counter_events)
+
     @run_before('run', always_last=True)
     def EESSI_mixin_set_user_executable_opts(self):
         "Override executable_opts with user_executable_opts if set on the cmd line"
@@ -298,30 +420,222 @@ class EESSI_Mixin(RegressionTestPlugin):
         if self.is_dry_run():
             return
 
+        stdout = f'{self.stagedir}/{self.stdout}'
+        repo_regex = r'EESSI_CVMFS_REPO: /cvmfs/(?P<repo>.*)$'
+        subdir_regex = r'EESSI_SOFTWARE_SUBDIR: (?P<subdir>.*)$'
+        modpath_regex = r'FULL_MODULEPATH: (?P<modpath>.*)$'
+        output_cache.register(stdout, repo_regex, subdir_regex, modpath_regex)
+
         # If EESSI_CVMFS_REPO environment variable was set, extract it and store it in self.cvmfs_repo_name
-        repo_name = sn.extractall(r'EESSI_CVMFS_REPO: /cvmfs/(?P<repo>.*)$', f'{self.stagedir}/{self.stdout}',
-                                  'repo', str)
+        repo_name = output_cache.extractall(repo_regex, stdout, 'repo', str)
         if repo_name:
             self.cvmfs_repo_name = f'{repo_name}'
 
-        software_subdir = sn.extractall(r'EESSI_SOFTWARE_SUBDIR: (?P<subdir>.*)$',
-                                        f'{self.stagedir}/{self.stdout}', 'subdir', str)
+        software_subdir = output_cache.extractall(subdir_regex, stdout, 'subdir', str)
         if software_subdir:
             self.cvmfs_software_subdir = f'{software_subdir}'
 
-        module_path = sn.extractall(r'FULL_MODULEPATH: (?P<modpath>.*)$', f'{self.stagedir}/{self.stdout}',
-                                    'modpath', str)
+        module_path = output_cache.extractall(modpath_regex, stdout, 'modpath', str)
         if module_path:
             self.full_modulepath = f'{module_path}'
 
+    @run_before('performance')
+    def EESSI_mixin_set_energy_perf_vars(self):
+        """Add perf variables for the energy domains for which counters were found"""
+        if self.is_dry_run() or not self.measure_energy_usage:
+            return
+
+        domains = hooks.get_energy_domains(self)
+        if not domains:
+            getlogger().warning(f'{self.name}: no energy counters found, energy usage is not reported')
+            return
+
+        for domain in ['package', 'dram']:
+            if domain in domains:
+                self.perf_variables[f'energy_{domain}'] = make_performance_function(
+                    hooks.extract_energy_usage, 'J', self, domain)
+        self.perf_variables['power_avg'] = make_performance_function(hooks.extract_average_power, 'W', self)
+
+    @run_before('performance')
+    def EESSI_mixin_set_cpu_frequency_perf_vars(self):
+        """Add perf variables for the CPU frequency and throttle events, and log the scaling governor"""
+        if self.is_dry_run() or not self.measure_cpu_frequency:
+            return
+
+        self.cpu_governor = hooks.extract_cpu_governor(self)
+        if hooks.get_cpu_frequency_samples(self):
+            self.perf_variables['cpu_freq_mean'] = make_performance_function(hooks.extract_cpu_frequency, 'MHz',
+                                                                             self)
+        else:
+            getlogger().warning(f'{self.name}: no CPU frequency samples found, mean frequency is not reported')
+        self.perf_variables['throttle_events'] = make_performance_function(hooks.extract_throttle_events, 'events',
+                                                                           self)
+
+    @run_before('performance')
+    def EESSI_mixin_set_phase_timing_perf_vars(self):
+        """Add perf variables for the wall time of each phase of the job"""
+        if self.is_dry_run() or not self.measure_phase_timing:
+            return
+
+        for phase in hooks.get_phase_timings(self):
+            self.perf_variables[f't_{phase}'] = make_performance_function(hooks.extract_phase_time, 's', self, phase)
+
+    @run_before('performance')
+    def EESSI_mixin_set_env_setup_perf_vars(self):
+        """Add perf variables for the time spent in setting up the environment of the job"""
+        if self.is_dry_run() or not self.measure_env_setup_time:
+            return
+
+        for phase in hooks.get_env_setup_timings(self):
+            self.perf_variables[f't_{phase}'] = make_performance_function(
+                hooks.extract_env_setup_time, 's', self, phase)
+
+    @run_before('performance')
+    def EESSI_mixin_set_hw_counter_perf_vars(self):
+        """Add perf variables for the metrics that can be computed from the collected hardware counters"""
+        if self.is_dry_run() or not self.measure_hw_counters:
+            return
+
+        metrics = hooks.get_hw_counter_metrics(self)
+        if not metrics:
+            getlogger().warning(f'{self.name}: no hardware counters collected, check the job error file')
+            return
+
+        for metric, (_, unit) in metrics.items():
+            self.perf_variables[metric] = make_performance_function(
+                hooks.extract_hw_counter_metric, unit, self, metric)
+
+    @run_before('performance')
+    def EESSI_mixin_set_steady_state_perf_vars(self):
+        """Add perf variables for the steady-state throughput and the startup time, if the test provides a series"""
+        if self.is_dry_run() or not hasattr(self, 'steady_state_series'):
+            return
+
+        try:
+            series = sn.evaluate(self.steady_state_series())
+            steady_state = stats.steady_state(series, self.steady_state_warmup)
+        except (SanityError, ValueError) as e:
+            getlogger().warning(f'{self.name}: steady-state performance is not reported: {e}')
+            return
+
+        self.perf_variables['steady_state_mean'] = make_performance_function(
+            sn.defer(steady_state['mean']), 'steps/s')
+        self.perf_variables['steady_state_median'] = make_performance_function(
+            sn.defer(steady_state['median']), 'steps/s')
+        if self.steady_state_warmup > 0:
+            self.perf_variables['startup_time'] = make_performance_function(sn.defer(steady_state['startup']), 's')
+
+    @run_before('performance')
+    def EESSI_mixin_set_sample_perf_vars(self):
+        """Add perf variables with statistics of the raw performance samples written by the test, and keep them"""
+        if self.is_dry_run():
+            return
+
+        samples = hooks.get_samples(self)
+        if not samples:
+            return
+
+        hooks.write_samples_artifact(self, samples)
+        for name, (unit, values) in samples.items():
+            for stat, value in stats.summary(values).items():
+                self.perf_variables[f'{name}_{stat}'] = make_performance_function(sn.defer(value), unit)
+
+    # Note that the normalised perf variables are added after the perf variables are aggregated over the
+    # repetitions, since hooks with always_last=True are executed in reverse order of definition
+
+    @run_before('performance', always_last=True)
+    def EESSI_mixin_set_normalized_perf_vars(self):
+        """Add per-core, per-GPU and per-node variants of the perf variables that are throughputs, if enabled"""
+        if self.is_dry_run() or not self.normalize_perf_vars:
+            return
+
+        resources = hooks.get_normalization_resources(self)
+        for name, expr in list(self.perf_variables.items()):
+            if hooks.is_spread(name) or not hooks.is_throughput(expr.unit, name):
+                continue
+            for resource, count in resources.items():
+                label = 'GPU' if resource == 'gpu' else resource
+                self.perf_variables[f'{name}_per_{resource}'] = make_performance_function(
+                    expr / count, f'{expr.unit}/{label}')
+
+    @run_before('performance', always_last=True)
+    def EESSI_mixin_set_repetition_perf_vars(self):
+        """
+        Replace the perf variables that are extracted from the job output file by their median over the repetitions,
+        and add their confidence intervals and the number of repetitions
+        """
+        if self.is_dry_run() or not self.repeat_target_ci:
+            return
+
+        dirs = hooks.get_repetition_dirs(self)
+        decision = hooks.get_repetition_decision(self)
+        reason = None
+        if decision:
+            reason, count, width = decision
+            log(f'stopped after {count} repetitions ({reason}), relative CI width of the wall time: {width}')
+        if not dirs:
+            getlogger().warning(f'{self.name}: no completed repetitions found, perf variables are not aggregated')
+            return
+        min_count = stats.median_ci_min_count(self.repeat_confidence)
+        if len(dirs) < min_count:
+            getlogger().warning(
+                f'{self.name}: only {len(dirs)} repetitions completed (stopped because of: {reason}), but a '
+                f'{self.repeat_confidence:.0%} confidence interval needs at least {min_count}: no confidence '
+                'intervals are reported')
+
+        self.perf_variables['repetitions'] = make_performance_function(sn.defer(len(dirs)), 'repetitions')
+        for name, expr in list(self.perf_variables.items()):
+            try:
+                values = hooks.evaluate_per_repetition(self, expr, dirs)
+            except SanityError as err:
+                # e.g. perf variables that are extracted from other files than the job output file
+                log_once(self, f'perf variable {name} is not aggregated over the repetitions: {err}',
+                         msg_id=f'repetition_{name}', level='warning')
+                continue
+            # perf variables that do not depend on the output of the repetitions are left as they are
+            if len(set(values)) <= 1 or not all(isinstance(x, (int, float)) for x in values):
+                log(f'perf variable {name} does not depend on the output of the repetitions, not aggregated')
+                continue
+            summary = hooks.summarize_repetitions(values, self.repeat_confidence)
+            self.perf_variables[name] = make_performance_function(sn.defer(summary['median']), expr.unit)
+            if summary['ci_low'] is not None:
+                self.perf_variables[f'{name}_ci_low'] = make_performance_function(
+                    sn.defer(summary['ci_low']), expr.unit)
+                self.perf_variables[f'{name}_ci_high'] = make_performance_function(
+                    sn.defer(summary['ci_high']), expr.unit)
+
     @run_after('run')
     def EESSI_mixin_extract_errors_warnings(self):
         """Extract the printed errors and warnings from the job error file and log them"""
         if self.is_dry_run() or self.check_process_binding is False:
             return
 
-        messages = sn.extractall(r'PROCESS BINDING ERROR: .*', f'{self.stagedir}/{self.stderr}')
-        messages += sn.extractall(r'PROCESS BINDING WARNING: .*', f'{self.stagedir}/{self.stderr}')
+        stderr = f'{self.stagedir}/{self.stderr}'
+        error_regex = r'PROCESS BINDING ERROR: .*'
+        warning_regex = r'PROCESS BINDING WARNING: .*'
+        output_cache.register(stderr, error_regex, warning_regex)
+
+        messages = output_cache.extractall(error_regex, stderr)
+        messages += output_cache.extractall(warning_regex, stderr)
         if messages:
             for msg in messages:
                 getlogger().warning(msg)
+
+    @run_after('performance', always_last=True)
+    def EESSI_mixin_release_output_cache(self):
+        """Release the cached output files of this test, which are no longer needed after the performance stage"""
+        output_cache.release(self.stagedir)
+
+    @run_after('cleanup')
+    def EESSI_mixin_compress_outputs(self):
+        """
+        Compress the large output files that ReFrame copied to the output directory of the test, to save space on the
+        (shared) file system. They can still be read with output_cache, which decompresses them transparently.
+        """
+        if self.is_dry_run() or not self.compress_outputs:
+            return
+
+        for filename in os.listdir(self.outputdir):
+            path = os.path.join(self.outputdir, filename)
+            if os.path.isfile(path) and output_cache.compress(path):
+                log(f'Compressed {path}')
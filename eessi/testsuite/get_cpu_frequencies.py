@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Record the CPU frequencies, scaling governors and thermal throttle counters of the current node.
+
+In snapshot mode, print the scaling governors and the thermal throttle counters of the node, in a format similar to
+the example below (columns: label, hostname, core throttle events, package throttle events):
+
+$ get_cpu_frequencies.py --label start
+CPU_GOVERNOR: host1 performance
+CPU_THROTTLE: start host1 12 3
+
+When launched with multiple tasks per node, only the task with local rank 0 prints the snapshot.
+
+In sample mode, print the mean current frequency (MHz) of the CPUs the process is allowed to run on every interval
+seconds, until the process is terminated (columns: timestamp, mean frequency):
+
+$ get_cpu_frequencies.py --sample --interval 1
+CPU_FREQ: 1712345678.123456 2893.1
+"""
+
+import argparse
+import glob
+import os
+import signal
+import socket
+import sys
+import time
+
+# Environment variables that hold the node-local rank for common launchers
+LOCAL_RANK_VARS = ['SLURM_LOCALID', 'OMPI_COMM_WORLD_LOCAL_RANK', 'MPI_LOCALRANKID', 'PMI_LOCAL_RANK']
+
+
+def read_file(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def get_governors(sysfs_root):
+    """Return the set of scaling governors of all CPUs"""
+    governors = set()
+    for path in glob.glob(os.path.join(sysfs_root, 'devices', 'system', 'cpu', 'cpu*', 'cpufreq',
+                                       'scaling_governor')):
+        try:
+            governors.add(read_file(path))
+        except OSError:
+            continue
+    return governors
+
+
+def get_throttle_counts(sysfs_root):
+    """
+    Return the total number of core and package thermal throttle events of the node.
+    Counters are shared between the hardware threads of a core and the cores of a package,
+    so they are counted once per physical core and once per package.
+    """
+    core_counts = {}
+    package_counts = {}
+    for cpu_dir in glob.glob(os.path.join(sysfs_root, 'devices', 'system', 'cpu', 'cpu[0-9]*')):
+        try:
+            package = read_file(os.path.join(cpu_dir, 'topology', 'physical_package_id'))
+            core = read_file(os.path.join(cpu_dir, 'topology', 'core_id'))
+        except OSError:
+            package, core = os.path.basename(cpu_dir), ''
+        throttle_dir = os.path.join(cpu_dir, 'thermal_throttle')
+        try:
+            core_counts[(package, core)] = int(read_file(os.path.join(throttle_dir, 'core_throttle_count')))
+            package_counts[package] = int(read_file(os.path.join(throttle_dir, 'package_throttle_count')))
+        except (OSError, ValueError):
+            continue
+    return sum(core_counts.values()), sum(package_counts.values())
+
+
+def get_mean_frequency(sysfs_root, cpus):
+    """Return the mean current frequency (MHz) of the given CPUs, or None if it is not available"""
+    freqs = []
+    for cpu in cpus:
+        path = os.path.join(sysfs_root, 'devices', 'system', 'cpu', f'cpu{cpu}', 'cpufreq', 'scaling_cur_freq')
+        try:
+            freqs.append(int(read_file(path)) / 1000)
+        except (OSError, ValueError):
+            continue
+    if not freqs:
+        return None
+    return sum(freqs) / len(freqs)
+
+
+def sample(sysfs_root, interval):
+    """Print the mean frequency of the CPUs in the affinity mask of this process every interval seconds"""
+    # exit cleanly when terminated by the job script
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    cpus = sorted(os.sched_getaffinity(0))
+    while True:
+        freq = get_mean_frequency(sysfs_root, cpus)
+        if freq is not None:
+            print(f"CPU_FREQ: {time.time():.6f} {freq:.1f}", flush=True)
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record CPU frequencies and thermal throttling of the current node.")
+    parser.add_argument("--label", help="Label of the snapshot, e.g. 'start' or 'end'")
+    parser.add_argument("--sample", action='store_true', help="Sample the CPU frequency until terminated")
+    parser.add_argument("--interval", type=float, default=1.0, help="Sampling interval in seconds (default: 1)")
+    parser.add_argument("--sysfs-root", default='/sys', help="Root of the sysfs filesystem (default: /sys)")
+    args = parser.parse_args()
+
+    if args.sample:
+        sample(args.sysfs_root, args.interval)
+        return
+
+    if not args.label:
+        parser.error("either --label or --sample is required")
+
+    for var in LOCAL_RANK_VARS:
+        if os.environ.get(var, '0') != '0':
+            return
+
+    hostname = socket.gethostname()
+    governors = get_governors(args.sysfs_root)
+    if governors:
+        print(f"CPU_GOVERNOR: {hostname} {','.join(sorted(governors))}")
+    core_events, package_events = get_throttle_counts(args.sysfs_root)
+    print(f"CPU_THROTTLE: {args.label} {hostname} {core_events} {package_events}")
+
+
+if __name__ == "__main__":
+    main()
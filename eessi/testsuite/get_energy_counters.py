@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Print the cumulative energy counters of the current node, as exposed by the Linux powercap (Intel RAPL, also used
+for AMD RAPL on recent kernels) or the amd_energy hwmon driver, in a format similar to the example below:
+
+$ get_energy_counters.py --label start
+ENERGY_COUNTER: start host1 1712345678.123456 package intel-rapl:0 123456789 262143328850
+ENERGY_COUNTER: start host1 1712345678.123456 dram intel-rapl:0:0 2345678 65712999613
+
+Columns: label, hostname, timestamp (s), domain, zone, energy (uJ), maximum counter value (uJ, 0 if unknown).
+When launched with multiple tasks per node, only the task with local rank 0 prints the counters.
+"""
+
+import argparse
+import glob
+import os
+import socket
+import sys
+import time
+
+# Environment variables that hold the node-local rank for common launchers
+LOCAL_RANK_VARS = ['SLURM_LOCALID', 'OMPI_COMM_WORLD_LOCAL_RANK', 'MPI_LOCALRANKID', 'PMI_LOCAL_RANK']
+
+
+def read_file(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def get_domain(name):
+    """Map the name of a powercap zone or hwmon label to a domain: package, dram, core, uncore or psys"""
+    name = name.lower()
+    if name.startswith('package') or name.startswith('esocket'):
+        return 'package'
+    if name.startswith('ecore'):
+        return 'core'
+    return name.split('-')[0]
+
+
+def get_rapl_counters(sysfs_root):
+    """Return list of (domain, zone, energy_uj, max_energy_range_uj) from the powercap interface"""
+    counters = []
+    # mmio zones (intel-rapl-mmio) duplicate the msr-based package zones, so skip them
+    paths = glob.glob(os.path.join(sysfs_root, 'class', 'powercap', 'intel-rapl:*'))
+    for path in sorted(paths):
+        zone = os.path.basename(path)
+        try:
+            domain = get_domain(read_file(os.path.join(path, 'name')))
+            energy = int(read_file(os.path.join(path, 'energy_uj')))
+        except PermissionError:
+            print(f"ENERGY WARNING: no permission to read energy counter {path}", file=sys.stderr)
+            continue
+        except (OSError, ValueError):
+            continue
+        try:
+            max_range = int(read_file(os.path.join(path, 'max_energy_range_uj')))
+        except (OSError, ValueError):
+            max_range = 0
+        counters.append((domain, zone, energy, max_range))
+    return counters
+
+
+def get_amd_energy_counters(sysfs_root):
+    """Return list of (domain, zone, energy_uj, max_energy_range_uj) from the amd_energy hwmon driver"""
+    counters = []
+    for hwmon in sorted(glob.glob(os.path.join(sysfs_root, 'class', 'hwmon', 'hwmon*'))):
+        try:
+            if read_file(os.path.join(hwmon, 'name')) != 'amd_energy':
+                continue
+        except OSError:
+            continue
+        for path in sorted(glob.glob(os.path.join(hwmon, 'energy*_input'))):
+            label_path = path.replace('_input', '_label')
+            try:
+                label = read_file(label_path)
+                energy = int(read_file(path))
+            except PermissionError:
+                print(f"ENERGY WARNING: no permission to read energy counter {path}", file=sys.stderr)
+                continue
+            except (OSError, ValueError):
+                continue
+            # the amd_energy driver accumulates the counters in 64 bits, so wrap-around can be ignored
+            counters.append((get_domain(label), f'{os.path.basename(hwmon)}:{label}', energy, 0))
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print energy counters of the current node.")
+    parser.add_argument("--label", required=True, help="Label of the measurement, e.g. 'start' or 'end'")
+    parser.add_argument("--sysfs-root", default='/sys', help="Root of the sysfs filesystem (default: /sys)")
+    args = parser.parse_args()
+
+    for var in LOCAL_RANK_VARS:
+        if os.environ.get(var, '0') != '0':
+            return
+
+    timestamp = time.time()
+    counters = get_rapl_counters(args.sysfs_root)
+    if not counters:
+        counters = get_amd_energy_counters(args.sysfs_root)
+    if not counters:
+        print(f"ENERGY WARNING: no energy counters found in {args.sysfs_root}", file=sys.stderr)
+
+    hostname = socket.gethostname()
+    for domain, zone, energy, max_range in counters:
+        print(f"ENERGY_COUNTER: {args.label} {hostname} {timestamp:.6f} {domain} {zone} {energy} {max_range}")
+
+
+if __name__ == "__main__":
+    main()
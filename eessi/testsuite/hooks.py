@@ -1,13 +1,19 @@
 """
 Hooks for adding tags, filtering and setting job resources in ReFrame tests
 """
+import glob
+import json
 import math
+import os
 import re
 
 import reframe as rfm
 import reframe.core.logging as rflog
+import reframe.utility.osext as osext
 import reframe.utility.sanity as sn
 
+from eessi.testsuite import check_repetitions, get_cpu_frequencies, get_energy_counters, output_cache, stats
+from eessi.testsuite.analysis import regressions
 from eessi.testsuite.constants import (COMPUTE_UNITS, DEVICE_TYPES, EXTRAS, FEATURES,
                                        GPU_VENDORS, INVALID_SYSTEM, SCALES)
 from eessi.testsuite.utils import (check_extras_key_defined, check_proc_attribute_defined, find_modules,
@@ -829,7 +835,697 @@ def extract_memory_usage(test: rfm.RegressionTest):
     def extract_memory_usage(self):
         return hooks.extract_memory_usage(self)
     """
-    return sn.extractsingle(r'^MAX_MEM_IN_MIB=(?P<memory>\S+)', test.stdout, 'memory', int)
+    return output_cache.extractsingle(r'^MAX_MEM_IN_MIB=(?P<memory>\S+)', test.stdout, 'memory', int)
+
+
+def get_energy_counter_cmds(test: rfm.RegressionTest, sysfs_root='/sys') -> tuple:
+    """
+    Return the shell commands that write the cumulative energy counters of every node into the job output file at the
+    start and at the end of a measurement, see measure_energy_usage()
+    """
+    launch = test.job.launcher.run_command(test.job)
+    cmd = f'{launch} {get_energy_counters.__file__} --sysfs-root {sysfs_root} --label'
+    return f'{cmd} start', f'{cmd} end'
+
+
+def measure_energy_usage(test: rfm.RegressionTest, sysfs_root='/sys'):
+    """
+    Write the cumulative energy counters (RAPL or amd_energy) of every node into the job output file,
+    right before and right after the executable.
+    Intended to be used in tandem with hooks extract_energy_usage() and extract_average_power()
+    Must be called as late as possible before the run phase, i.e. after the test has set its prerun_cmds and
+    postrun_cmds, so that the measurement directly surrounds the executable.
+    To measure the energy of each repetition of a test that uses hook repeat_executable(), pass the commands of
+    get_energy_counter_cmds() as its repetition_cmds instead.
+
+    Arguments:
+    - test: ReFrame test to which this hook should apply
+    - sysfs_root: root of the sysfs filesystem in which the counters are looked up (default: /sys);
+                  can be pointed to a directory with fake counters for testing
+    """
+    start_cmd, end_cmd = get_energy_counter_cmds(test, sysfs_root)
+    test.prerun_cmds.append(start_cmd)
+    test.postrun_cmds.insert(0, end_cmd)
+
+
+def _get_energy_deltas(test: rfm.RegressionTest, directory: str = '.'):
+    """
+    Return the energy (J) consumed per (hostname, domain, zone) between the start and end energy counters, and the
+    elapsed time (s) per hostname, as written by hook measure_energy_usage() into the job output file in directory
+    (relative to the stage directory, see get_repetition_dirs())
+    Counters that wrapped around are corrected with the maximum counter value.
+    """
+    regex = (r'^ENERGY_COUNTER: (?P<label>start|end) (?P<host>\S+) (?P<time>\S+) (?P<domain>\S+) (?P<zone>\S+) '
+             r'(?P<energy>\d+) (?P<max_range>\d+)$')
+    tags = ('label', 'host', 'time', 'domain', 'zone', 'energy', 'max_range')
+    stdout = f'{test.stagedir}/{directory}/{test.stdout}'
+    counters = sn.evaluate(output_cache.extractall(regex, stdout, tags, (str, str, float, str, str, int, int)))
+
+    # if multiple tasks per node printed the counters, only keep the first reading per node
+    readings = {}
+    for label, host, timestamp, domain, zone, energy, max_range in counters:
+        readings.setdefault((label, host, domain, zone), (timestamp, energy, max_range))
+
+    energies = {}
+    elapsed = {}
+    for (label, host, domain, zone), (start_time, start_energy, max_range) in readings.items():
+        if label != 'start' or ('end', host, domain, zone) not in readings:
+            continue
+        end_time, end_energy, _ = readings[('end', host, domain, zone)]
+        delta = end_energy - start_energy
+        if delta < 0 and max_range > 0:
+            delta += max_range
+        energies[(host, domain, zone)] = delta / 1e6
+        elapsed[host] = end_time - start_time
+
+    return energies, elapsed
+
+
+def _get_repetition_energy_deltas(test: rfm.RegressionTest) -> list:
+    """
+    Return the energy deltas (see _get_energy_deltas()) of each completed repetition that has energy counters, if
+    the test used hook repeat_executable() with the commands of get_energy_counter_cmds(), or else of the whole run
+    """
+    deltas = [_get_energy_deltas(test, directory) for directory in get_repetition_dirs(test) or ['.']]
+    return [(energies, elapsed) for energies, elapsed in deltas if energies]
+
+
+def extract_energy_usage(test: rfm.RegressionTest, domain: str):
+    """
+    Extract the energy in J consumed by all nodes in a given domain ('package', 'dram', ...) from the job output file,
+    as written by hook measure_energy_usage(). If the energy was measured per repetition (see repeat_executable()),
+    the median energy of a repetition is returned.
+    To use this hook, add the following method to your test class:
+
+    @performance_function('J', perf_key='energy_package')
+    def extract_energy_usage(self):
+        return hooks.extract_energy_usage(self, 'package')
+    """
+    deltas = _get_repetition_energy_deltas(test)
+    if not deltas:
+        return 0.0
+    return stats.median([
+        sum(energy for (_, dom, _), energy in energies.items() if dom == domain) for energies, _ in deltas
+    ])
+
+
+def extract_average_power(test: rfm.RegressionTest):
+    """
+    Extract the average power in W of the package and dram domains of all nodes from the job output file,
+    as written by hook measure_energy_usage(). If the energy was measured per repetition (see repeat_executable()),
+    the median average power of a repetition is returned.
+    To use this hook, add the following method to your test class:
+
+    @performance_function('W', perf_key='power_avg')
+    def extract_average_power(self):
+        return hooks.extract_average_power(self)
+    """
+    powers = []
+    for energies, elapsed in _get_repetition_energy_deltas(test):
+        if elapsed and max(elapsed.values()) > 0:
+            energy = sum(energy for (_, dom, _), energy in energies.items() if dom in ('package', 'dram'))
+            powers.append(energy / max(elapsed.values()))
+    return stats.median(powers) if powers else 0.0
+
+
+def get_energy_domains(test: rfm.RegressionTest):
+    """Return the sorted list of energy domains for which counters were found by hook measure_energy_usage()"""
+    energies, _ = _get_energy_deltas(test)
+    return sorted({domain for (_, domain, _) in energies})
+
+
+def measure_hw_counters(test: rfm.RegressionTest, events: str):
+    """
+    Wrap the executable in 'perf stat' (through perf_stat_wrapper.sh), which writes the hardware counters of each
+    rank into a separate file perf_stat.<rank>.csv in the stage directory.
+    If perf is not available on the compute nodes, the executable is run as usual and no counters are collected.
+    Intended to be used in tandem with hook extract_hw_counter_metric()
+
+    Arguments:
+    - test: ReFrame test to which this hook should apply
+    - events: comma-separated list of perf events to count
+    """
+    wrapper = os.path.join(os.path.dirname(__file__), 'perf_stat_wrapper.sh')
+    test.executable = f'{wrapper} {test.stagedir} {events} {test.executable}'
+
+
+def _normalize_perf_event(event: str) -> str:
+    """
+    Normalize a perf event name as printed by perf stat:
+    strip modifiers (e.g. instructions:u) and PMU prefixes of hybrid CPUs (e.g. cpu_core/instructions/u)
+    """
+    match = re.match(r'^[\w.-]+/(?P<event>[^/]+)/\w*$', event)
+    if match:
+        event = match.group('event')
+    return event.split(':')[0]
+
+
+def _read_hw_counters(test: rfm.RegressionTest) -> list:
+    """
+    Read the perf stat files written by hook measure_hw_counters()
+    Return a list with one dict per rank, mapping event names to counts (summed over PMUs of hybrid CPUs),
+    including the wall time of the rank as 'wall_seconds'. Unsupported or uncounted events are left out.
+    """
+    ranks = []
+    for path in sorted(glob.glob(os.path.join(test.stagedir, 'perf_stat.*.csv'))):
+        counters = {}
+        with open(path) as f:
+            for line in f:
+                fields = line.strip().split(',')
+                if line.startswith('# wall_seconds'):
+                    counters['wall_seconds'] = float(fields[1])
+                    continue
+                if line.startswith('#') or len(fields) < 3:
+                    continue
+                try:
+                    value = float(fields[0])
+                except ValueError:
+                    # '<not supported>' or '<not counted>'
+                    continue
+                event = _normalize_perf_event(fields[2])
+                if event == 'task-clock' and fields[1] == 'msec':
+                    value /= 1000
+                counters[event] = counters.get(event, 0) + value
+        ranks.append(counters)
+    return ranks
+
+
+def get_hw_counter_metrics(test: rfm.RegressionTest) -> dict:
+    """
+    Compute metrics from the hardware counters written by hook measure_hw_counters()
+    Return a dict mapping metric names to (value, unit), only for metrics for which all required events were counted:
+    - ipc: instructions per cycle
+    - llc_mpki: last-level cache misses per 1000 instructions (LLC-load-misses, or cache-misses as a fallback)
+    - branch_miss_rate: percentage of branches that were mispredicted
+    - task_clock_ratio: CPU time over wall time, averaged over the ranks (i.e. average number of busy CPUs per rank)
+    """
+    ranks = _read_hw_counters(test)
+    totals = {}
+    for counters in ranks:
+        for event, value in counters.items():
+            totals[event] = totals.get(event, 0) + value
+
+    metrics = {}
+    if totals.get('instructions') and totals.get('cycles'):
+        metrics['ipc'] = (totals['instructions'] / totals['cycles'], 'instructions/cycle')
+    llc_event = 'LLC-load-misses' if 'LLC-load-misses' in totals else 'cache-misses'
+    if totals.get('instructions') and llc_event in totals:
+        metrics['llc_mpki'] = (1000 * totals[llc_event] / totals['instructions'], 'misses/kinstructions')
+    if totals.get('branches') and 'branch-misses' in totals:
+        metrics['branch_miss_rate'] = (100 * totals['branch-misses'] / totals['branches'], '%')
+    ratios = [x['task-clock'] / x['wall_seconds'] for x in ranks if 'task-clock' in x and x.get('wall_seconds')]
+    if ratios:
+        metrics['task_clock_ratio'] = (sum(ratios) / len(ratios), 'cpus')
+    return metrics
+
+
+def extract_hw_counter_metric(test: rfm.RegressionTest, metric: str):
+    """
+    Extract a metric computed from the hardware counters written by hook measure_hw_counters(),
+    see get_hw_counter_metrics() for the available metrics.
+    To use this hook, add the following method to your test class:
+
+    @performance_function('instructions/cycle', perf_key='ipc')
+    def extract_ipc(self):
+        return hooks.extract_hw_counter_metric(self, 'ipc')
+    """
+    return get_hw_counter_metrics(test)[metric][0]
+
+
+def measure_cpu_frequency(test: rfm.RegressionTest, interval: float = 1.0, sysfs_root='/sys'):
+    """
+    Record the CPU frequency and thermal throttling during the execution of the executable:
+    - a snapshot of the scaling governors and thermal throttle counters is written into the job output file
+      right before and right after the executable, on every node
+    - the mean frequency of the CPUs of the job on the first node is sampled in the background every interval
+      seconds, and written into the file cpu_freq_samples.out in the stage directory
+    Intended to be used in tandem with hooks extract_cpu_frequency(), extract_throttle_events() and
+    extract_cpu_governor()
+
+    Arguments:
+    - test: ReFrame test to which this hook should apply
+    - interval: sampling interval in seconds
+    - sysfs_root: root of the sysfs filesystem in which the CPU information is looked up (default: /sys)
+    """
+    script = f'{get_cpu_frequencies.__file__} --sysfs-root {sysfs_root}'
+    launch = test.job.launcher.run_command(test.job)
+    samples_file = os.path.join(test.stagedir, 'cpu_freq_samples.out')
+    test.prerun_cmds.extend([
+        f'{launch} {script} --label start',
+        f'{script} --sample --interval {interval} > {samples_file} &',
+        'EESSI_CPU_FREQ_SAMPLER_PID=$!',
+    ])
+    test.postrun_cmds[0:0] = [
+        'kill $EESSI_CPU_FREQ_SAMPLER_PID',
+        f'{launch} {script} --label end',
+    ]
+
+
+def _get_timed_cpu_frequency_samples(test: rfm.RegressionTest) -> list:
+    """Return the (time, CPU frequency in MHz) samples written by hook measure_cpu_frequency()"""
+    samples_file = os.path.join(test.stagedir, 'cpu_freq_samples.out')
+    if not os.path.exists(samples_file):
+        return []
+    regex = r'^CPU_FREQ: (?P<time>\S+) (?P<freq>\S+)$'
+    return sn.evaluate(output_cache.extractall(regex, samples_file, ('time', 'freq'), (float, float)))
+
+
+def get_cpu_frequency_samples(test: rfm.RegressionTest) -> list:
+    """Return the CPU frequency samples (MHz) written by hook measure_cpu_frequency()"""
+    return [freq for _, freq in _get_timed_cpu_frequency_samples(test)]
+
+
+def extract_cpu_frequency(test: rfm.RegressionTest):
+    """
+    Extract the mean CPU frequency in MHz during the execution of the executable,
+    as sampled by hook measure_cpu_frequency(). If the executable was repeated (see repeat_executable()), the median
+    over the repetitions of the mean frequency during each repetition is returned (repetitions without samples, i.e.
+    shorter than the sampling interval, are left out).
+    To use this hook, add the following method to your test class:
+
+    @performance_function('MHz', perf_key='cpu_freq_mean')
+    def extract_cpu_frequency(self):
+        return hooks.extract_cpu_frequency(self)
+    """
+    samples = _get_timed_cpu_frequency_samples(test)
+    means = []
+    for start, end in get_repetition_times(test):
+        freqs = [freq for time, freq in samples if start <= time <= end]
+        if freqs:
+            means.append(sum(freqs) / len(freqs))
+    if means:
+        return stats.median(means)
+    return sn.avg([freq for _, freq in samples])
+
+
+def extract_throttle_events(test: rfm.RegressionTest):
+    """
+    Extract the number of thermal throttle events (core and package) on all nodes during the execution of the
+    executable, as written by hook measure_cpu_frequency(). If the executable was repeated (see
+    repeat_executable()), these are the events during all repetitions.
+    To use this hook, add the following method to your test class:
+
+    @performance_function('events', perf_key='throttle_events')
+    def extract_throttle_events(self):
+        return hooks.extract_throttle_events(self)
+    """
+    regex = r'^CPU_THROTTLE: (?P<label>start|end) (?P<host>\S+) (?P<core>\d+) (?P<package>\d+)$'
+    stdout = f'{test.stagedir}/{test.stdout}'
+    tags = ('label', 'host', 'core', 'package')
+    counters = sn.evaluate(output_cache.extractall(regex, stdout, tags, (str, str, int, int)))
+    readings = {}
+    for label, host, core, package in counters:
+        readings.setdefault((label, host), core + package)
+    return sum(readings[('end', host)] - events for (label, host), events in readings.items()
+               if label == 'start' and ('end', host) in readings)
+
+
+def extract_cpu_governor(test: rfm.RegressionTest) -> str:
+    """
+    Extract the scaling governor(s) of all nodes, as written by hook measure_cpu_frequency()
+    Returns a comma-separated list of the unique governors, or 'None' if they could not be determined
+    """
+    stdout = f'{test.stagedir}/{test.stdout}'
+    regex = r'^CPU_GOVERNOR: \S+ (?P<governors>\S+)$'
+    governors = set()
+    for govs in sn.evaluate(output_cache.extractall(regex, stdout, 'governors')):
+        governors.update(govs.split(','))
+    return ','.join(sorted(governors)) or 'None'
+
+
+def _phase_marker(label: str) -> str:
+    """Return a shell command that prints a timestamped phase marker into the job output file"""
+    return f'echo "EESSI_PHASE_TIME: {label} $(date +%s.%N)"'
+
+
+def _group_shell_commands(cmds: list) -> list:
+    """
+    Group a list of shell command lines into top-level commands, keeping multi-line compound commands
+    (if/for/while/until/case) together, and attaching variable assignments and commands that are started in the
+    background (which take no time, e.g. the CPU frequency sampler) to the preceding command
+    """
+    groups = []
+    depth = 0
+    for cmd in cmds:
+        # ignore keywords in quoted strings
+        tokens = re.split(r'[\s;]+', re.sub(r"'[^']*'|\"[^\"]*\"", '', cmd))
+        is_assignment = re.match(r'^\s*\w+=\S*\s*$', cmd)
+        is_background = re.search(r'[^&]&\s*$', cmd)
+        if depth > 0 or (groups and (is_assignment or is_background)):
+            groups[-1].append(cmd)
+        else:
+            groups.append([cmd])
+        depth += sum(tok in ('if', 'for', 'while', 'until', 'case') for tok in tokens)
+        depth -= sum(tok in ('fi', 'done', 'esac') for tok in tokens)
+        depth = max(depth, 0)
+    return groups
+
+
+def _get_command_label(group: list, launcher: str) -> str:
+    """
+    Return a short label for a group of shell command lines: the name of the first program that is run,
+    preferring the program started with the parallel launcher. The conditions of compound commands are skipped,
+    such that e.g. 'if command -v hwloc-calc; then <launcher> get_process_binding.sh ...' is labeled
+    get_process_binding, whether the launcher is empty (local) or not.
+    """
+    body = [cmd for cmd in group if not re.match(r'^\s*(if|elif|else|fi|then|while|until|do|done)\b', cmd)]
+    body = body or group
+    launched = [cmd.strip()[len(launcher):] for cmd in body if launcher and cmd.strip().startswith(launcher)]
+    cmd = launched[0] if launched else body[0]
+    skip = ('if', 'then', 'else', 'elif', 'while', 'until', 'do', '!', 'time', 'exec', 'command',
+            'python', 'python3', 'bash', 'sh')
+    for token in cmd.split():
+        if token in skip or token.startswith('-') or '=' in token:
+            continue
+        label = re.sub(r'\W+', '_', os.path.splitext(os.path.basename(token))[0]).strip('_')
+        if label:
+            return label
+    return 'cmd'
+
+
+def measure_phase_timing(test: rfm.RegressionTest):
+    """
+    Print timestamped markers into the job output file between each of the (top-level) prerun commands,
+    right before and after the executable and after the postrun commands.
+    Must be called after all other hooks that modify the prerun_cmds and postrun_cmds.
+    Intended to be used in tandem with hooks get_phase_timings() and extract_phase_time()
+
+    The phases are labeled as follows:
+    - prerun_<name>: prerun command, where <name> is the name of the program that it runs, e.g. prerun_blockMesh
+    - main: the executable
+    - postrun: all postrun commands
+    """
+    launcher = test.job.launcher.run_command(test.job).strip()
+    counts = {}
+    prerun_cmds = []
+    for group in _group_shell_commands(test.prerun_cmds):
+        name = _get_command_label(group, launcher)
+        counts[name] = counts.get(name, 0) + 1
+        label = f'prerun_{name}' if counts[name] == 1 else f'prerun_{name}_{counts[name]}'
+        prerun_cmds.append(_phase_marker(label))
+        prerun_cmds.extend(group)
+    prerun_cmds.append(_phase_marker('main'))
+
+    test.prerun_cmds = prerun_cmds
+    test.postrun_cmds = [_phase_marker('postrun')] + test.postrun_cmds + [_phase_marker('end')]
+
+
+def get_phase_timings(test: rfm.RegressionTest) -> dict:
+    """
+    Return the wall time in seconds of each phase, as written by hook measure_phase_timing(), plus the total
+    overhead, i.e. the time spent in all prerun and postrun commands.
+    Phases that did not complete (e.g. because the job failed) are left out. If the executable was repeated (see
+    repeat_executable()), the main phase is the median wall time of a repetition.
+    """
+    stdout = f'{test.stagedir}/{test.stdout}'
+    regex = r'^EESSI_PHASE_TIME: (?P<label>\S+) (?P<time>\S+)$'
+    markers = sn.evaluate(output_cache.extractall(regex, stdout, ('label', 'time'), (str, float)))
+    timings = {}
+    for (label, start), (_, end) in zip(markers, markers[1:]):
+        timings[label] = end - start
+    repetition_times = get_repetition_times(test)
+    if 'main' in timings and repetition_times:
+        timings['main'] = stats.median([end - start for start, end in repetition_times])
+    if timings and markers[-1][0] == 'end':
+        timings['overhead'] = sum(time for label, time in timings.items() if label != 'main')
+    return timings
+
+
+def extract_phase_time(test: rfm.RegressionTest, phase: str):
+    """
+    Extract the wall time in seconds of a given phase, as written by hook measure_phase_timing()
+    To use this hook, add the following method to your test class:
+
+    @performance_function('s', perf_key='t_main')
+    def extract_main_time(self):
+        return hooks.extract_phase_time(self, 'main')
+    """
+    return get_phase_timings(test)[phase]
+
+
+def measure_env_setup_time(test: rfm.RegressionTest):
+    """
+    Write the start time of the job script, the end time of the EESSI initialization (if exported in
+    EESSI_INIT_END_TIME by common_eessi_init()) and the start time of the prerun commands into the job output file.
+    The start time of the job script is obtained from the start time of the job shell process in /proc.
+    Must be called after all other hooks that modify the prerun_cmds, such that it is the first prerun command.
+    Intended to be used in tandem with hooks get_env_setup_timings() and extract_env_setup_time()
+    """
+    job_start = ' '.join([
+        'awk -v now=$(date +%s.%N) -v tck=$(getconf CLK_TCK) -v start=$(cut -d" " -f22 /proc/$$/stat)',
+        "'{printf \"%.3f\", now - $1 + start / tck}' /proc/uptime",
+    ])
+    test.prerun_cmds[0:0] = [
+        f'echo "EESSI_ENV_SETUP_TIME: job_start $({job_start})"',
+        'echo "EESSI_ENV_SETUP_TIME: eessi_init_end ${EESSI_INIT_END_TIME:-None}"',
+        'echo "EESSI_ENV_SETUP_TIME: prerun_start $(date +%s.%N)"',
+    ]
+
+
+def get_env_setup_timings(test: rfm.RegressionTest) -> dict:
+    """
+    Return the environment setup times in seconds, as written by hook measure_env_setup_time():
+    - env_setup: time from the start of the job script until the start of the prerun commands
+    - eessi_init: time from the start of the job script until the end of the EESSI initialization,
+      which includes the partition's prepare_cmds up to and including common_eessi_init()
+    - module_load: time from the end of the EESSI initialization until the start of the prerun commands,
+      which is dominated by loading the modules of the test
+    eessi_init and module_load are only available if common_eessi_init() is used in the prepare_cmds.
+    """
+    stdout = f'{test.stagedir}/{test.stdout}'
+    regex = r'^EESSI_ENV_SETUP_TIME: (?P<label>\S+) (?P<time>\S+)$'
+    times = dict(sn.evaluate(output_cache.extractall(regex, stdout, ('label', 'time'))))
+    timings = {}
+    try:
+        job_start = float(times['job_start'])
+        prerun_start = float(times['prerun_start'])
+    except (KeyError, ValueError):
+        return timings
+    timings['env_setup'] = prerun_start - job_start
+    try:
+        eessi_init_end = float(times.get('eessi_init_end'))
+    except (TypeError, ValueError):
+        return timings
+    # EESSI_INIT_END_TIME may be inherited from another job, so check that it is within the job's time frame
+    if job_start <= eessi_init_end <= prerun_start:
+        timings['eessi_init'] = eessi_init_end - job_start
+        timings['module_load'] = prerun_start - eessi_init_end
+    return timings
+
+
+def extract_env_setup_time(test: rfm.RegressionTest, phase: str):
+    """
+    Extract the environment setup time in seconds of a given phase, as written by hook measure_env_setup_time()
+    To use this hook, add the following method to your test class:
+
+    @performance_function('s', perf_key='t_module_load')
+    def extract_module_load_time(self):
+        return hooks.extract_env_setup_time(self, 'module_load')
+    """
+    return get_env_setup_timings(test)[phase]
+
+
+def get_samples(test: rfm.RegressionTest) -> dict:
+    """
+    Return the series of raw performance samples that the test wrote to its output file, as a mapping
+    name -> (unit, values). A series is written as a single line with the name, the unit and the values of the samples,
+    separated by spaces, e.g.:
+
+    EESSI_SAMPLES: img_sec img/sec 1023.4 1019.8 1025.1
+
+    If a series is written more than once, e.g. by multiple ranks, the values are combined.
+    """
+    stdout = f'{test.stagedir}/{test.stdout}'
+    regex = r'^EESSI_SAMPLES: (?P<name>\S+) (?P<unit>\S+)(?P<values>(?: +\S+)*) *$'
+    samples = {}
+    for name, unit, values in sn.evaluate(output_cache.extractall(regex, stdout, ('name', 'unit', 'values'))):
+        try:
+            values = [float(x) for x in values.split()]
+        except ValueError:
+            rflog.getlogger().warning(f'{test.name}: ignoring samples of {name} with non-numeric values')
+            continue
+        if values:
+            samples.setdefault(name, (unit, []))[1].extend(values)
+    return samples
+
+
+def write_samples_artifact(test: rfm.RegressionTest, samples: dict, filename: str = 'samples.json'):
+    """
+    Write the raw performance samples returned by get_samples() to a JSON file in the stage directory,
+    and add it to the files that ReFrame keeps in the output directory of the test.
+    """
+    data = {name: {'unit': unit, 'values': values} for name, (unit, values) in samples.items()}
+    with open(os.path.join(test.stagedir, filename), 'w') as file:
+        json.dump(data, file, indent=2)
+    if filename not in test.keep_files:
+        test.keep_files.append(filename)
+
+
+def repeat_executable(test: rfm.RegressionTest, target: float, confidence: float = 0.95, max_repetitions: int = 20,
+                      time_budget: float = 0.0, repetition_cmds: tuple = None):
+    """
+    Repeat the executable within the same job until the confidence interval of the median wall time of the
+    repetitions is narrow enough, or until a repetition or time budget is exhausted (see check_repetitions.py).
+    Only the first repetition writes into the job output and error files, such that the sanity functions of the test
+    check a single run of the executable. Repetition N > 1 writes into the files with the same names in the
+    directory repetition_<N> in the stage directory. The start time, end time and exit status of each repetition are
+    written into the file repetitions.out in the stage directory.
+    Must be called after all other hooks that modify the prerun_cmds and postrun_cmds, such that the loop wraps
+    the executable as tightly as possible.
+    Intended to be used in tandem with hooks get_repetition_dirs() and evaluate_per_repetition()
+
+    Arguments:
+    - test: ReFrame test to which this hook should apply
+    - target: target relative width of the confidence interval of the median wall time, e.g. 0.02
+    - confidence: confidence level of the interval
+    - max_repetitions: maximum number of repetitions
+    - time_budget: maximum time in seconds that is spent in the repetitions (0: no limit)
+    - repetition_cmds: (start, end) shell commands that are run right before and right after each repetition, outside
+      of its wall time, and that write into the job output file of the repetition, e.g. the commands of
+      get_energy_counter_cmds() to measure the energy per repetition
+    """
+    start_cmds, end_cmds = ([x] for x in repetition_cmds) if repetition_cmds else ([], [])
+    repetitions_file = os.path.join(test.stagedir, 'repetitions.out')
+    repetition_dir = os.path.join(test.stagedir, 'repetition_$EESSI_REPETITION')
+    check = ' '.join([
+        check_repetitions.__file__,
+        f'--target {target} --confidence {confidence} --max {max_repetitions} --budget {time_budget}',
+        repetitions_file,
+    ])
+    test.prerun_cmds.extend([
+        f'rm -f {repetitions_file}',
+        'EESSI_REPETITION=0',
+        'while true; do',
+        'EESSI_REPETITION=$((EESSI_REPETITION + 1))',
+        'if [ $EESSI_REPETITION -gt 1 ]; then',
+        f'mkdir -p {repetition_dir}',
+        f'exec 8>&1 9>&2 >{repetition_dir}/{test.job.stdout} 2>{repetition_dir}/{test.job.stderr}',
+        'fi',
+        *start_cmds,
+        'EESSI_REPETITION_START=$(date +%s.%N)',
+    ])
+    test.postrun_cmds[0:0] = [
+        'EESSI_REPETITION_STATUS=$?',
+        'EESSI_REPETITION_END=$(date +%s.%N)',
+        *end_cmds,
+        'if [ $EESSI_REPETITION -gt 1 ]; then',
+        'exec 1>&8 2>&9 8>&- 9>&-',
+        'fi',
+        'echo "$EESSI_REPETITION $EESSI_REPETITION_START $EESSI_REPETITION_END $EESSI_REPETITION_STATUS"'
+        f' >> {repetitions_file}',
+        f'{check} || break',
+        'done',
+    ]
+
+
+def _get_completed_repetitions(test: rfm.RegressionTest) -> list:
+    """Return the (repetition, start, end) of the repetitions of hook repeat_executable() that completed successfully"""
+    repetitions_file = os.path.join(test.stagedir, 'repetitions.out')
+    if not os.path.exists(repetitions_file):
+        return []
+    return [(repetition, start, end)
+            for repetition, start, end, status in check_repetitions.read_repetitions(repetitions_file) if status == 0]
+
+
+def get_repetition_dirs(test: rfm.RegressionTest) -> list:
+    """
+    Return the directories (relative to the stage directory) with the job output and error files of the repetitions
+    of a test that used hook repeat_executable(): '.' for the first repetition, and repetition_<N> for repetition N.
+    Repetitions that failed or did not complete are left out.
+    """
+    return [
+        '.' if repetition == 1 else f'repetition_{repetition}' for repetition, *_ in _get_completed_repetitions(test)
+    ]
+
+
+def get_repetition_times(test: rfm.RegressionTest) -> list:
+    """
+    Return the (start, end) unix times of the repetitions of a test that used hook repeat_executable(), in the order
+    of get_repetition_dirs()
+    """
+    return [(start, end) for _, start, end in _get_completed_repetitions(test)]
+
+
+def get_repetition_decision(test: rfm.RegressionTest) -> tuple:
+    """
+    Return the last decision of check_repetitions.py in the job output file, as (reason, repetitions, relative CI
+    width of the median wall time), or None if there is none
+    """
+    stdout = f'{test.stagedir}/{test.stdout}'
+    regex = r'^EESSI_REPETITIONS: \S+ (?P<reason>\S+) (?P<count>\d+) (?P<width>\S+)$'
+    decisions = sn.evaluate(output_cache.extractall(regex, stdout, ('reason', 'count', 'width')))
+    if not decisions:
+        return None
+    reason, count, width = decisions[-1]
+    return reason, int(count), None if width == 'None' else float(width)
+
+
+def evaluate_per_repetition(test: rfm.RegressionTest, expr, dirs: list) -> list:
+    """
+    Evaluate a performance function of a test in the directory of each repetition (see get_repetition_dirs()), and
+    return the values. Like ReFrame does in the performance stage, the performance function is evaluated in that
+    directory, such that the (relative) job output and error files of the test resolve to those of the repetition.
+    Raises a SanityError if the evaluation fails for any of the repetitions, e.g. because the performance function
+    reads another file, which is not kept per repetition.
+    """
+    values = []
+    for directory in dirs:
+        with osext.change_dir(os.path.join(test.stagedir, directory)):
+            values.append(expr.evaluate())
+    return values
+
+
+def summarize_repetitions(values: list, confidence: float = 0.95) -> dict:
+    """
+    Return the median of the values of a perf variable over the repetitions, and the confidence interval of the
+    median (ci_low, ci_high; None if there are too few repetitions)
+    """
+    try:
+        ci_low, ci_high = stats.median_ci(values, confidence)
+    except ValueError:
+        ci_low = ci_high = None
+    return {'median': stats.median(values), 'ci_low': ci_low, 'ci_high': ci_high}
+
+
+def is_spread(perf_var: str) -> bool:
+    """
+    Return whether a perf variable describes the spread of another perf variable rather than its value, e.g.
+    img_sec_stddev or perf_ci_low, see stats.summary() and summarize_repetitions()
+    """
+    return perf_var.endswith(('_stddev', '_p5', '_p95', '_ci_low', '_ci_high'))
+
+
+def is_throughput(unit: str, perf_var: str = '') -> bool:
+    """
+    Return whether a perf variable with the given unit is a throughput, i.e. an amount of work per unit of time
+    (e.g. timesteps/s, img/sec, ns/day, MLU/s or GFLOPS), which scales with the resources used.
+    Data rates (e.g. MB/s) are left out, since they typically measure a single link rather than the resources of the
+    job.
+    """
+    if not unit or regressions.lower_is_better(unit, perf_var):
+        return False
+    if re.match(r'^[KMGTP]?i?B/s$', unit):
+        return False
+    return bool(re.match(r'^[^/]+/(s|sec|min|h|hour|day)$', unit) or re.search(r'flop', unit, re.IGNORECASE))
+
+
+def get_normalization_resources(test: rfm.RegressionTest) -> dict:
+    """
+    Return the resources by which the throughputs of a test are normalised, as a mapping resource -> count:
+    - gpu: number of GPUs (num_gpus_per_node per node), for GPU tests
+    - core: number of cores (num_tasks * num_cpus_per_task), for CPU tests
+    - node: number of nodes, for scales that use whole nodes only
+    Must be called after hook set_tag_scale(), which sets num_nodes and node_part.
+    """
+    resources = {}
+    if test.device_type == DEVICE_TYPES.GPU:
+        if test.num_gpus_per_node:
+            resources['gpu'] = test.num_nodes * test.num_gpus_per_node
+    elif test.num_tasks and test.num_cpus_per_task:
+        resources['core'] = test.num_tasks * test.num_cpus_per_task
+    if test.node_part == 1:
+        resources['node'] = test.num_nodes
+    return resources
 
 
 def add_buildenv_module(test: rfm.RegressionTest, index=-1):
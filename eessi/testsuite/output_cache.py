@@ -0,0 +1,383 @@
+"""
+Cached access to the output files of tests, as a drop-in replacement for ReFrame's file-based sanity functions
+(sn.extractall, sn.extractsingle, sn.findall, sn.assert_found and sn.count of sn.extractall).
+
+ReFrame's sanity functions read the whole file again for every call, which adds up for tests that do multiple
+extractions from the same (large) output file. Here, each file is read only once and kept in memory, regex patterns
+are compiled once, and the matches of each pattern are computed once and reused by all subsequent extractions with
+that pattern. Patterns that are known in advance can be registered with register(), so that they are all matched
+as soon as the file is read.
+
+The cache is invalidated automatically when a file changes on disk, and should be released with release() once
+all extractions for a test are done (the EESSI_Mixin does this after the performance stage).
+
+Very large files (at least MMAP_MIN_SIZE bytes) are memory-mapped instead of read into memory, and extractlast()
+searches from the end of the file, so that extracting a final value (e.g. the total run time) does not require
+scanning the whole file. Compressed files (.gz, or .zst if the zstandard Python package is available) are read
+transparently, also if they are referred to by the name of the uncompressed file, e.g. after compress().
+
+Example:
+
+    from eessi.testsuite import output_cache as oc
+
+    @performance_function('timesteps/s')
+    def perf(self):
+        return oc.extractsingle(r'(?P<perf>\\S+) timesteps/s', self.stdout, 'perf', float)
+"""
+import collections.abc
+import gzip
+import io
+import itertools
+import mmap
+import os
+import re
+import shutil
+
+from reframe.core.exceptions import SanityError
+from reframe.utility.sanity import deferrable
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# cached files: absolute path -> _CachedFile
+_files = {}
+# compiled patterns: pattern -> re.Pattern
+_compiled = {}
+# patterns to match as soon as a file is read: absolute path -> list of patterns
+_registered = {}
+# results of parsers: (absolute path, parser) -> (signature, result)
+_parsed = {}
+# maximum total size of the cached files, beyond which the least recently read files are released
+MAX_CACHED_CHARS = 2 * 1024 ** 3
+# minimum size of the (uncompressed) files that are memory-mapped instead of read into memory
+MMAP_MIN_SIZE = 64 * 1024 ** 2
+# size of the tail of a file in which extractlast() first searches, which grows until a match is found
+LAST_MATCH_WINDOW = 1024 ** 2
+# minimum size of the files that are compressed by compress()
+COMPRESS_MIN_SIZE = 1024 ** 2
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+
+class _DecodedMatch:
+    """
+    Match of a bytes pattern in a memory-mapped file, with the groups decoded to str like a match of a str pattern.
+    The groups are decoded right away, such that the match does not keep a reference to the memory-mapped file.
+    """
+
+    def __init__(self, match, encoding):
+        self.re = match.re
+        self._groups = [match.group(0)] + list(match.groups())
+        self._groups = [x.decode(encoding) if x is not None else None for x in self._groups]
+        self._groupindex = match.re.groupindex
+        self._spans = [match.span(i) for i in range(len(self._groups))]
+
+    def group(self, *tags):
+        if not tags:
+            tags = (0,)
+        values = []
+        for tag in tags:
+            index = self._groupindex[tag] if isinstance(tag, str) else tag
+            values.append(self._groups[index])
+        return values[0] if len(values) == 1 else tuple(values)
+
+    def groups(self, default=None):
+        return tuple(default if x is None else x for x in self._groups[1:])
+
+    def groupdict(self, default=None):
+        return {name: default if self.group(name) is None else self.group(name) for name in self._groupindex}
+
+    def span(self, group=0):
+        return self._spans[self._groupindex[group] if isinstance(group, str) else group]
+
+    def start(self, group=0):
+        return self.span(group)[0]
+
+    def end(self, group=0):
+        return self.span(group)[1]
+
+
+class _CachedFile:
+    """
+    Contents of a file, together with the matches of all patterns that were searched in it.
+    Large uncompressed files are memory-mapped, and searched with the bytes version of the patterns.
+    """
+
+    def __init__(self, path, encoding):
+        self.signature = _signature(path)
+        self.encoding = encoding
+        self.content = ''
+        self.mmap = None
+        if self.signature[1] >= MMAP_MIN_SIZE and not path.endswith(COMPRESSED_SUFFIXES):
+            with open(path, 'rb') as fp:
+                self.mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with _open(path, encoding) as fp:
+                self.content = fp.read()
+        self.matches = {}
+
+    def _regex(self, patt):
+        if self.mmap is None:
+            return _compile(patt)
+        return _compile(patt.encode(self.encoding))
+
+    def _match(self, match):
+        if self.mmap is None or match is None:
+            return match
+        return _DecodedMatch(match, self.encoding)
+
+    def findall(self, patt):
+        if patt not in self.matches:
+            data = self.content if self.mmap is None else self.mmap
+            self.matches[patt] = [self._match(m) for m in self._regex(patt).finditer(data)]
+        return self.matches[patt]
+
+    def findlast(self, patt):
+        """
+        Return the last match of patt, or None. Unless all matches are known already, the search starts in the tail
+        of the file (aligned to the start of a line), which is extended until a match is found.
+        """
+        if patt in self.matches:
+            return self.matches[patt][-1] if self.matches[patt] else None
+
+        data = self.content if self.mmap is None else self.mmap
+        newline = '\n' if self.mmap is None else b'\n'
+        regex = self._regex(patt)
+        window = LAST_MATCH_WINDOW
+        while True:
+            start = max(len(data) - window, 0)
+            if start > 0:
+                start = data.find(newline, start) + 1 or len(data)
+            last = None
+            for last in regex.finditer(data, start):
+                pass
+            if last is not None or start == 0:
+                return self._match(last)
+            window *= 4
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _compile(patt):
+    if patt not in _compiled:
+        _compiled[patt] = re.compile(patt, re.MULTILINE)
+    return _compiled[patt]
+
+
+def resolve_output(filename) -> str:
+    """Return the absolute path of filename, or of its compressed version if only that exists"""
+    path = os.path.abspath(filename)
+    if not os.path.exists(path):
+        for suffix in COMPRESSED_SUFFIXES:
+            if os.path.exists(path + suffix):
+                return path + suffix
+    return path
+
+
+def _open(path, encoding):
+    """Open a (possibly compressed) file for reading text"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding=encoding)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise OSError(f'{path}: the zstandard Python package is required to read .zst files')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True),
+                                encoding=encoding)
+    return open(path, 'rt', encoding=encoding)
+
+
+def open_output(filename, encoding='utf-8'):
+    """
+    Open an output file for reading text, which is transparently decompressed if it is (or was) compressed, e.g.:
+
+        with output_cache.open_output('log.icofoam') as file:
+            for line in file:
+                ...
+    """
+    return _open(resolve_output(filename), encoding)
+
+
+def _drop(path):
+    cached = _files.pop(path, None)
+    if cached is not None:
+        cached.close()
+
+
+def _get_file(filename, encoding='utf-8') -> _CachedFile:
+    """Return the cached file, (re-)reading it if it is not cached yet or if it changed on disk"""
+    path = os.path.abspath(filename)
+    try:
+        cached = _files.get(path)
+        if cached is None or cached.signature != _signature(resolve_output(path)):
+            cached = _CachedFile(resolve_output(path), encoding)
+            for patt in _registered.get(path, []):
+                cached.findall(patt)
+            _drop(path)
+            _files[path] = cached
+            while len(_files) > 1 and sum(len(x.content) for x in _files.values()) > MAX_CACHED_CHARS:
+                _drop(next(iter(_files)))
+    except OSError as e:
+        # raise as sanity error, like ReFrame's sanity functions
+        raise SanityError(f'{filename}: {e.strerror or e}')
+    return cached
+
+
+def register(filename, *patterns):
+    """
+    Register regex patterns that will be searched in filename, so that they are all matched in one go when the file
+    is read. If the file was already read, the patterns are matched right away.
+    """
+    path = os.path.abspath(filename)
+    _registered.setdefault(path, [])
+    for patt in patterns:
+        _compile(patt)
+        if patt not in _registered[path]:
+            _registered[path].append(patt)
+        if path in _files:
+            _files[path].findall(patt)
+
+
+def parse(filename, parser, encoding='utf-8'):
+    """
+    Return the result of parser for filename, where parser is a function that parses the lines of a file in a single
+    pass, e.g. a streaming parser of an application log. The file is read with open_output(), so it may be
+    compressed. The result is cached until the file changes on disk or is released with release(), like the cached
+    files.
+    """
+    path = os.path.abspath(filename)
+    try:
+        signature = _signature(resolve_output(path))
+        cached = _parsed.get((path, parser))
+        if cached is None or cached[0] != signature:
+            with open_output(path, encoding) as file:
+                cached = (signature, parser(file))
+            _parsed[(path, parser)] = cached
+    except OSError as e:
+        raise SanityError(f'{filename}: {e.strerror or e}')
+    return cached[1]
+
+
+def release(directory=None):
+    """Release the cached files (and registered patterns and parser results) in a given directory, or all of them"""
+    prefix = os.path.join(os.path.abspath(directory), '') if directory else ''
+    for path in [x for x in _files if x.startswith(prefix)]:
+        _drop(path)
+    for path in [x for x in _registered if x.startswith(prefix)]:
+        del _registered[path]
+    for key in [x for x in _parsed if x[0].startswith(prefix)]:
+        del _parsed[key]
+
+
+def compress(filename, min_size=COMPRESS_MIN_SIZE):
+    """
+    Compress filename with gzip if it is at least min_size bytes, replacing it with filename.gz.
+    The compressed file can still be read with the functions of this module, using the original name.
+    Returns the path of the compressed file, or None if the file was not compressed.
+    """
+    path = os.path.abspath(filename)
+    if path.endswith(COMPRESSED_SUFFIXES) or os.path.getsize(path) < min_size:
+        return None
+    _drop(path)
+    with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    shutil.copystat(path, path + '.gz')
+    os.remove(path)
+    return path + '.gz'
+
+
+def _callable_name(fn):
+    return getattr(fn, '__name__', fn.__class__.__name__)
+
+
+def _convert(val, conv):
+    try:
+        return conv(val) if callable(conv) else val
+    except ValueError:
+        raise SanityError(f'could not convert value {val!r} using {_callable_name(conv)}()')
+
+
+def _group(match, patt, tag):
+    try:
+        return match.group(tag)
+    except (IndexError, KeyError):
+        raise SanityError(f'no such group in pattern {patt!r}: {tag}')
+
+
+@deferrable
+def findall(patt, filename, encoding='utf-8'):
+    """Get all matches of regex patt in filename, see sn.findall()"""
+    return list(_get_file(filename, encoding).findall(patt))
+
+
+def _extract(matches, patt, tag, conv):
+    """Extract the value(s) of capturing group(s) tag from the matches, with the same semantics as sn.extractall()"""
+    if isinstance(tag, collections.abc.Iterable) and not isinstance(tag, str):
+        if not isinstance(conv, collections.abc.Iterable):
+            conv = [conv] * len(tag)
+        else:
+            conv = list(conv)[:len(tag)]
+        return [
+            tuple(_convert(_group(m, patt, t), c) for t, c in itertools.zip_longest(tag, conv, fillvalue=conv[-1]))
+            for m in matches
+        ]
+
+    if isinstance(conv, collections.abc.Iterable):
+        raise SanityError(f'multiple conversion functions given for the single capturing group {tag!r}')
+    return [_convert(_group(m, patt, tag), conv) for m in matches]
+
+
+@deferrable
+def extractall(patt, filename, tag=0, conv=None, encoding='utf-8'):
+    """
+    Extract all values from the capturing group(s) tag of a matching regex patt in filename,
+    with the same semantics as sn.extractall()
+    """
+    return _extract(_get_file(filename, encoding).findall(patt), patt, tag, conv)
+
+
+@deferrable
+def extractsingle(patt, filename, tag=0, conv=None, item=0, encoding='utf-8'):
+    """
+    Extract a single value from the capturing group(s) tag of a matching regex patt in filename,
+    with the same semantics as sn.extractsingle()
+    """
+    try:
+        return extractall(patt, filename, tag, conv, encoding).evaluate()[item]
+    except IndexError:
+        raise SanityError(
+            f'not enough matches of pattern {patt!r} in file {filename!r} so as to extract item {item!r}')
+
+
+@deferrable
+def extractlast(patt, filename, tag=0, conv=None, encoding='utf-8'):
+    """
+    Extract the value(s) from the capturing group(s) tag of the last match of regex patt in filename.
+    Equivalent to extractsingle() with item=-1, but searches from the end of the file, so that only the tail of
+    the file is scanned if the last match is near the end.
+    """
+    match = _get_file(filename, encoding).findlast(patt)
+    if match is None:
+        raise SanityError(f'pattern {patt!r} not found in file {filename!r}')
+    return _extract([match], patt, tag, conv)[0]
+
+
+@deferrable
+def count(patt, filename, encoding='utf-8'):
+    """Return the number of matches of regex patt in filename"""
+    return len(_get_file(filename, encoding).findall(patt))
+
+
+@deferrable
+def assert_found(patt, filename, msg=None, encoding='utf-8'):
+    """Assert that regex pattern patt is found in filename, see sn.assert_found()"""
+    if not _get_file(filename, encoding).findall(patt):
+        raise SanityError(msg or f'pattern {patt!r} not found in {filename!r}')
+    return True
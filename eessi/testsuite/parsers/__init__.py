@@ -0,0 +1,2 @@
+# WARNING: do not remove this file.
+# It is needed to autogenerate documentation from this repo.
@@ -0,0 +1,108 @@
+"""
+Parser for the reports that CP2K prints at the end of its output:
+
+- the DBCSR statistics, e.g.:
+
+ -                                DBCSR STATISTICS                             -
+ ...
+ COUNTER                                    TOTAL       BLAS       SMM       ACC
+ flops total                         5.123456E+11       0.0%    100.0%      0.0%
+ flops max/rank                      1.234567E+10       0.0%    100.0%      0.0%
+ marketing flops                        6.789E+11
+ -------------------------------------------------------------------------------
+ # multiplications                                    1234
+ max memory usage/rank                           1.234E+09
+ # MPI messages exchanged                            12345
+ MPI messages size (bytes):
+  total size                                     1.234E+10
+
+- the timing report, e.g.:
+
+ -                                T I M I N G                                  -
+ ...
+ SUBROUTINE                       CALLS  ASD         SELF TIME        TOTAL TIME
+                                MAXIMUM       AVERAGE  MAXIMUM  AVERAGE  MAXIMUM
+ CP2K                                 1  1.0    0.011    0.036   71.418   71.420
+ qs_forces                           11  3.9    0.001    0.001   64.021   64.022
+ ...
+ -------------------------------------------------------------------------------
+"""
+import re
+
+from eessi.testsuite import output_cache
+
+_TIMING_ROW_REGEX = re.compile(
+    r'^ (?P<name>\S+)\s+(?P<calls>\d+)\s+(?P<asd>[.0-9]+)\s+(?P<self_avg>[.0-9]+)\s+(?P<self_max>[.0-9]+)'
+    r'\s+(?P<total_avg>[.0-9]+)\s+(?P<total_max>[.0-9]+)\s*$'
+)
+_NUMBER = r'[-+]?[.0-9]+(?:[eE][-+]?\d+)?'
+# DBCSR counter -> regex of the line with its value, within the DBCSR statistics
+_DBCSR_REGEXES = {
+    'flops_total': re.compile(rf'^ flops total\s+(?P<value>{_NUMBER})'),
+    'flops_max_rank': re.compile(rf'^ flops max/rank\s+(?P<value>{_NUMBER})'),
+    'marketing_flops': re.compile(rf'^ marketing flops\s+(?P<value>{_NUMBER})'),
+    'max_memory_rank': re.compile(rf'^ max memory usage/rank\s+(?P<value>{_NUMBER})'),
+    'mpi_messages': re.compile(rf'^ # MPI messages exchanged\s+(?P<value>{_NUMBER})'),
+    'mpi_volume': re.compile(rf'^\s+total size\s+(?P<value>{_NUMBER})'),
+}
+# units of the DBCSR counters
+DBCSR_UNITS = {
+    'flops_total': 'flop',
+    'flops_max_rank': 'flop',
+    'marketing_flops': 'flop',
+    'max_memory_rank': 'B',
+    'mpi_messages': 'messages',
+    'mpi_volume': 'B',
+}
+
+
+def parse_output(lines) -> dict:
+    """
+    Parse the timing report and the DBCSR statistics of CP2K in a single pass over the lines of its output.
+    Returns a dict with:
+    - timing: mapping routine -> {'calls': int, 'asd': float, 'self_avg': float, 'self_max': float,
+      'total_avg': float, 'total_max': float}, with the self and total time in seconds (average and maximum over
+      the ranks)
+    - dbcsr: mapping counter -> value for the counters in DBCSR_UNITS that were found
+
+    Arguments:
+    - lines: iterable of lines, e.g. an open file
+    """
+    timing = {}
+    dbcsr = {}
+    section = None
+    for line in lines:
+        if 'T I M I N G' in line:
+            section = 'timing'
+            timing = {}
+        elif 'DBCSR STATISTICS' in line:
+            section = 'dbcsr'
+            dbcsr = {}
+        elif 'MESSAGE PASSING PERFORMANCE' in line:
+            section = None
+        elif section == 'timing':
+            match = _TIMING_ROW_REGEX.match(line)
+            if match:
+                row = match.groupdict()
+                name = row.pop('name')
+                timing[name] = {key: int(value) if key == 'calls' else float(value) for key, value in row.items()}
+            elif line.startswith(' ---') and timing:
+                section = None
+        elif section == 'dbcsr':
+            for counter, regex in _DBCSR_REGEXES.items():
+                match = regex.match(line)
+                if match:
+                    dbcsr.setdefault(counter, float(match.group('value')))
+                    break
+    return {'timing': timing, 'dbcsr': dbcsr}
+
+
+def parse_output_file(filename: str) -> dict:
+    """Parse the CP2K output file filename, which may be compressed, see parse_output()"""
+    with output_cache.open_output(filename) as file:
+        return parse_output(file)
+
+
+def top_routines(timing: dict, num: int, key: str = 'self_max') -> list:
+    """Return the names of the num routines with the largest time of the given key, e.g. self_max"""
+    return sorted(timing, key=lambda name: timing[name][key], reverse=True)[:num]
@@ -0,0 +1,114 @@
+"""
+Parser for the log file of GROMACS mdrun (md.log), which extracts:
+
+- the energies, which are printed in blocks of lines with names and lines with values, in columns of 15 characters:
+
+   Energies (kJ/mol)
+          Angle    Proper Dih.  Improper Dih.          LJ-14     Coulomb-14
+    9.74139e+03    4.34956e+03    2.13599e+02   -1.46979e+02    5.43434e+04
+   Total Energy  Conserved En.    Temperature Pressure (bar)   Constr. rmsd
+   -2.04107e+05   -2.04107e+05    3.00012e+02   -1.07890e+02    0.00000e+00
+
+- the cycle and time accounting table at the end of the run:
+
+     R E A L   C Y C L E   A N D   T I M E   A C C O U N T I N G
+
+ Activity:              Num   Num      Call    Wall time         Giga-Cycles
+                        Ranks Threads  Count      (s)         total sum    %
+--------------------------------------------------------------------------------
+ Neighbor search           1    8        101       0.174          3.347   3.2
+ Force                     1    8      10001       3.022         58.025  56.0
+ Rest                                              0.210          4.034   3.9
+--------------------------------------------------------------------------------
+ Total                                             5.396        103.608 100.0
+"""
+import re
+
+from eessi.testsuite import output_cache
+
+_COLUMN_WIDTH = 15
+_CYCLE_ACCOUNTING_HEADER = 'R E A L   C Y C L E   A N D   T I M E   A C C O U N T I N G'
+_CYCLE_ROW_REGEX = re.compile(
+    r'^ (?P<name>\S.*?)\s+(?:(?P<ranks>\d+)\s+(?P<threads>\d+)\s+(?P<count>\d+)\s+)?'
+    r'(?P<wall>[.0-9]+)\s+(?P<gcycles>[.0-9]+)\s+(?P<percent>[.0-9]+)\s*$'
+)
+
+
+def _split_columns(line: str) -> list:
+    line = line.rstrip('\n')
+    return [line[i:i + _COLUMN_WIDTH].strip() for i in range(0, len(line), _COLUMN_WIDTH)]
+
+
+def _parse_energy_values(line: str):
+    try:
+        return [float(x) for x in _split_columns(line)]
+    except ValueError:
+        return None
+
+
+def parse_log(lines) -> dict:
+    """
+    Parse the md.log of GROMACS in a single pass. Returns a dict with:
+    - energies: mapping energy term -> value of the last block of energies (which are the averages if the run
+      completed), e.g. {'Potential': -2.3e+05, 'Total Energy': -2.04107e+05, ...}
+    - cycle_accounting: mapping activity -> {'ranks': int or None, 'threads': int or None, 'count': int or None,
+      'wall': float, 'gcycles': float, 'percent': float} of the (first) cycle and time accounting table,
+      e.g. for 'Neighbor search', 'Force', 'PME mesh', 'Comm. coord.', 'Wait + Comm. F' and 'Update'
+
+    Arguments:
+    - lines: iterable of lines, e.g. an open file
+    """
+    energies = {}
+    cycle_accounting = {}
+    in_energies = False
+    in_cycles = False
+    names = None
+    for line in lines:
+        if in_energies:
+            if not line.strip():
+                in_energies = False
+            elif names is None:
+                names = _split_columns(line)
+            else:
+                values = _parse_energy_values(line)
+                if values is None or len(values) != len(names):
+                    in_energies = False
+                else:
+                    energies.update(zip(names, values))
+                names = None
+        elif in_cycles:
+            if line.startswith(' Total'):
+                in_cycles = False
+                continue
+            match = _CYCLE_ROW_REGEX.match(line)
+            if match and match.group('name') not in cycle_accounting:
+                ranks, threads, count = (match.group(x) for x in ('ranks', 'threads', 'count'))
+                cycle_accounting[match.group('name')] = {
+                    'ranks': int(ranks) if ranks is not None else None,
+                    'threads': int(threads) if threads is not None else None,
+                    'count': int(count) if count is not None else None,
+                    'wall': float(match.group('wall')),
+                    'gcycles': float(match.group('gcycles')),
+                    'percent': float(match.group('percent')),
+                }
+        elif line.strip() == 'Energies (kJ/mol)':
+            # only keep the last block of energies
+            in_energies = True
+            names = None
+            energies = {}
+        elif _CYCLE_ACCOUNTING_HEADER in line and not cycle_accounting:
+            in_cycles = True
+    return {'energies': energies, 'cycle_accounting': cycle_accounting}
+
+
+def parse_log_file(filename: str) -> dict:
+    """
+    Parse the GROMACS log file filename, which may be compressed, see parse_log().
+    The result is cached until the file changes or the output cache is released, see output_cache.parse().
+    """
+    return output_cache.parse(filename, parse_log)
+
+
+def perf_variable_name(activity: str) -> str:
+    """Convert the name of an activity in the cycle accounting table to a name for perf variables"""
+    return re.sub(r'[^a-z0-9]+', '_', activity.lower()).strip('_')
@@ -0,0 +1,77 @@
+"""
+Parser for the MPI task timing breakdown that LAMMPS prints at the end of each run, e.g.:
+
+MPI task timing breakdown:
+Section |  min time  |  avg time  |  max time  |%varavg| %total
+---------------------------------------------------------------
+Pair    | 1.6923     | 1.7012     | 1.7203     |   0.6 | 83.39
+Neigh   | 0.23264    | 0.23301    | 0.23350    |   0.1 | 11.46
+Comm    | 0.025245   | 0.030117   | 0.041852   |   2.1 |  1.24
+Output  | 0.0001     | 0.00011    | 0.00012    |   0.0 |  0.00
+Modify  | 0.068036   | 0.068502   | 0.069127   |   0.1 |  3.37
+Other   |            | 0.01051    |            |       |  0.51
+
+With OpenMP, LAMMPS also prints a thread timing breakdown with the same columns; it is not parsed.
+"""
+import re
+
+from eessi.testsuite import output_cache
+
+_TITLE = 'MPI task timing breakdown:'
+_HEADER_REGEX = re.compile(r'^Section\s+\|\s+min time\s+\|\s+avg time\s+\|\s+max time\s+\|')
+
+
+def _to_float(value: str):
+    value = value.strip()
+    return float(value) if value else None
+
+
+def parse_timing_breakdown(lines) -> dict:
+    """
+    Parse the MPI task timing breakdown of LAMMPS in a single pass over the lines of its output.
+    Returns a mapping section -> {'min': float, 'avg': float, 'max': float, 'varavg': float, 'total': float},
+    with times in seconds and 'varavg' and 'total' in %. Columns that are empty (e.g. for section Other) are None.
+    The table ends at the first blank line after it. If the output contains multiple runs, the timing breakdown of
+    the last run is returned.
+
+    Arguments:
+    - lines: iterable of lines, e.g. an open file
+    """
+    breakdown = {}
+    after_title = in_table = False
+    for line in lines:
+        if line.startswith(_TITLE):
+            after_title = True
+            in_table = False
+        elif after_title:
+            after_title = False
+            if _HEADER_REGEX.match(line):
+                in_table = True
+                breakdown = {}
+        elif in_table:
+            if line.startswith('---'):
+                continue
+            columns = line.split('|')
+            if not line.strip() or len(columns) != 6:
+                in_table = False
+                continue
+            try:
+                values = [_to_float(x) for x in columns[1:]]
+            except ValueError:
+                in_table = False
+                continue
+            breakdown[columns[0].strip()] = dict(zip(['min', 'avg', 'max', 'varavg', 'total'], values))
+    return breakdown
+
+
+def parse_timing_breakdown_file(filename: str) -> dict:
+    """Parse the timing breakdown in the LAMMPS output file filename, which may be compressed"""
+    with output_cache.open_output(filename) as file:
+        return parse_timing_breakdown(file)
+
+
+def get_imbalance(timing: dict):
+    """Return the load imbalance (max time over average time) of a section of the timing breakdown, or None"""
+    if timing.get('max') is None or not timing.get('avg'):
+        return None
+    return timing['max'] / timing['avg']
@@ -0,0 +1,77 @@
+"""
+Parser for the timing report that MetalWalls writes at the end of its output file (run.out), e.g.:
+
+Ions->Atoms Coulomb potential
+-----------------------------
+  long range                       9.55040E-03  9.64590E-01      0.71
+  k==0                             2.48271E-02  2.50754E+00      1.84
+  short range                      8.72464E-02  8.81189E+00      6.46
+
+Atoms->Atoms Coulomb potential
+------------------------------
+  ...
+
+The columns are the average time per step, the cumulative time and the percentage of the total time.
+"""
+import re
+
+from eessi.testsuite import output_cache
+
+_RULE_REGEX = re.compile(r'^-{3,}\s*$')
+_NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+_ENTRY_REGEX = re.compile(
+    rf'^ +(?P<name>\S.*?)\s+(?P<avg>{_NUMBER})\s+(?P<cumul>{_NUMBER})(?:\s+(?P<percentage>{_NUMBER}))?\s*$'
+)
+
+
+def parse_timing_report(lines) -> dict:
+    """
+    Parse the timing report of MetalWalls in a single pass over the lines of the output file.
+    Returns a mapping section -> entry -> {'avg': float, 'cumul': float, 'percentage': float or None}.
+    If an entry occurs more than once in a section, the first occurrence is kept.
+
+    Arguments:
+    - lines: iterable of lines, e.g. an open file
+    """
+    report = {}
+    section = None
+    previous = ''
+    for line in lines:
+        if _RULE_REGEX.match(line):
+            # a section starts with its title, underlined with dashes
+            title = previous.strip()
+            section = report.setdefault(title, {}) if title else None
+        elif not line.strip():
+            section = None
+        elif section is not None:
+            match = _ENTRY_REGEX.match(line)
+            if match and match.group('name') not in section:
+                percentage = match.group('percentage')
+                section[match.group('name')] = {
+                    'avg': float(match.group('avg')),
+                    'cumul': float(match.group('cumul')),
+                    'percentage': float(percentage) if percentage is not None else None,
+                }
+        previous = line
+    return report
+
+
+def parse_timing_report_file(filename: str) -> dict:
+    """
+    Parse the timing report in the MetalWalls output file filename, which may be compressed,
+    see parse_timing_report()
+    """
+    with output_cache.open_output(filename) as file:
+        return parse_timing_report(file)
+
+
+def get_timing(report: dict, parent: str, name: str, kind: str):
+    """
+    Return the time of kind 'avg', 'cumul' or 'percentage' of entry name in the first section of the parsed report
+    whose title contains parent, or None if there is no such entry.
+    """
+    for title, section in report.items():
+        if parent in title:
+            entry = section.get(name)
+            return entry[kind.lower()] if entry else None
+    return None
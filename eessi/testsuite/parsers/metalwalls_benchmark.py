@@ -0,0 +1,85 @@
+"""
+Benchmark the post-processing of the output of MetalWalls on a large, synthetic run.out:
+- per-field: the approach of MetalWallsCheck.extract_time, which scans run.out once per field and kind
+- single-pass: parse the whole timing report once with eessi.testsuite.parsers.metalwalls, then look up all fields
+
+Usage:
+    python -m eessi.testsuite.parsers.metalwalls_benchmark [--steps STEPS]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from eessi.testsuite.hpctestlib.sciapps.metalwalls.benchmarks import MetalWallsCheck, extract_fields
+from eessi.testsuite.parsers import metalwalls
+
+
+def write_run_out(path: str, steps: int):
+    """Write a synthetic MetalWalls output file with a step report per step and a timing report at the end"""
+    with open(path, 'w') as file:
+        for step in range(steps):
+            file.write(f'|step| {step:>10d}\n')
+            file.write('|step| kinetic energy:          1.40000E+01\n')
+            file.write('|step| temperature:             3.01740E+02\n')
+        file.write('\n')
+        sections = {}
+        for parent, name, _ in extract_fields:
+            sections.setdefault(parent, [])
+            if name not in sections[parent]:
+                sections[parent].append(name)
+        for parent, names in sections.items():
+            file.write(f'{parent}\n{"-" * len(parent)}\n')
+            for i, name in enumerate(names):
+                file.write(f'  {name:<32} {1e-3 * (i + 1):.5E}  {0.1 * (i + 1):.5E}      {i + 1:.2f}\n')
+            file.write('\n')
+        file.write('Total elapsed time:   1.23456E+02\n')
+
+
+def per_field(rundir: str) -> dict:
+    """Extract all fields with MetalWallsCheck.extract_time, which reads run.out from the current directory"""
+    cwd = os.getcwd()
+    os.chdir(rundir)
+    try:
+        return {
+            (parent, name, kind): MetalWallsCheck.extract_time(None, name, parent, kind)
+            for parent, name, _ in extract_fields for kind in ['avg', 'cumul']
+        }
+    finally:
+        os.chdir(cwd)
+
+
+def single_pass(rundir: str) -> dict:
+    """Parse the timing report once and look up all fields"""
+    report = metalwalls.parse_timing_report_file(os.path.join(rundir, 'run.out'))
+    return {
+        (parent, name, kind): metalwalls.get_timing(report, parent, name, kind)
+        for parent, name, _ in extract_fields for kind in ['avg', 'cumul']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the post-processing of a large MetalWalls run.out.")
+    parser.add_argument("--steps", type=int, default=200000, help="Number of steps in the synthetic run.out")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as rundir:
+        write_run_out(os.path.join(rundir, 'run.out'), args.steps)
+        size = os.path.getsize(os.path.join(rundir, 'run.out')) / 1024 ** 2
+        print(f'run.out: {args.steps} steps, {size:.1f} MiB, {2 * len(extract_fields)} fields')
+
+        timings = {}
+        results = {}
+        for name, func in [('per-field', per_field), ('single-pass', single_pass)]:
+            start = time.perf_counter()
+            results[name] = func(rundir)
+            timings[name] = time.perf_counter() - start
+            print(f'{name:>12}: {timings[name]:.3f} s')
+
+        if results['per-field'] != results['single-pass']:
+            print('WARNING: results differ between per-field and single-pass extraction')
+        print(f'     speedup: {timings["per-field"] / timings["single-pass"]:.1f}x')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Streaming parser for the log of an OpenFOAM (icoFoam) run, e.g.:
+
+Time = 0.00025
+
+Courant Number mean: 0.0 max: 0.0
+DICPCG:  Solving for Ux, Initial residual = 1, Final residual = 8.9e-06, No Iterations 12
+DICPCG:  Solving for Uy, Initial residual = 1, Final residual = 8.8e-06, No Iterations 12
+DICPCG:  Solving for Uz, Initial residual = 1, Final residual = 8.6e-06, No Iterations 12
+DICPCG:  Solving for p, Initial residual = 1, Final residual = 0.049, No Iterations 35
+time step continuity errors : sum local = 1.2e-08, global = 3.4e-19, cumulative = 3.4e-19
+DICPCG:  Solving for p, Initial residual = 0.21, Final residual = 9.8e-07, No Iterations 152
+time step continuity errors : sum local = 2.9e-10, global = 1.1e-19, cumulative = 4.5e-19
+ExecutionTime = 0.95 s  ClockTime = 1 s
+"""
+import re
+
+from eessi.testsuite import output_cache, stats
+
+_TIME_REGEX = re.compile(r'^Time = (?P<time>\S+)')
+_SOLVE_REGEX = re.compile(
+    r'Solving for (?P<field>\w+), Initial residual = (?P<residual>\S+), .*No Iterations (?P<iterations>\d+)'
+)
+_EXECUTION_TIME_REGEX = re.compile(r'^ExecutionTime = (?P<execution_time>\S+) s\s+ClockTime = (?P<clock_time>\S+) s')
+_WALL_CLOCK_REGEX = re.compile(r'^Wall clock time.+ = (?P<wall_clock>\S+)')
+
+
+def iter_timesteps(lines):
+    """
+    Parse the log of an OpenFOAM run line by line, yielding one record (dict) per completed timestep with:
+    - time: simulation time
+    - u_iterations: total number of linear solver iterations for the velocity components
+    - p_iterations: total number of linear solver iterations for the pressure (all correctors)
+    - p_initial_residual: initial residual of the first pressure solve
+    - execution_time: cumulative CPU time (s) at the end of the timestep
+    - clock_time: cumulative wall-clock time (s) at the end of the timestep
+    - wall_clock: wall clock time reported by custom solvers (None if not reported)
+    A timestep is complete when its ExecutionTime line is found.
+
+    Arguments:
+    - lines: iterable of lines, e.g. an open file
+    """
+    record = None
+    for line in lines:
+        # only use the (more expensive) regexes on lines that can match
+        if line.startswith('Time = '):
+            match = _TIME_REGEX.match(line)
+            record = {
+                'time': float(match.group('time')),
+                'u_iterations': 0,
+                'p_iterations': 0,
+                'p_initial_residual': None,
+                'execution_time': None,
+                'clock_time': None,
+                'wall_clock': None,
+            }
+        elif record is None:
+            continue
+        elif 'Solving for' in line:
+            match = _SOLVE_REGEX.search(line)
+            if not match:
+                continue
+            field = match.group('field')
+            if field in ('Ux', 'Uy', 'Uz'):
+                record['u_iterations'] += int(match.group('iterations'))
+            elif field == 'p':
+                record['p_iterations'] += int(match.group('iterations'))
+                if record['p_initial_residual'] is None:
+                    record['p_initial_residual'] = float(match.group('residual'))
+        elif line.startswith('Wall clock time'):
+            match = _WALL_CLOCK_REGEX.match(line)
+            if match:
+                record['wall_clock'] = float(match.group('wall_clock'))
+        elif line.startswith('ExecutionTime'):
+            match = _EXECUTION_TIME_REGEX.match(line)
+            if match:
+                record['execution_time'] = float(match.group('execution_time'))
+                record['clock_time'] = float(match.group('clock_time'))
+                yield record
+                record = None
+
+
+def _parse_timesteps(lines) -> list:
+    return list(iter_timesteps(lines))
+
+
+def parse_log_file(filename: str) -> list:
+    """
+    Return the list of timestep records of the OpenFOAM log file filename, see iter_timesteps().
+    The log file may be compressed, see output_cache.open_output(). The result is cached until the file changes or
+    the output cache is released, see output_cache.parse().
+    """
+    return output_cache.parse(filename, _parse_timesteps)
+
+
+def clock_points(records: list) -> list:
+    """
+    Return the cumulative (wall-clock time, timesteps) points of the timesteps, see stats.intervals().
+    ClockTime is logged in whole seconds, so only the first timestep and the timesteps at which ClockTime advanced
+    are included, such that the time per timestep is averaged over the timesteps in between instead of being 0 or 1 s.
+    ExecutionTime is not used, since it is the CPU time of the master process.
+    """
+    points = []
+    for i, record in enumerate(records):
+        if not points or record['clock_time'] != points[-1][0]:
+            points.append((record['clock_time'], i + 1))
+    return points
+
+
+def step_times(records: list) -> list:
+    """
+    Return the wall-clock time per timestep (s) of each timestep, averaged over the timesteps between the points of
+    clock_points(). The first timestep is excluded, since its ClockTime includes the startup of the solver.
+    """
+    intervals = stats.intervals(clock_points(records))[1:]
+    return [duration / steps for duration, steps in intervals for _ in range(steps)]
+
+
+def timestep_statistics(records: list) -> dict:
+    """
+    Return statistics over the timesteps:
+    - median_s_per_step: median time per timestep, excluding the first timestep
+    - p95_s_per_step: 95th percentile of the time per timestep, excluding the first timestep
+    - p_iterations_per_step: mean number of pressure iterations per timestep
+    - u_iterations_per_step: mean number of velocity iterations per timestep
+    Statistics that cannot be computed (e.g. there are too few timesteps) are left out.
+    """
+    result = {}
+    times = step_times(records)
+    if times:
+        result['median_s_per_step'] = stats.median(times)
+        result['p95_s_per_step'] = stats.percentile(times, 95)
+    if records:
+        result['p_iterations_per_step'] = sum(x['p_iterations'] for x in records) / len(records)
+        result['u_iterations_per_step'] = sum(x['u_iterations'] for x in records) / len(records)
+    return result
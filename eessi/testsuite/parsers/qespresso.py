@@ -0,0 +1,83 @@
+"""
+Parser for the timing report that pw.x (QuantumESPRESSO) writes at the end of its output, e.g.:
+
+     init_run     :      0.33s CPU      0.36s WALL (       1 calls)
+     electrons    :      3.53s CPU      3.78s WALL (       1 calls)
+
+     Called by electrons:
+     c_bands      :      2.64s CPU      2.81s WALL (      11 calls)
+
+     Called by c_bands:
+     cegterg      :      2.55s CPU      2.72s WALL (     120 calls)
+
+     Called by *egterg:
+     cdiaghg      :      0.41s CPU      0.43s WALL (     648 calls)
+
+     General routines
+     fft          :      0.45s CPU      0.48s WALL (     123 calls)
+
+     PWSCF        :   1m 3.93s CPU   1m 4.21s WALL
+
+Times are formatted as e.g. '0.33s', '1m 3.93s', '2h 5m' or '4d 6h19m'.
+"""
+import re
+
+from eessi.testsuite import output_cache
+
+_TIMING_REGEX = re.compile(
+    r'^\s+(?P<name>\S+)\s*:\s*(?P<cpu>\S.*?)\s+CPU\s+(?P<wall>\S.*?)\s+WALL(?:\s+\(\s*(?P<calls>\d+)\s+calls\))?\s*$'
+)
+_DURATION_REGEX = re.compile(
+    r'^(?:(?P<days>[.0-9]+)d)?\s*(?:(?P<hours>[.0-9]+)h)?\s*(?:(?P<minutes>[.0-9]+)m)?\s*(?:(?P<seconds>[.0-9]+)s)?$'
+)
+_SECONDS = {'days': 86400, 'hours': 3600, 'minutes': 60, 'seconds': 1}
+
+
+def parse_duration(duration: str) -> float:
+    """Convert a pw.x time such as '4d 6h19m' or '1m 3.93s' to seconds"""
+    match = _DURATION_REGEX.match(duration.strip())
+    if not match or not any(match.groupdict().values()):
+        raise ValueError(f'invalid pw.x time: {duration!r}')
+    return sum(float(value) * _SECONDS[unit] for unit, value in match.groupdict().items() if value)
+
+
+def parse_timing_report(lines) -> dict:
+    """
+    Parse the timing report of pw.x in a single pass over the lines of its output.
+    Returns a mapping routine -> {'cpu': float, 'wall': float, 'calls': int or None}, with the times in seconds.
+    Routine names are as reported, e.g. 'h_psi:calbec', see perf_variable_name(). If a routine is reported more than
+    once, the first occurrence is kept.
+
+    Arguments:
+    - lines: iterable of lines, e.g. an open file
+    """
+    report = {}
+    for line in lines:
+        # only timing lines are of interest
+        if ' WALL' in line:
+            match = _TIMING_REGEX.match(line)
+            if not match or match.group('name') in report:
+                continue
+            try:
+                cpu = parse_duration(match.group('cpu'))
+                wall = parse_duration(match.group('wall'))
+            except ValueError:
+                continue
+            calls = match.group('calls')
+            report[match.group('name')] = {
+                'cpu': cpu,
+                'wall': wall,
+                'calls': int(calls) if calls is not None else None,
+            }
+    return report
+
+
+def parse_timing_report_file(filename: str) -> dict:
+    """Parse the timing report in the pw.x output file filename, which may be compressed, see parse_timing_report()"""
+    with output_cache.open_output(filename) as file:
+        return parse_timing_report(file)
+
+
+def perf_variable_name(routine: str) -> str:
+    """Convert the name of a routine in the timing report to a name for perf variables, e.g. h_psi_calbec"""
+    return re.sub(r'[^\w.]+', '_', routine).strip('_')
@@ -0,0 +1,28 @@
+#!/bin/bash
+# run a command under 'perf stat', writing the counters of each rank to <outdir>/perf_stat.<rank>.csv
+# usage: perf_stat_wrapper.sh <outdir> <comma-separated events> <command> [args...]
+# if perf is not available or not permitted to count the events, the command is run without perf stat
+
+outdir=$1
+events=$2
+shift 2
+
+rank=${SLURM_PROCID:-${OMPI_COMM_WORLD_RANK:-${PMIX_RANK:-${PMI_RANK:-0}}}}
+
+if ! command -v perf >/dev/null; then
+    [[ $rank == 0 ]] && echo "PERF STAT WARNING: perf not available, not collecting hardware counters" >&2
+    exec "$@"
+fi
+
+if ! perf stat -x , -e "$events" -o /dev/null true >/dev/null 2>&1; then
+    [[ $rank == 0 ]] && echo "PERF STAT WARNING: perf stat failed for events $events, not collecting hardware counters" >&2
+    exec "$@"
+fi
+
+outfile="$outdir/perf_stat.$rank.csv"
+start=$(date +%s.%N)
+perf stat -x , -e "$events" -o "$outfile" -- "$@"
+exitcode=$?
+end=$(date +%s.%N)
+echo "# wall_seconds,$(awk "BEGIN {print $end - $start}")" >> "$outfile"
+exit $exitcode
@@ -0,0 +1,158 @@
+"""
+Statistics helpers for performance data, using only the Python standard library
+"""
+import math
+import random
+import statistics
+
+
+def percentile(values, q: float) -> float:
+    """
+    Return the q-th percentile (0 <= q <= 100) of values, using linear interpolation between the closest ranks
+    (the same method as numpy.percentile with its default settings)
+
+    Arguments:
+    - values: non-empty sequence of numbers
+    - q: percentile to compute
+    """
+    if not values:
+        raise ValueError('percentile requires at least one value')
+    if not 0 <= q <= 100:
+        raise ValueError(f'percentile must be between 0 and 100, got {q}')
+    data = sorted(values)
+    pos = (len(data) - 1) * q / 100
+    lower = math.floor(pos)
+    upper = math.ceil(pos)
+    return data[lower] + (data[upper] - data[lower]) * (pos - lower)
+
+
+def median(values) -> float:
+    """Return the median of a non-empty sequence of numbers"""
+    return statistics.median(values)
+
+
+def mad(values) -> float:
+    """
+    Return the median absolute deviation of a non-empty sequence of numbers, scaled by 1.4826, which makes it a
+    consistent estimator of the standard deviation for normally distributed data that is robust to outliers
+    """
+    center = median(values)
+    return 1.4826 * median([abs(x - center) for x in values])
+
+
+def median_ci(values, confidence: float = 0.95) -> tuple:
+    """
+    Return a distribution-free confidence interval (low, high) for the median of a sequence of numbers, bounded by
+    the order statistics for which the binomial distribution guarantees at least the given confidence level. Raises
+    a ValueError if there are too few values for that confidence level, e.g. fewer than 6 values at 95%.
+    """
+    n = len(values)
+    alpha = (1 - confidence) / 2
+    # find the largest rank k such that P(X < k) <= alpha for X ~ Binomial(n, 1/2)
+    k = 0
+    cumulative = 0
+    total = 2 ** n
+    while k < n:
+        cumulative += math.factorial(n) // (math.factorial(k) * math.factorial(n - k))
+        if cumulative / total > alpha:
+            break
+        k += 1
+    if k == 0:
+        raise ValueError(f'{n} values are too few for a {confidence:.0%} confidence interval of the median')
+    data = sorted(values)
+    return data[k - 1], data[n - k]
+
+
+def median_ci_min_count(confidence: float = 0.95) -> int:
+    """Return the minimum number of values for which median_ci() returns an interval, e.g. 6 at 95%"""
+    alpha = (1 - confidence) / 2
+    n = 1
+    # the interval exists if P(X < 1) <= alpha for X ~ Binomial(n, 1/2), see median_ci()
+    while 1 / 2 ** n > alpha:
+        n += 1
+    return n
+
+
+def intervals(points) -> list:
+    """
+    Convert a series of cumulative (time, steps) points, e.g. the elapsed time and the number of completed timesteps
+    as logged by an application, into (duration, steps) intervals. The first interval starts at (0, 0).
+    Intervals without any steps (e.g. a point logged before the first step) are left out.
+    """
+    result = []
+    previous = (0, 0)
+    for point in points:
+        duration, steps = point[0] - previous[0], point[1] - previous[1]
+        if steps > 0:
+            result.append((duration, steps))
+        previous = point
+    return result
+
+
+def steady_state(series, warmup: int = 1) -> dict:
+    """
+    Split a series of (duration, steps) intervals into warm-up and steady state, and return:
+    - mean: steady-state throughput (steps/s), i.e. total number of steps over total time of the steady state
+    - median: median steady-state throughput (steps/s), based on the median time per step of the intervals
+    - startup: time (s) spent in the warm-up intervals in excess of what the same number of steps takes in steady state
+
+    Arguments:
+    - series: sequence of (duration, steps) intervals, see also intervals()
+    - warmup: number of intervals at the start of the series that are excluded from the steady state
+    """
+    if warmup < 0:
+        raise ValueError(f'the number of warm-up intervals cannot be negative, got {warmup}')
+    if len(series) <= warmup:
+        raise ValueError(f'need more than {warmup} intervals to determine the steady state, got {len(series)}')
+    steady = series[warmup:]
+    steady_time = sum(duration for duration, _ in steady)
+    steady_steps = sum(steps for _, steps in steady)
+    time_per_step = steady_time / steady_steps
+    warmup_time = sum(duration for duration, _ in series[:warmup])
+    warmup_steps = sum(steps for _, steps in series[:warmup])
+    median_time_per_step = median([duration / steps for duration, steps in steady])
+    return {
+        'mean': steady_steps / steady_time if steady_time > 0 else math.inf,
+        'median': 1 / median_time_per_step if median_time_per_step > 0 else math.inf,
+        'startup': max(warmup_time - warmup_steps * time_per_step, 0.0),
+    }
+
+
+def summary(values) -> dict:
+    """
+    Return the median, mean, (sample) standard deviation, 5th and 95th percentile of a non-empty sequence of numbers.
+    The standard deviation of a single value is 0.
+    """
+    return {
+        'median': median(values),
+        'mean': statistics.mean(values),
+        'stddev': statistics.stdev(values) if len(values) > 1 else 0.0,
+        'p5': percentile(values, 5),
+        'p95': percentile(values, 95),
+    }
+
+
+def bootstrap_ratio(baseline, candidate, statistic=median, confidence: float = 0.95, resamples: int = 2000,
+                    seed: int = 12345) -> tuple:
+    """
+    Return a percentile bootstrap confidence interval (low, high) for statistic(candidate) / statistic(baseline),
+    resampling both sequences independently. The random generator is seeded, so the result is reproducible.
+
+    Arguments:
+    - baseline, candidate: non-empty sequences of numbers, e.g. the samples of two runs
+    - statistic: function that reduces a sequence of numbers to a single number
+    - confidence: confidence level of the interval
+    - resamples: number of bootstrap resamples
+    """
+    if not baseline or not candidate:
+        raise ValueError('bootstrap_ratio requires at least one value in each sequence')
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        denominator = statistic(rng.choices(baseline, k=len(baseline)))
+        if denominator:
+            ratios.append(statistic(rng.choices(candidate, k=len(candidate))) / denominator)
+    if not ratios:
+        raise ValueError('the statistic of the baseline is always 0')
+    alpha = (1 - confidence) / 2 * 100
+    return percentile(ratios, alpha), percentile(ratios, 100 - alpha)
@@ -27,13 +27,17 @@ Hooks acting on concrete test cases (after filtering) are called after the 'setu
 
 See also https://reframe-hpc.readthedocs.io/en/stable/pipeline.html
 """
+import os
+
 import reframe as rfm
-from reframe.core.builtins import run_after
+from reframe.core.builtins import run_after, run_before
 from reframe.core.parameters import TestParam as parameter
+import reframe.utility.sanity as sn
 
 from eessi.testsuite.eessi_mixin import EESSI_Mixin
 from eessi.testsuite.constants import COMPUTE_UNITS, DEVICE_TYPES
-from eessi.testsuite.hpctestlib.sciapps.metalwalls.benchmarks import MetalWallsCheck
+from eessi.testsuite.hpctestlib.sciapps.metalwalls.benchmarks import MetalWallsCheck, extract_fields
+from eessi.testsuite.parsers import metalwalls
 from eessi.testsuite.utils import find_modules
 
 
@@ -93,3 +97,22 @@ class EESSI_MetalWalls_MW(MetalWallsCheck, EESSI_Mixin):
             self.num_tasks > max_task_cnt,
             f'Number of tasks {self.num_tasks} exceeds maximum task count {max_task_cnt} for {bench_name}'
         )
+
+    @run_before('performance')
+    def set_perf_variables(self):
+        """
+        Build a dictionary of performance variables.
+        Overrides MetalWallsCheck.set_perf_variables, which scans run.out once for every field in extract_fields:
+        here, the timing report is parsed once and all fields are looked up in the parsed report.
+        """
+        self.perf_variables['total_elapsed_time'] = self.total_elapsed_time()
+
+        if self.debug_metrics:
+            report = metalwalls.parse_timing_report_file(os.path.join(self.stagedir, 'run.out'))
+            for parent, name, short in extract_fields:
+                name2 = name.replace(' ', '_')
+                for kind in ['avg', 'cumul']:
+                    value = metalwalls.get_timing(report, parent, name, kind)
+                    if value is not None:
+                        self.perf_variables[f'{short}__{name2}__{kind}'] = sn.make_performance_function(
+                            sn.defer(value), 's')
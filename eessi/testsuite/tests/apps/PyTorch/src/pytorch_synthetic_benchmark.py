@@ -233,6 +233,8 @@ for x in range(args.num_iters):
     log('Iter #%d: %.1f img/sec per %s' % (x, img_sec, device))
     img_secs.append(img_sec)
 
+log('EESSI_SAMPLES: img_sec img/sec %s' % ' '.join('%.1f' % x for x in img_secs))
+
 # Results
 img_sec_mean = np.mean(img_secs)
 img_sec_conf = 1.96 * np.std(img_secs)
@@ -29,11 +29,13 @@ See also https://reframe-hpc.readthedocs.io/en/stable/pipeline.html
 """
 
 import reframe as rfm
-from reframe.core.builtins import parameter, run_after
+from reframe.core.builtins import parameter, run_after, run_before
+import reframe.utility.sanity as sn
 
 from eessi.testsuite.constants import COMPUTE_UNITS, DEVICE_TYPES
 from eessi.testsuite.eessi_mixin import EESSI_Mixin
 from eessi.testsuite.hpctestlib.sciapps.qespresso.benchmarks import QEspressoPWCheck
+from eessi.testsuite.parsers import qespresso
 from eessi.testsuite.utils import find_modules
 
 
@@ -76,3 +78,20 @@ class EESSI_QuantumESPRESSO_PW(QEspressoPWCheck, EESSI_Mixin):
             DEVICE_TYPES.GPU: COMPUTE_UNITS.GPU,
         }
         self.compute_unit = device_to_compute_unit.get(self.device_type)
+
+    @run_before('performance')
+    def set_perf_variables(self):
+        """
+        Build a dictionary of performance variables with the CPU time, wall time and number of calls of every routine
+        in the timing report of pw.x, e.g. fft, cdiaghg (diagonalization) and cegterg (Davidson).
+        Overrides QEspressoPWCheck.set_perf_variables, which scans the output once for every timing and kind and only
+        reports a fixed set of routines: here, the timing report is parsed once.
+        """
+        report = qespresso.parse_timing_report_file(f'{self.stagedir}/{self.stdout}')
+        for routine, timing in report.items():
+            name = qespresso.perf_variable_name(routine)
+            for kind in ['cpu', 'wall']:
+                self.perf_variables[f'{name}_{kind}'] = sn.make_performance_function(sn.defer(timing[kind]), 's')
+            if timing['calls'] is not None:
+                self.perf_variables[f'{name}_calls'] = sn.make_performance_function(
+                    sn.defer(timing['calls']), 'calls')
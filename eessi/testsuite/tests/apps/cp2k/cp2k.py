@@ -1,9 +1,10 @@
 import reframe as rfm
-from reframe.core.builtins import parameter, run_after, performance_function, sanity_function
+from reframe.core.builtins import parameter, run_after, run_before, performance_function, sanity_function, variable
 import reframe.utility.sanity as sn
 
 from eessi.testsuite.constants import SCALES, COMPUTE_UNITS, DEVICE_TYPES
 from eessi.testsuite.eessi_mixin import EESSI_Mixin
+from eessi.testsuite.parsers import cp2k as cp2k_parser
 from eessi.testsuite.utils import find_modules
 
 
@@ -26,6 +27,13 @@ class EESSI_CP2K(rfm.RunOnlyRegressionTest, EESSI_Mixin):
     compute_unit = COMPUTE_UNITS.CPU
     readonly_files = ['QS']
 
+    # number of routines with the largest self time in the timing report to add as perf variables (0: none).
+    # These differ between runs, and every change of the perf variables makes ReFrame start a new perflog.
+    timing_top_n = variable(int, value=0)
+    # routines in the timing report that are always added as perf variables (if present): total force evaluation,
+    # FFT, diagonalization and DBCSR matrix multiplication
+    timing_routines = ['qs_forces', 'fft_wrap_pw1pw2', 'cp_fm_syevd', 'multiply_cannon']
+
     def required_mem_per_node(self):
         mems = {
             'QS/H2O-32': {'intercept': 0.5, 'slope': 0.15},
@@ -64,6 +72,28 @@ class EESSI_CP2K(rfm.RunOnlyRegressionTest, EESSI_Mixin):
     def time(self):
         return sn.extractsingle(r'^ CP2K(\s+[\d\.]+){4}\s+(?P<time>\S+)', self.stdout, 'time', float)
 
+    @run_before('performance')
+    def set_timing_perf_vars(self):
+        """
+        Add perf variables with the self and total time (maximum over the ranks) of the timing_routines and, if set
+        (e.g. with -S timing_top_n=10), of the timing_top_n routines with the largest self time, e.g.
+        fft_wrap_pw1pw2_self and cp_fm_syevd_total, and with the DBCSR statistics, e.g. dbcsr_flops_total and
+        dbcsr_mpi_volume.
+        This allows attributing a regression to the FFTs, the diagonalization or DBCSR.
+        """
+        output = cp2k_parser.parse_output_file(f'{self.stagedir}/{self.stdout}')
+        timing = output['timing']
+        routines = [x for x in self.timing_routines if x in timing]
+        if self.timing_top_n > 0:
+            routines += [x for x in cp2k_parser.top_routines(timing, self.timing_top_n) if x not in routines]
+        for routine in routines:
+            for kind in ('self', 'total'):
+                value = timing[routine][f'{kind}_max']
+                self.perf_variables[f'{routine}_{kind}'] = sn.make_performance_function(sn.defer(value), 's')
+        for counter, value in output['dbcsr'].items():
+            self.perf_variables[f'dbcsr_{counter}'] = sn.make_performance_function(
+                sn.defer(value), cp2k_parser.DBCSR_UNITS[counter])
+
     @run_after('setup')
     def skip_tests(self):
         """Skip tests that are not suited for the requested resources"""
@@ -17,6 +17,7 @@ import re
 from reframe.core.builtins import deferrable, parameter, performance_function, run_after, sanity_function
 from reframe.utility import reframe
 
+from eessi.testsuite import output_cache
 from eessi.testsuite.constants import DEVICE_TYPES, SCALES, COMPUTE_UNITS
 from eessi.testsuite.eessi_mixin import EESSI_Mixin
 from eessi.testsuite.utils import find_modules, log, split_module
@@ -63,6 +64,12 @@ class EESSI_ESPRESSO_base(rfm.RunOnlyRegressionTest):
     def perf(self):
         return sn.extractsingle(r'^Performance:\s+(?P<perf>\S+)', self.stdout, 'perf', float)
 
+    def steady_state_series(self):
+        """ Timings of the benchmark loops, which are all run after equilibration. """
+        series = output_cache.extractall(r'^Loop timing: (?P<time>\S+) s, (?P<steps>[0-9]+) steps',
+                                         f'{self.stagedir}/{self.stdout}', tag=['time', 'steps'], conv=[float, int])
+        return series.evaluate()
+
 
 @rfm.simple_test
 class EESSI_ESPRESSO_P3M_IONIC_CRYSTALS(EESSI_ESPRESSO_base, EESSI_Mixin):
@@ -71,6 +78,8 @@ class EESSI_ESPRESSO_P3M_IONIC_CRYSTALS(EESSI_ESPRESSO_base, EESSI_Mixin):
     executable = 'python3 madelung.py'
     sourcesdir = 'src/p3m'
     readonly_files = ['madelung.py']
+    # the benchmark loops run after equilibration, so all of them are steady state
+    steady_state_warmup = 0
 
     default_weak_scaling_system_size = 6
 
@@ -105,6 +114,8 @@ class EESSI_ESPRESSO_LJ_PARTICLES(EESSI_ESPRESSO_base, EESSI_Mixin):
     executable = 'python3 lj.py'
     sourcesdir = 'src/lj'
     readonly_files = ['lj.py']
+    # the benchmark loops run after equilibration, so all of them are steady state
+    steady_state_warmup = 0
 
     def required_mem_per_node(self):
         "LJ requires 200 MB per core"
@@ -128,6 +139,8 @@ class EESSI_ESPRESSO_LB(EESSI_ESPRESSO_base, EESSI_Mixin):
     executable = 'python3 lb.py'
     sourcesdir = 'src/lb'
     readonly_files = ['lb.py']
+    # the benchmark loops run after equilibration, so all of them are steady state
+    steady_state_warmup = 0
     bench_name = 'lb_without_particles'
 
     def required_mem_per_node(self):
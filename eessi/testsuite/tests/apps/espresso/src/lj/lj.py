@@ -143,6 +143,7 @@ for i in range(args.sample_size):
     tock = time.time()
     t = (tock - tick) / measurement_steps
     timings.append(t)
+    print(f"Loop timing: {tock - tick:.6e} s, {measurement_steps} steps")
     energy, pressure = get_normalized_values_per_atom(system)
     energies.append(energy)
     pressures.append(pressure)
@@ -152,6 +153,7 @@ sim_pressure = np.mean(pressures)
 ref_energy, ref_pressure = get_reference_values_per_atom(args.volume_fraction)
 
 print("Algorithm executed.")
+print("EESSI_SAMPLES: time_per_step s/step " + " ".join(f"{t:.6e}" for t in timings))
 np.testing.assert_allclose(sim_energy, ref_energy, atol=0., rtol=0.1)
 np.testing.assert_allclose(sim_pressure, ref_pressure, atol=0., rtol=0.1)
 
@@ -160,9 +160,11 @@ for _ in range(n_loops):
     system.integrator.run(n_steps)
     tock = time.time()
     timings.append((tock - tick) / n_steps)
+    print(f"Loop timing: {tock - tick:.6e} s, {n_steps} steps")
 
 print(f"{n_loops * n_steps} steps executed...")
 print("Algorithm executed.")
+print("EESSI_SAMPLES: time_per_step s/step " + " ".join(f"{t:.6e}" for t in timings))
 # write results to file
 header = '"mode","cores","mpi.x","mpi.y","mpi.z","omp.threads","gpus",\
 "particles","mean","std","box.x","box.y","box.z","precision","hardware"'
@@ -29,21 +29,60 @@ Hooks acting on concrete test cases (after filtering) are called after the 'setu
 See also https://reframe-hpc.readthedocs.io/en/stable/pipeline.html
 """
 
-import reframe as rfm
-from reframe.core.builtins import parameter, run_after  # added only to make the linter happy
+import os
 
+import reframe as rfm
+# added only to make the linter happy
+from reframe.core.builtins import deferrable, parameter, run_after, run_before, sanity_function
+from reframe.core.exceptions import SanityError
+import reframe.utility.sanity as sn
 
 from eessi.testsuite.constants import COMPUTE_UNITS, DEVICE_TYPES, SCALES
 from eessi.testsuite.eessi_mixin import EESSI_Mixin
 from eessi.testsuite.hpctestlib.sciapps.gromacs.benchmarks import gromacs_check
+from eessi.testsuite.parsers import gromacs
 from eessi.testsuite.utils import find_modules, log
 
 
 class EESSI_GROMACS_base(gromacs_check):
+    # energy term in md.log that is compared to the energy reference of the benchmark
+    energy_term = 'Total Energy'
+
     @run_after('init')
     def set_device_type(self):
         self.device_type = self.nb_impl
 
+    @deferrable
+    def extract_energy(self):
+        """
+        Extract energy_term from the last block of energies in md.log.
+        Replaces the energy_hecbiosim_* functions of gromacs_check, which are copies of each other.
+        """
+        energies = gromacs.parse_log_file(os.path.join(self.stagedir, 'md.log'))['energies']
+        if self.energy_term not in energies:
+            raise SanityError(f'energy term {self.energy_term!r} not found in md.log')
+        return energies[self.energy_term]
+
+    @sanity_function
+    def assert_energy_readout(self):
+        """Assert that the obtained energy meets the benchmark tolerances."""
+        return sn.all([
+            sn.assert_found('Finished mdrun', 'md.log'),
+            sn.assert_reference(self.extract_energy(), self.energy_ref, -self.energy_tol, self.energy_tol),
+        ])
+
+    @run_before('performance')
+    def set_cycle_accounting_perf_vars(self):
+        """
+        Add perf variables with the wall time and the percentage of the total time of each activity in the cycle and
+        time accounting table of md.log, e.g. time_force, time_pme_mesh and time_wait_comm_f
+        """
+        cycle_accounting = gromacs.parse_log_file(os.path.join(self.stagedir, 'md.log'))['cycle_accounting']
+        for activity, row in cycle_accounting.items():
+            name = gromacs.perf_variable_name(activity)
+            self.perf_variables[f'time_{name}'] = sn.make_performance_function(sn.defer(row['wall']), 's')
+            self.perf_variables[f'pct_{name}'] = sn.make_performance_function(sn.defer(row['percent']), '%')
+
 
 @rfm.simple_test
 class EESSI_GROMACS(EESSI_GROMACS_base, EESSI_Mixin):
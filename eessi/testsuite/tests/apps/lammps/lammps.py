@@ -4,12 +4,14 @@ The tests come from the lammps github repository (https://github.com/lammps/lamm
 """
 
 import reframe as rfm
-from reframe.core.builtins import deferrable, parameter, performance_function, run_after, sanity_function
+from reframe.core.builtins import deferrable, parameter, performance_function, run_after, run_before, sanity_function
 import reframe.utility.sanity as sn
 
+from eessi.testsuite import output_cache, stats
 from eessi.testsuite.utils import find_modules, log
 from eessi.testsuite.constants import COMPUTE_UNITS, DEVICE_TYPES, SCALES
 from eessi.testsuite.eessi_mixin import EESSI_Mixin
+from eessi.testsuite.parsers import lammps as lammps_parser
 
 from statistics import mean
 
@@ -66,7 +68,7 @@ class EESSI_LAMMPS_base(rfm.RunOnlyRegressionTest):
     @deferrable
     def assert_lammps_openmp_treads(self):
         '''Assert that OpenMP thread(s) per MPI task is set'''
-        n_threads = sn.extractsingle(
+        n_threads = output_cache.extractsingle(
             r'^  using (?P<threads>[0-9]+) OpenMP thread\(s\) per MPI task', self.stdout, 'threads', int)
         log(f'OpenMP thread(s) is {n_threads}')
 
@@ -75,7 +77,7 @@ class EESSI_LAMMPS_base(rfm.RunOnlyRegressionTest):
     @deferrable
     def assert_lammps_processor_grid(self):
         '''Assert that the processor grid is set correctly'''
-        grid = list(sn.extractall(
+        grid = list(output_cache.extractall(
             '^  (?P<x>[0-9]+) by (?P<y>[0-9]+) by (?P<z>[0-9]+) MPI processor grid', self.stdout, tag=['x', 'y', 'z']))
         n_cpus = int(grid[0][0]) * int(grid[0][1]) * int(grid[0][2])
 
@@ -85,7 +87,7 @@ class EESSI_LAMMPS_base(rfm.RunOnlyRegressionTest):
     def assert_run(self):
         '''Assert that the test calulated the right number of neighbours'''
         regex = r'^Loop time of (?P<perf>[.0-9]+) on [0-9]+ procs for 100 steps with (?P<atoms>\S+) atoms'
-        n_atoms = sn.extractsingle(regex, self.stdout, 'atoms', int)
+        n_atoms = output_cache.extractsingle(regex, self.stdout, 'atoms', int)
 
         return sn.assert_eq(n_atoms, 32000)
 
@@ -93,7 +95,7 @@ class EESSI_LAMMPS_base(rfm.RunOnlyRegressionTest):
     def assert_run_steps(self, ref_nsteps=10000):
         '''Assert that the test calulated the right number of steps'''
         regex = r'^Loop time of (?P<perf>[.0-9]+) on [0-9]+ procs for (?P<steps>\S+) steps with [0-9]+ atoms'
-        n_steps = sn.extractsingle(regex, self.stdout, 'steps', int)
+        n_steps = output_cache.extractsingle(regex, self.stdout, 'steps', int)
         return sn.assert_eq(n_steps, ref_nsteps)
 
     @run_after('init')
@@ -124,6 +126,24 @@ class EESSI_LAMMPS_base(rfm.RunOnlyRegressionTest):
                 self.executable_opts += [f'-suffix gpu -package gpu {self.num_gpus_per_node}']
                 log(f'executable_opts set to {self.executable_opts}')
 
+    @run_before('performance')
+    def set_timing_breakdown_perf_vars(self):
+        """
+        Add perf variables with the average time, the load imbalance (max time / average time) and the percentage of
+        the total time of each section in the MPI task timing breakdown, e.g. pair_avg, comm_imbalance and neigh_pct.
+        This shows whether a slowdown is in the computation (Pair, Kspace, Neigh) or in the communication (Comm).
+        """
+        breakdown = lammps_parser.parse_timing_breakdown_file(f'{self.stagedir}/{self.stdout}')
+        for section, timing in breakdown.items():
+            name = section.lower()
+            if timing['avg'] is not None:
+                self.perf_variables[f'{name}_avg'] = sn.make_performance_function(sn.defer(timing['avg']), 's')
+            imbalance = lammps_parser.get_imbalance(timing)
+            if imbalance is not None:
+                self.perf_variables[f'{name}_imbalance'] = sn.make_performance_function(sn.defer(imbalance), 'max/avg')
+            if timing['total'] is not None:
+                self.perf_variables[f'{name}_pct'] = sn.make_performance_function(sn.defer(timing['total']), '%')
+
     # Function to check NDS
     def compute_ndenprof(self, values, bins, start, stop):
         """Checking the values in nden_profile.out"""
@@ -153,14 +173,14 @@ class EESSI_LAMMPS_base(rfm.RunOnlyRegressionTest):
     def assert_NDS(self):
         '''Assert that the calculated energy at timestep 100 is with the margin of error'''
         regex = r'^\s+[.0-9]+\s+[.0-9]+\s+[.0-9]+\s+[.0-9]+$'
-        values = sn.extractall(regex, 'nden_profile.out')
+        values = output_cache.extractall(regex, 'nden_profile.out')
         return self.compute_ndenprof(values, 30, 10, 100)
 
     @performance_function('timesteps/s')
     def perf(self):
         # Note: final number may have different units, e.g. katom-step or Matom-step. This matches all.
         regex = r'^Performance: [.0-9]+ tau/day, (?P<perf>[.0-9]+) timesteps/s, [.0-9]+ [a-zA-Z]*atom-step/s'
-        return sn.extractsingle(regex, self.stdout, 'perf', float)
+        return output_cache.extractlast(regex, self.stdout, 'perf', float)
 
 
 @rfm.simple_test
@@ -172,14 +192,14 @@ class EESSI_LAMMPS_lj(EESSI_LAMMPS_base, EESSI_Mixin):
     def check_number_neighbors(self):
         '''Assert that the test calulated the right number of neighbours'''
         regex = r'Neighbor list builds = (?P<neigh>\S+)'
-        n_neigh = sn.extractsingle(regex, self.stdout, 'neigh', int)
+        n_neigh = output_cache.extractsingle(regex, self.stdout, 'neigh', int)
         return sn.assert_eq(n_neigh, 5)
 
     @deferrable
     def assert_energy(self):
         '''Assert that the calculated energy at timestep 100 is with the margin of error'''
         regex = r'^\s+100\s+[-+]?[.0-9]+\s+[-+]?[.0-9]+\s+0\s+(?P<energy>[-+]?[.0-9]+)'
-        energy = sn.extractsingle(regex, self.stdout, 'energy', float)
+        energy = output_cache.extractsingle(regex, self.stdout, 'energy', float)
         energy_diff = sn.abs(energy - (-4.6223613))
         return sn.assert_lt(energy_diff, 1e-4)
 
@@ -205,14 +225,14 @@ class EESSI_LAMMPS_rhodo(EESSI_LAMMPS_base, EESSI_Mixin):
     def check_number_neighbors(self):
         '''Assert that the test calulated the right number of neighbours'''
         regex = r'Neighbor list builds = (?P<neigh>\S+)'
-        n_neigh = sn.extractsingle(regex, self.stdout, 'neigh', int)
+        n_neigh = output_cache.extractsingle(regex, self.stdout, 'neigh', int)
         return sn.assert_eq(n_neigh, 11)
 
     @deferrable
     def assert_energy(self):
         '''Assert that the calculated energy at timestep 100 is with the margin of error'''
         regex = r'^-+\s+Step\s+100\s+-+\s+CPU\s=\s+[.0-9]+\s+\(sec\)\s+-+\nTotEng\s+=\s+(?P<energy>[-+]?[.0-9]+)'
-        energy = sn.extractsingle(regex, self.stdout, 'energy', float)
+        energy = output_cache.extractsingle(regex, self.stdout, 'energy', float)
         energy_diff = sn.abs(energy - (-25290.7300))
         return sn.assert_lt(energy_diff, 1e-1)
 
@@ -230,7 +250,13 @@ class EESSI_LAMMPS_rhodo(EESSI_LAMMPS_base, EESSI_Mixin):
     @performance_function('timesteps/s')
     def perf(self):
         regex = r'^Performance: [.0-9]+ ns/day, [.0-9]+ hours/ns, (?P<perf>[.0-9]+) timesteps/s'
-        return sn.extractsingle(regex, self.stdout, 'perf', float)
+        return output_cache.extractlast(regex, self.stdout, 'perf', float)
+
+    def steady_state_series(self):
+        '''Intervals between the thermo outputs, which report the CPU time of the run with thermo_style multi'''
+        regex = r'^-+\s+Step\s+(?P<step>[0-9]+)\s+-+\s+CPU\s=\s+(?P<cpu>[.0-9]+)\s+\(sec\)'
+        points = output_cache.extractall(regex, f'{self.stagedir}/{self.stdout}', ['cpu', 'step'], [float, int])
+        return stats.intervals(points.evaluate())
 
 
 class EESSI_LAMMPS_ALL_balance_staggered_global_base(EESSI_LAMMPS_base):
@@ -246,7 +272,7 @@ class EESSI_LAMMPS_ALL_balance_staggered_global_base(EESSI_LAMMPS_base):
     def check_number_neighbors(self):
         '''Assert that the test calulated the right number of neighbours'''
         regex = r'Neighbor list builds = (?P<neigh>\S+)'
-        n_neigh = sn.extractsingle(regex, self.stdout, 'neigh', int)
+        n_neigh = output_cache.extractsingle(regex, self.stdout, 'neigh', int)
         n_neigh_diff = sn.abs(n_neigh - 2529)
         return sn.assert_lt(n_neigh_diff, 1100)
 
@@ -276,8 +302,8 @@ class EESSI_LAMMPS_ALL_balance_staggered_global_base(EESSI_LAMMPS_base):
     def assert_imbalence(self):
         '''Assert that the imbalance has gone down by at least 50%, OR that it was already very low (<1.1)'''
         # If imb is 1, that indicates perfect balance. So the imbalance is essentially imb-1.
-        initial_imbalance = sn.extractsingle(self.init_imb_regex, self.stdout, 'imb', float) - 1
-        final_imbalance = sn.extractsingle(self.final_imb_regex, self.stdout, 'imb', float) - 1
+        initial_imbalance = output_cache.extractsingle(self.init_imb_regex, self.stdout, 'imb', float) - 1
+        final_imbalance = output_cache.extractsingle(self.final_imb_regex, self.stdout, 'imb', float) - 1
         log(f"Improved load balancing from {initial_imbalance} to {final_imbalance} (0 = perfect balance).")
 
         # Check if imbalance was small both at the start and end
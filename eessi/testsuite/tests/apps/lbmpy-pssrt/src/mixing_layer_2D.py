@@ -256,6 +256,7 @@ def run_benchmark(N: int, runtime: float, use_omp: bool):
     mlups = [benchmark() for _ in range(5)]
     end_time = time.perf_counter()
 
+    print("EESSI_SAMPLES: lattice_updates MLU/s " + " ".join(f"{x:.3f}" for x in mlups))
     result_str = "{mlups:.0f}±{diff:.2f}".format(
         mlups=median(mlups), diff=max(mlups) - min(mlups)
     )
@@ -32,12 +32,16 @@ Hooks acting on concrete test cases (after filtering) are called after the 'setu
 See also https://reframe-hpc.readthedocs.io/en/stable/pipeline.html
 """
 
+import os
+
 import reframe as rfm
 # added only to make the linter happy
 from reframe.core.builtins import deferrable, parameter, run_after, run_before, sanity_function, performance_function
 import reframe.utility.sanity as sn
+from eessi.testsuite import output_cache, stats
 from eessi.testsuite.constants import COMPUTE_UNITS, DEVICE_TYPES, SCALES
 from eessi.testsuite.eessi_mixin import EESSI_Mixin
+from eessi.testsuite.parsers import openfoam as openfoam_parser
 from eessi.testsuite.utils import find_modules
 
 
@@ -75,6 +79,31 @@ def filter_scales_1M():
     ]
 
 
+@deferrable
+def timestep_statistic(logfile, name):
+    """Return statistic name of the timesteps in the icoFoam log file, see openfoam_parser.timestep_statistics()"""
+    return openfoam_parser.timestep_statistics(openfoam_parser.parse_log_file(logfile))[name]
+
+
+def set_timestep_perf_variables(test, logfile):
+    """
+    Add performance variables with statistics over the timesteps in the icoFoam log file, which is parsed only once
+    for all of them. The time per timestep excludes the first timestep, which includes the startup of icoFoam.
+    """
+    logfile = os.path.join(test.stagedir, logfile)
+    for name, unit in [
+        ('median_s_per_step', 's/timestep'),
+        ('p95_s_per_step', 's/timestep'),
+        ('p_iterations_per_step', 'iterations/timestep'),
+    ]:
+        test.perf_variables[name] = sn.make_performance_function(timestep_statistic(logfile, name), unit)
+
+
+def timestep_intervals(logfile):
+    """Return the (duration, steps) intervals of the timesteps in the icoFoam log file, based on the ClockTime"""
+    return stats.intervals(openfoam_parser.clock_points(openfoam_parser.parse_log_file(logfile)))
+
+
 @rfm.simple_test
 class EESSI_OPENFOAM_LID_DRIVEN_CAVITY_64M(rfm.RunOnlyRegressionTest, EESSI_Mixin):
     """
@@ -156,19 +185,26 @@ class EESSI_OPENFOAM_LID_DRIVEN_CAVITY_64M(rfm.RunOnlyRegressionTest, EESSI_Mixi
 
     @deferrable
     def assert_convergence(self):
-        cumulative_cont_err = sn.extractall(r'cumulative = (?P<cont>\S+)', "./cavity3D/64M/fixedTol/log.icofoam",
-                                            'cont', float)
-        abs_cumulative_cont_err = sn.abs(cumulative_cont_err[-1])
+        cumulative_cont_err = output_cache.extractlast(r'cumulative = (?P<cont>\S+)',
+                                                       "./cavity3D/64M/fixedTol/log.icofoam", 'cont', float)
+        abs_cumulative_cont_err = sn.abs(cumulative_cont_err)
         return sn.assert_le(abs_cumulative_cont_err, 1e-15,
                             msg="The cumulative continuity errors are high. Try varying pressure solver.")
 
     @performance_function('s/timestep')
     def perf(self):
-        perftimes = sn.extractall(r'ClockTime = (?P<perf>\S+)', "./cavity3D/64M/fixedTol/log.icofoam", 'perf',
-                                  float)
-        seconds_per_timestep = perftimes[-1] / 15.0
+        clocktime = output_cache.extractlast(r'ClockTime = (?P<perf>\S+)', "./cavity3D/64M/fixedTol/log.icofoam",
+                                             'perf', float)
+        seconds_per_timestep = clocktime / 15.0
         return seconds_per_timestep
 
+    @run_before('performance')
+    def set_timestep_perf_vars(self):
+        set_timestep_perf_variables(self, "./cavity3D/64M/fixedTol/log.icofoam")
+
+    def steady_state_series(self):
+        return timestep_intervals(os.path.join(self.stagedir, "./cavity3D/64M/fixedTol/log.icofoam"))
+
     @sanity_function
     def assert_sanity(self):
         '''Check all sanity criteria'''
@@ -270,19 +306,26 @@ class EESSI_OPENFOAM_LID_DRIVEN_CAVITY_8M(rfm.RunOnlyRegressionTest, EESSI_Mixin
 
     @deferrable
     def assert_convergence(self):
-        cumulative_cont_err = sn.extractall(r'cumulative = (?P<cont>\S+)', "./cavity3D/8M/fixedTol/log.icofoam",
-                                            'cont', float)
-        abs_cumulative_cont_err = sn.abs(cumulative_cont_err[-1])
+        cumulative_cont_err = output_cache.extractlast(r'cumulative = (?P<cont>\S+)',
+                                                       "./cavity3D/8M/fixedTol/log.icofoam", 'cont', float)
+        abs_cumulative_cont_err = sn.abs(cumulative_cont_err)
         return sn.assert_le(abs_cumulative_cont_err, 1e-15,
                             msg="The cumulative continuity errors are high. Try varying pressure solver.")
 
     @performance_function('s/timestep')
     def perf(self):
-        perftimes = sn.extractall(r'ClockTime = (?P<perf>\S+)', "./cavity3D/8M/fixedTol/log.icofoam", 'perf',
-                                  float)
-        seconds_per_timestep = perftimes[-1] / 15.0
+        clocktime = output_cache.extractlast(r'ClockTime = (?P<perf>\S+)', "./cavity3D/8M/fixedTol/log.icofoam",
+                                             'perf', float)
+        seconds_per_timestep = clocktime / 15.0
         return seconds_per_timestep
 
+    @run_before('performance')
+    def set_timestep_perf_vars(self):
+        set_timestep_perf_variables(self, "./cavity3D/8M/fixedTol/log.icofoam")
+
+    def steady_state_series(self):
+        return timestep_intervals(os.path.join(self.stagedir, "./cavity3D/8M/fixedTol/log.icofoam"))
+
     @sanity_function
     def assert_sanity(self):
         '''Check all sanity criteria'''
@@ -385,19 +428,26 @@ class EESSI_OPENFOAM_LID_DRIVEN_CAVITY_1M(rfm.RunOnlyRegressionTest, EESSI_Mixin
 
     @deferrable
     def assert_convergence(self):
-        cumulative_cont_err = sn.extractall(r'cumulative = (?P<cont>\S+)', "./cavity3D/1M/fixedTol/log.icofoam",
-                                            'cont', float)
-        abs_cumulative_cont_err = sn.abs(cumulative_cont_err[-1])
+        cumulative_cont_err = output_cache.extractlast(r'cumulative = (?P<cont>\S+)',
+                                                       "./cavity3D/1M/fixedTol/log.icofoam", 'cont', float)
+        abs_cumulative_cont_err = sn.abs(cumulative_cont_err)
         return sn.assert_le(abs_cumulative_cont_err, 1e-15,
                             msg="The cumulative continuity errors are high. Try varying pressure solver.")
 
     @performance_function('s/timestep')
     def perf(self):
-        perftimes = sn.extractall(r'ClockTime = (?P<perf>\S+)', "./cavity3D/1M/fixedTol/log.icofoam", 'perf',
-                                  float)
-        seconds_per_timestep = perftimes[-1] / 15.0
+        clocktime = output_cache.extractlast(r'ClockTime = (?P<perf>\S+)', "./cavity3D/1M/fixedTol/log.icofoam",
+                                             'perf', float)
+        seconds_per_timestep = clocktime / 15.0
         return seconds_per_timestep
 
+    @run_before('performance')
+    def set_timestep_perf_vars(self):
+        set_timestep_perf_variables(self, "./cavity3D/1M/fixedTol/log.icofoam")
+
+    def steady_state_series(self):
+        return timestep_intervals(os.path.join(self.stagedir, "./cavity3D/1M/fixedTol/log.icofoam"))
+
     @sanity_function
     def assert_sanity(self):
         '''Check all sanity criteria'''
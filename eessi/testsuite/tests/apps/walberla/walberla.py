@@ -12,6 +12,7 @@ import reframe as rfm
 # added only to make the linter happy
 from reframe.core.builtins import deferrable, parameter, run_after, run_before, sanity_function, performance_function
 import reframe.utility.sanity as sn
+from eessi.testsuite import output_cache, stats
 from eessi.testsuite.constants import COMPUTE_UNITS, DEVICE_TYPES, SCALES
 from eessi.testsuite.eessi_mixin import EESSI_Mixin
 from eessi.testsuite.utils import find_modules
@@ -125,11 +126,17 @@ class EESSI_WALBERLA_BACKWARD_FACING_STEP(rfm.RunOnlyRegressionTest, EESSI_Mixin
     @performance_function('s/timestep')
     def perf(self):
         ''' Collecting performance timings within the log and computing average performance time per step. '''
-        perftimes = sn.extractall(r'[INFO\s*].*\((?P<perf>\S+)\s+sec\)\[(?P<numsteps>.*)\]', self.stdout,
-                                  tag=['perf', 'numsteps'], conv=float)
-        seconds_per_timestep = perftimes[-1][0] / perftimes[-1][1]
+        perftime = output_cache.extractlast(r'[INFO\s*].*\((?P<perf>\S+)\s+sec\)\[(?P<numsteps>.*)\]', self.stdout,
+                                            tag=['perf', 'numsteps'], conv=float)
+        seconds_per_timestep = perftime[0] / perftime[1]
         return seconds_per_timestep
 
+    def steady_state_series(self):
+        ''' Intervals between the timing lines in the log, which give the elapsed time and the current timestep. '''
+        perftimes = output_cache.extractall(r'[INFO\s*].*\((?P<perf>\S+)\s+sec\)\[(?P<numsteps>.*)\]',
+                                            f'{self.stagedir}/{self.stdout}', tag=['perf', 'numsteps'], conv=float)
+        return stats.intervals(perftimes.evaluate())
+
     @sanity_function
     def assert_sanity(self):
         ''' Check all sanity criteria. '''